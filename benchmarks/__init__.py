@@ -0,0 +1 @@
+"""himawari_api benchmarks (run with `asv run`)."""
@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Benchmark the import time of himawari_api.
+
+The `timeraw_*` benchmarks are executed by asv in a fresh interpreter.
+The script can also be run directly to check the import time budget:
+
+    python benchmarks/benchmark_import.py
+"""
+
+import subprocess
+import sys
+import time
+
+# Import time budget (in seconds) of `import himawari_api` + info functions
+IMPORT_TIME_BUDGET = 0.05
+
+IMPORT_STATEMENTS = {
+    "import": "import himawari_api",
+    "available_channels": "import himawari_api; himawari_api.available_channels()",
+    "available_products": "import himawari_api; himawari_api.available_products()",
+}
+
+
+class ImportTime:
+    """Import time of himawari_api in a fresh interpreter."""
+
+    def timeraw_import(self):
+        return IMPORT_STATEMENTS["import"]
+
+    def timeraw_available_channels(self):
+        return IMPORT_STATEMENTS["available_channels"]
+
+    def timeraw_available_products(self):
+        return IMPORT_STATEMENTS["available_products"]
+
+
+def _measure_import_time(statement, repeat=5):
+    """Return the best import time (in seconds) of statement, interpreter startup excluded."""
+
+    def _best_time(code):
+        times = []
+        for _ in range(repeat):
+            t_i = time.perf_counter()
+            subprocess.run([sys.executable, "-c", code], check=True)
+            times.append(time.perf_counter() - t_i)
+        return min(times)
+
+    return _best_time(statement) - _best_time("pass")
+
+
+if __name__ == "__main__":
+    exceeded = False
+    for name, statement in IMPORT_STATEMENTS.items():
+        elapsed = _measure_import_time(statement)
+        status = "OK" if elapsed < IMPORT_TIME_BUDGET else "EXCEEDED"
+        exceeded = exceeded or elapsed >= IMPORT_TIME_BUDGET
+        print(f"{name}: {elapsed * 1000:.1f} ms ({status})")
+    sys.exit(int(exceeded))
@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Benchmark the parsing, listing, filtering, grouping and download of files.
+
+The benchmarks run on synthetic trees (see `himawari_api/tests/_synthetic.py`) written
+on local disk or served by a local moto S3 server.
+The S3 benchmarks are skipped if moto is not installed.
+"""
+
+import os
+import shutil
+import tempfile
+
+from himawari_api.tests._synthetic import (
+    SATELLITE,
+    S3Server,
+    get_synthetic_fpaths,
+    get_time_period,
+    make_local_tree,
+)
+
+# Filename patterns: (product_level, product, pattern)
+FNAME_PATTERNS = {
+    "L1b": ("L1b", "Rad", "new"),
+    "L2_new": ("L2", "CMSK", "new"),
+    "L2_old": ("L2", "CMSK", "old"),
+}
+
+
+def _get_fpaths(n_files, fname_pattern="L1b"):
+    """Return synthetic filepaths of a filename pattern."""
+    product_level, product, pattern = FNAME_PATTERNS[fname_pattern]
+    return get_synthetic_fpaths(n_files, product_level=product_level, product=product, pattern=pattern)
+
+
+####--------------------------------------------------------------------------.
+#### In-memory benchmarks
+
+
+class ParseFilenames:
+    """Filename parsing rate."""
+
+    params = ([10_000, 100_000, 1_000_000], list(FNAME_PATTERNS))
+    param_names = ["n_files", "fname_pattern"]
+    timeout = 600
+
+    def setup(self, n_files, fname_pattern):
+        self.fpaths = _get_fpaths(n_files, fname_pattern)
+
+    def time_get_file_records(self, n_files, fname_pattern):
+        from himawari_api.info import get_file_records
+
+        get_file_records(self.fpaths)
+
+    def peakmem_get_file_records(self, n_files, fname_pattern):
+        from himawari_api.info import get_file_records
+
+        get_file_records(self.fpaths)
+
+
+class FilterFiles:
+    """Filtering of L1b filepaths and records by channels and time."""
+
+    params = ([10_000, 100_000, 1_000_000], [False, True])
+    param_names = ["n_files", "records"]
+    timeout = 600
+
+    def setup(self, n_files, records):
+        from himawari_api.info import get_file_records
+
+        fpaths = _get_fpaths(n_files)
+        self.start_time, self.end_time = get_time_period(fpaths)
+        self.fpaths = get_file_records(fpaths) if records else fpaths
+
+    def time_filter_files(self, n_files, records):
+        from himawari_api.filter import filter_files
+
+        filter_files(
+            self.fpaths,
+            product="Rad",
+            product_level="L1b",
+            start_time=self.start_time,
+            end_time=self.end_time,
+            channels=["B03", "B13"],
+        )
+
+
+class GroupFiles:
+    """Grouping of L1b filepaths by key."""
+
+    params = ([10_000, 100_000, 1_000_000], ["start_time", "channel"])
+    param_names = ["n_files", "key"]
+    timeout = 600
+
+    def setup(self, n_files, key):
+        self.fpaths = _get_fpaths(n_files)
+
+    def time_group_files(self, n_files, key):
+        from himawari_api.info import group_files
+
+        group_files(self.fpaths, key=key)
+
+
+####--------------------------------------------------------------------------.
+#### Local disk benchmarks
+
+
+class LocalListing:
+    """`find_files` on a synthetic local tree."""
+
+    params = ([10_000, 100_000], [None, 8])
+    param_names = ["n_files", "n_threads"]
+    timeout = 1200
+
+    def setup_cache(self):
+        base_dir = tempfile.mkdtemp(prefix="himawari_api_bench_")
+        dict_trees = {}
+        for n_files in self.params[0]:
+            tree_dir = os.path.join(base_dir, str(n_files))
+            fpaths = _get_fpaths(n_files)
+            make_local_tree(tree_dir, fpaths)
+            dict_trees[n_files] = (tree_dir, *get_time_period(fpaths))
+        return dict_trees
+
+    def time_find_files(self, dict_trees, n_files, n_threads):
+        from himawari_api.search import find_files
+
+        base_dir, start_time, end_time = dict_trees[n_files]
+        find_files(
+            base_dir=base_dir,
+            satellite=SATELLITE,
+            product_level="L1b",
+            product="Rad",
+            sector="FLDK",
+            start_time=start_time,
+            end_time=end_time,
+            n_threads=n_threads,
+        )
+
+
+####--------------------------------------------------------------------------.
+#### S3 benchmarks
+
+
+class _S3Benchmark:
+    """Base class starting a moto S3 server with a synthetic bucket."""
+
+    file_size = 0
+    timeout = 1200
+
+    def setup(self, n_files):
+        try:
+            import moto  # noqa: F401
+        except ImportError:
+            raise NotImplementedError("moto is not installed.")
+        fpaths = _get_fpaths(n_files)
+        self.start_time, self.end_time = get_time_period(fpaths)
+        self.server = S3Server(fpaths, file_size=self.file_size)
+
+    def teardown(self, n_files):
+        self.server.stop()
+
+
+class S3Listing(_S3Benchmark):
+    """`find_files` on a synthetic S3 bucket."""
+
+    params = [1_000, 10_000]
+    param_names = ["n_files"]
+
+    def time_find_files(self, n_files):
+        from himawari_api.search import find_files
+
+        find_files(
+            protocol="s3",
+            fs_args=dict(self.server.fs_args),
+            satellite=SATELLITE,
+            product_level="L1b",
+            product="Rad",
+            sector="FLDK",
+            start_time=self.start_time,
+            end_time=self.end_time,
+        )
+
+
+class S3Download(_S3Benchmark):
+    """`download_files` throughput from a synthetic S3 bucket."""
+
+    params = [1_000, 10_000]
+    param_names = ["n_files"]
+    file_size = 10_000
+    number = 1
+    repeat = 3
+
+    def setup(self, n_files):
+        super().setup(n_files)
+        self.base_dir = tempfile.mkdtemp(prefix="himawari_api_bench_")
+
+    def teardown(self, n_files):
+        super().teardown(n_files)
+        shutil.rmtree(self.base_dir, ignore_errors=True)
+
+    def time_download_files(self, n_files):
+        from himawari_api.download import download_files
+
+        download_files(
+            base_dir=self.base_dir,
+            protocol="s3",
+            fs_args=dict(self.server.fs_args),
+            satellite=SATELLITE,
+            product_level="L1b",
+            product="Rad",
+            sector="FLDK",
+            start_time=self.start_time,
+            end_time=self.end_time,
+            force_download=True,
+            check_data_integrity=False,
+            progress_bar=False,
+            verbose=False,
+        )
@@ -6,113 +6,22 @@ Created on Wed Sep  7 14:48:54 2022
 @author: ghiggi
 """
 import dask
-import satpy
 #import fsspec
 import datetime
-import numpy as np
 from satpy import Scene, MultiScene
 #from satpy.readers import FSFile
 from dask.diagnostics import ProgressBar
 #from goes_api import download_files, find_files
 from dask.distributed import Client
 
-from himawari_api import download_files, find_files
+import himawari_api
+from himawari_api import download_files, find_files, get_composites_channels
 
 client = Client(processes=True)
 # ---------------------------------------------------------------------------.
 # Install satpy and imageio-ffmpeg to execute this script
 # conda install -c conda-forge satpy imageio-ffmpeg
 
-# ---------------------------------------------------------------------------.
-#### Temporary required
-
-
-def get_channels_from_wavelengths(scn, wavelengths):
-    dependency_tree = scn._dependency_tree
-    list_names = []
-    for band in wavelengths:
-        if isinstance(band, float):
-            dict_dataset_ids = dependency_tree._find_matching_ids_in_readers(band)
-        else:
-            dict_dataset_ids = dependency_tree._find_matching_ids_in_readers(band.get("wavelength"))
-               
-        for reader, data_ids in dict_dataset_ids.items():  # TODO: here I assume is only 1 reader
-            if not data_ids: 
-                raise ValueError(f"Required wavelength {band} does not match with available channels")
-            channel = np.unique([data_id['name']
-                                for data_id in data_ids]).tolist()
-            list_names += channel
-    return list_names
-
-
-def _get_required_channels(scn, dataset):
-    # Load 1 channel to enable dependency tree initialization
-    dummy_dataset = scn.available_dataset_names()[0]
-    scn.load([dummy_dataset])
-
-    # Retrieve dependency tree
-    dependency_tree = scn._dependency_tree
-    compositor = dependency_tree.get_compositor(dataset)
-    prerequisites = compositor.attrs['prerequisites']
-
-    # Prerequisites can be
-    # - satpy.dataset.DataQuery
-    # - list of wavelengths
-    # - satpy.node.ReaderNode (when dataset is a channel)
-
-    # Convert wavelength to names if it is the case
-    
-    # TODO : catch wavelengths
-    #print(prerequisites)
-    
-    try:
-        if isinstance(prerequisites[0].get("wavelength"), float):
-            prerequisites = get_channels_from_wavelengths(scn, prerequisites)
-    except: 
-        if isinstance(prerequisites[0], float):
-            prerequisites = get_channels_from_wavelengths(scn, prerequisites)
-    
-    list_valid_channels = scn.all_dataset_names()
-    # Retrive required channels
-    list_channels = []
-    for x in prerequisites:
-        if isinstance(x, satpy.node.ReaderNode):  # channel
-            channel = x.name['name']
-            list_channels.append(channel)
-        elif isinstance(x, str):
-            list_channels.append(x)
-        else:  # satpy.dataset.dataid.DataQuery
-            name = x.get("name")
-            if name not in list_valid_channels:  # is a composite
-                channels = _get_required_channels(scn, name)
-                list_channels += channels
-            else:
-                list_channels.append(name)
-    list_channels = np.unique(list_channels).tolist()
-
-    # Unload dummy id
-    scn.unload([dummy_dataset])
-    return list_channels
-
-
-def get_required_channels(scn, datasets):
-    if isinstance(datasets, str):
-        datasets = [datasets]
-    list_channels = []
-    for dataset in datasets:
-        channels = _get_required_channels(scn, dataset)
-        list_channels += channels
-    list_channels = np.unique(list_channels).tolist()
-    return list_channels
-
-# scn.all_composite_names()
-# _get_required_channels(scn, "C01")
-# _get_required_channels(scn, "true_color")
-# _get_required_channels(scn, "cloud_phase_distinction")
-# get_required_channels(scn, ["true_color", "C01", "cloud_phase_distinction"])
-# get_required_channels(scn, composites)
-
-
 # ---------------------------------------------------------------------------.
 # Define protocol
 base_dir = None
@@ -140,11 +49,11 @@ end_time = datetime.datetime(2020, 2, 20, 19, 0)
 sector = "FLDK"
 scan_modes = None  # select all scan modes (M3, M4, M6)
 scene_abbr = None  # M1 or M2
-# select channels for True Color generation
-channels = ["C01", "C02", "C03", "C05", "C13", "C14"]
+# select only the channels required to generate the composites
+composites = ["true_color", "green_snow", "cloud_phase_distinction"]
 filter_parameters = {}
 #filter_parameters["scan_modes"] = scan_modes
-filter_parameters["channels"] = channels
+filter_parameters["composites"] = composites
 #filter_parameters["scene_abbr"] = scene_abbr
 
 # ---------------------------------------------------------------------------.
@@ -203,7 +112,6 @@ fpaths_dict = find_files(
 list(fpaths_dict.keys())
 
 ll_bbox = [-98, 38, -88, 45]  # [x_min, y_min, x_max, ymax]
-composites = ["true_color", "green_snow", "cloud_phase_distinction"]
 
 # -----------------------------------------------------------------------------.
 # # Define Scene for each timestep
@@ -213,7 +121,7 @@ composites = ["true_color", "green_snow", "cloud_phase_distinction"]
 #     # - Use satpy
 #     scn = Scene(filenames=fpaths, reader="abi_l1b")
 #     # - Load channels, crop, resample, create composite and unload
-#     required_channels = get_required_channels(scn, composites)
+#     required_channels = get_composites_channels(composites)
 #     scn.load(required_channels)
 #     scn = scn.crop(ll_bbox=ll_bbox)
 #     scn = scn.resample(resampler="native")
@@ -232,7 +140,7 @@ def _delayed_scene(fpaths, reader, datasets, ll_bbox=None):
     # - Use satpy
     scn = Scene(filenames=fpaths, reader=reader)
     # - Load required channels
-    required_channels = get_required_channels(scn, datasets)
+    required_channels = get_composites_channels(datasets)
     scn.load(required_channels)
     # - TODO: to speed up --> load channels before
 
@@ -272,6 +180,16 @@ with ProgressBar():
                         fps=5,
                         batch_size=4, client=client)
 
+# ---------------------------------------------------------------------------.
+# Alternatively, use the himawari_api animation pipeline
+# - Frames are rendered in a bounded process pool and streamed to the encoder
+himawari_api.animate(fpaths_dict,
+                     filename="/Users/_sourd/Desktop/true_color.mp4",
+                     composite="true_color",
+                     ll_bbox=ll_bbox,
+                     fps=5,
+                     n_workers=4)
+
 # ---------------------------------------------------------------------------.
 # Close client 
 client.close()
@@ -15,38 +15,102 @@
 # You should have received a copy of the GNU General Public License along with
 # himawari_api. If not, see <http://www.gnu.org/licenses/>.
 
-from .info import (
-    available_protocols,
-    available_satellites,
-    available_sectors,
-    available_product_levels,
-    available_channels,
-    available_products,
-    available_connection_types,
-    available_group_keys,
-    group_files,
-)
-from .search import (
-    find_closest_start_time,
-    find_latest_start_time,
-    find_files,
-    find_closest_files,
-    find_latest_files,
-    find_previous_files,
-    find_next_files,
-)
-from .download import (
-    download_files,
-    download_closest_files,
-    download_latest_files,
-    download_next_files,
-    download_previous_files,
-)
-from .filter import filter_files
-from .explore import (
-    open_directory_explorer,
-    open_ahi_channel_guide,
-)
+"""Python API for downloading and searching Himawari satellite data."""
+
+import importlib
+
+# The public functions are imported lazily (PEP 562) when first accessed.
+# This avoids to import the heavy dependencies (numpy, pandas, fsspec, ...)
+# when only a subset of the API is used (i.e. `himawari_api.available_channels()`).
+_LAZY_ATTRIBUTES = {
+    "available_protocols": "info",
+    "available_satellites": "info",
+    "available_sectors": "info",
+    "available_product_levels": "info",
+    "available_channels": "info",
+    "available_products": "info",
+    "available_connection_types": "info",
+    "available_group_keys": "info",
+    "available_composites": "info",
+    "get_composites_channels": "info",
+    "group_files": "info",
+    "get_file_records": "info",
+    "HimawariFile": "info",
+    "find_closest_start_time": "search",
+    "find_latest_start_time": "search",
+    "find_files": "search",
+    "iter_files": "search",
+    "find_closest_files": "search",
+    "find_latest_files": "search",
+    "find_previous_files": "search",
+    "find_next_files": "search",
+    "download_files": "download",
+    "download_closest_files": "download",
+    "download_latest_files": "download",
+    "download_next_files": "download",
+    "download_previous_files": "download",
+    "DownloadReport": "download",
+    "LocalCache": "cache",
+    "CachedFileSystem": "cache",
+    "sync": "sync",
+    "download_partitioned": "partition",
+    "get_metrics": "metrics",
+    "set_rate_limits": "ratelimit",
+    "get_rate_limiter": "ratelimit",
+    "NRTWatcher": "ingest",
+    "PublicationDelayEstimator": "ingest",
+    "ingest": "ingest",
+    "filter_files": "filter",
+    "open_directory_explorer": "explore",
+    "open_ahi_channel_guide": "explore",
+    "render_timesteps": "animation",
+    "animate": "animation",
+    "get_lut": "lut",
+    "apply_lut": "lut",
+    "get_bbox_segments_index": "geometry",
+    "read_hsd": "hsd",
+    "read_hsd_header": "hsd",
+}
+
+_SUBMODULES = [
+    "alias",
+    "animation",
+    "cache",
+    "checks",
+    "cli",
+    "download",
+    "explore",
+    "filter",
+    "geometry",
+    "hsd",
+    "info",
+    "ingest",
+    "io",
+    "listing",
+    "lut",
+    "metrics",
+    "partition",
+    "query",
+    "ratelimit",
+    "search",
+    "sync",
+]
+
+
+def __getattr__(name):
+    if name in _LAZY_ATTRIBUTES:
+        module = importlib.import_module(f"{__name__}.{_LAZY_ATTRIBUTES[name]}")
+        value = getattr(module, name)
+        globals()[name] = value  # cache for next accesses
+        return value
+    if name in _SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module '{__name__}' has no attribute '{name}'")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_ATTRIBUTES) | set(_SUBMODULES))
+
 
 __all__ = [
     "available_protocols",
@@ -57,20 +121,43 @@ __all__ = [
     "available_channels",
     "available_connection_types",
     "available_group_keys",
+    "available_composites",
+    "get_composites_channels",
     "download_files",
     "download_closest_files",
     "download_latest_files",
     "download_next_files",
     "download_previous_files",
+    "DownloadReport",
+    "LocalCache",
+    "CachedFileSystem",
+    "sync",
+    "download_partitioned",
+    "get_metrics",
+    "set_rate_limits",
+    "get_rate_limiter",
+    "NRTWatcher",
+    "PublicationDelayEstimator",
+    "ingest",
     "find_files",
+    "iter_files",
     "find_latest_files",
     "find_closest_files",
     "find_previous_files",
     "find_next_files",
     "group_files",
+    "get_file_records",
+    "HimawariFile",
     "filter_files",
     "find_closest_start_time",
     "find_latest_start_time",
     "open_directory_explorer",
     "open_ahi_channel_guide",
+    "render_timesteps",
+    "animate",
+    "get_lut",
+    "apply_lut",
+    "get_bbox_segments_index",
+    "read_hsd",
+    "read_hsd_header",
 ]
@@ -16,9 +16,11 @@
 # himawari_api. If not, see <http://www.gnu.org/licenses/>.
 """Define input argument aliases."""
 
+from himawari_api.listing import PRODUCTS
+
 _satellites = {
     "himawari-8": ["H8", "H08", "HIMAWARI-8", "HIMAWARI8"],
-    "himawari-9": ["H9", "H08", "HIMAWARI-9", "HIMAWARI9"],
+    "himawari-9": ["H9", "H09", "HIMAWARI-9", "HIMAWARI9"],
 }
 
 _sectors = {
@@ -32,22 +34,63 @@ _sectors = {
 # - Channel informations : https://www.data.jma.go.jp/mscweb/en/himawari89/space_segment/spsg_ahi.html
 _channels = {
     "B01": ["B01", "C01", "1", "01", "0.47", "0.46", "BLUE", "B"],
-    "B02": ["B02", "C02", "2", "02", "0.51", "RED", "R"],
-    "B03": ["B03", "C03", "3", "03", "0.64", "GREEN", "G"],                                 
+    "B02": ["B02", "C02", "2", "02", "0.51", "GREEN", "G"],
+    "B03": ["B03", "C03", "3", "03", "0.64", "RED", "R"],                                 
     "B04": ["B04", "C04", "4", "04", "0.86", "CIRRUS"],
     "B05": ["B05", "C05", "5", "05", "1.6", "SNOW/ICE"],
     "B06": ["B06", "C06", "6", "06", "2.3", "CLOUD PARTICLE SIZE", "CPS"],
     "B07": ["B07", "C07", "7", "07", "3.9", "IR SHORTWAVE WINDOW", "IR SHORTWAVE"],
     "B08": ["B08", "C08", "8", "08", "6.2", "UPPER-LEVEL TROPOSPHERIC WATER VAPOUR",  "UPPER-LEVEL WATER VAPOUR"],
     "B09": ["B09", "C09", "9", "09", "6.9", "7.0", "MID-LEVEL TROPOSPHERIC WATER VAPOUR", "MID-LEVEL WATER VAPOUR"],
-    "B10": ["B10", "C10", "10", "10", "7.3", "LOWER-LEVEL TROPOSPHERIC WATER VAPOUR", "LOWER-LEVEL WATER VAPOUR"],
+    "B10": ["B10", "C10", "10", "7.3", "LOWER-LEVEL TROPOSPHERIC WATER VAPOUR", "LOWER-LEVEL WATER VAPOUR"],
     "B11": ["B11", "C11", "11", "11", "8.6", "CLOUD-TOP PHASE", "CTP"],
     "B12": ["B12", "C12", "12", "12", "9.6", "OZONE"],
     "B13": ["B13", "C13", "13", "10.4", "CLEAN IR LONGWAVE WINDOW", "CLEAN IR"],
     "B14": ["B14", "C14", "14", "11.2", "IR LONGWAVE WINDOW", "IR LONGWAVE"],
-    "B15": ["B16","C15", "15", "12.3", "12.4", "DIRTY LONGWAVE WINDOW", "DIRTY IR"],
-    "B16": ["B16","C16", "16", "13.3", "CO2 IR LONGWAVE", "CO2", "CO2 IR"],
+    "B15": ["B15", "C15", "15", "12.3", "12.4", "DIRTY LONGWAVE WINDOW", "DIRTY IR"],
+    "B16": ["B16", "C16", "16", "13.3", "CO2 IR LONGWAVE", "CO2", "CO2 IR"],
 }
 
 PROTOCOLS = ["s3", "local", "file"]
-BUCKET_PROTOCOLS = ["s3"]
\ No newline at end of file
+BUCKET_PROTOCOLS = ["s3"]
+
+
+####--------------------------------------------------------------------------.
+#### Alias lookup tables
+
+
+def _build_lookup_table(aliases_dict):
+    """Build the {<ALIAS>: <key>} reverse lookup table of an aliases dictionary.
+
+    The key itself is considered an alias and the aliases are normalized
+    to upper case. An error is raised if an alias is shared by multiple keys.
+    """
+    lookup_table = {}
+    for key, aliases in aliases_dict.items():
+        for alias in [key, *aliases]:
+            alias = alias.strip().upper()
+            if lookup_table.get(alias, key) != key:
+                raise ValueError(
+                    f"The alias '{alias}' is assigned to both '{lookup_table[alias]}' and '{key}'."
+                )
+            lookup_table[alias] = key
+    return lookup_table
+
+
+def _build_products_lookup_table(products_dict):
+    """Build the {<PRODUCT>: (<product>, <product_level>)} lookup table."""
+    aliases_dict = {}
+    product_levels_dict = {}
+    for product_level, products in products_dict.items():
+        for product in products:
+            aliases_dict[product] = []
+            product_levels_dict[product] = product_level
+    lookup_table = _build_lookup_table(aliases_dict)
+    return {alias: (key, product_levels_dict[key]) for alias, key in lookup_table.items()}
+
+
+# Tables are built once at import time and shared by the `_check_*` functions
+_satellites_lookup = _build_lookup_table(_satellites)
+_sectors_lookup = _build_lookup_table(_sectors)
+_channels_lookup = _build_lookup_table(_channels)
+_products_lookup = _build_products_lookup_table(PRODUCTS["AHI"])
\ No newline at end of file
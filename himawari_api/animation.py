@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Define himawari_api functions to render and animate AHI composites with satpy."""
+
+import os
+import collections
+
+####--------------------------------------------------------------------------.
+#### Frame rendering
+
+
+def _get_crop_slices(ll_bbox, cache_dir=None):
+    """Return the crop slices of a bounding box on the AHI FLDK grids.
+
+    The slices are retrieved from the crop lookup tables of `himawari_api.get_lut`
+    and returned as a dictionary {<shape of the grid>: (line_slice, col_slice)}.
+    """
+    from himawari_api.geometry import get_projection_info
+    from himawari_api.lut import get_lut
+
+    crop_slices = {}
+    for resolution in [0.5, 1, 2]:
+        lut = get_lut(resolution, ll_bbox=ll_bbox, cache_dir=cache_dir)
+        line_start, line_stop, col_start, col_stop = (int(v) for v in lut["slices"])
+        proj_info = get_projection_info(resolution)
+        grid_shape = (proj_info["nlines"], proj_info["ncols"])
+        crop_slices[grid_shape] = (slice(line_start, line_stop), slice(col_start, col_stop))
+    return crop_slices
+
+
+def _render_frame(fpaths, composite, reader="ahi_hsd", ll_bbox=None, crop_slices=None,
+                  area=None, resampler="nearest", cache_dir=None):
+    """Render the enhanced RGB image of a satpy composite for a single timestep.
+
+    This function is executed in the worker processes of `render_timesteps`.
+    `crop_slices` are the crop slices of `ll_bbox` returned by `_get_crop_slices`.
+    It returns a numpy.ndarray of shape (y, x, bands) and dtype uint8.
+    """
+    import dask
+    import numpy as np
+    from satpy import Scene
+    from satpy.writers import get_enhanced_image
+
+    # Process the timestep in the worker process only
+    # - Avoid oversubscription of the CPUs by the dask threads of each worker
+    with dask.config.set(scheduler="synchronous"):
+        scn = Scene(filenames=fpaths, reader=reader)
+        scn.load([composite])
+        # Crop the scene
+        # - On the FLDK grids, the crop window is taken from the crop lookup tables
+        # - Otherwise (i.e. Japan and Target sectors), it is computed from ll_bbox
+        if ll_bbox is not None:
+            finest_area = scn.finest_area()
+            if crop_slices is not None and finest_area.shape in crop_slices:
+                crop_area = finest_area[crop_slices[finest_area.shape]]
+                # - Use the pixel centers so that satpy does not include the neighbouring pixels
+                x_min, y_min, x_max, y_max = crop_area.area_extent
+                dx, dy = crop_area.pixel_size_x / 2, crop_area.pixel_size_y / 2
+                scn = scn.crop(xy_bbox=(x_min + dx, y_min + dy, x_max - dx, y_max - dy))
+            else:
+                scn = scn.crop(ll_bbox=ll_bbox)
+        # Resample the scene
+        # - The resampling lookup tables are cached in cache_dir and reused across frames
+        if area is not None:
+            scn = scn.resample(area, resampler=resampler, cache_dir=cache_dir)
+        else:
+            scn = scn.resample(scn.finest_area(), resampler="native")
+        # Retrieve the enhanced image
+        img = get_enhanced_image(scn[composite])
+        data, _ = img.finalize(fill_value=0, dtype=np.uint8)
+        data = data.transpose("y", "x", "bands").values
+    return data
+
+
+def _iter_timesteps_fpaths(fpaths_dict):
+    """Yield (timestep, fpaths) in chronological order.
+
+    `fpaths_dict` can be the dictionary returned by `find_files(group_by_key="start_time")`
+    or an iterable of such dictionaries (i.e. `iter_files(group_by_key="start_time")`).
+    """
+    if isinstance(fpaths_dict, dict):
+        fpaths_dict = [fpaths_dict]
+    for item in fpaths_dict:
+        if isinstance(item, dict):
+            for timestep in sorted(item):
+                yield timestep, item[timestep]
+        else:
+            yield item
+
+
+def render_timesteps(
+    fpaths_dict,
+    composite,
+    reader="ahi_hsd",
+    ll_bbox=None,
+    area=None,
+    resampler="nearest",
+    cache_dir=None,
+    n_workers=4,
+    max_pending=None,
+):
+    """
+    Render the satpy composite of each timestep in a pool of processes.
+
+    The frames are yielded in chronological order as soon as they are rendered.
+    At most `max_pending` frames are rendered (or held in memory) at the same time,
+    so that the memory usage does not depend on the number of timesteps.
+
+    Parameters
+    ----------
+    fpaths_dict : dict or iterable
+        Dictionary with structure {<start_time>: [fpaths]}, as returned by
+        `find_files(group_by_key="start_time")`, or an iterable of such
+        dictionaries, as returned by `iter_files(group_by_key="start_time")`.
+    composite : str
+        Name of the satpy composite (or channel) to render.
+    reader : str, optional
+        Name of the satpy reader. The default is "ahi_hsd".
+    ll_bbox : list, optional
+        Bounding box [lon_min, lat_min, lon_max, lat_max] used to crop the scenes.
+        The crop window is retrieved once with `himawari_api.get_lut` and
+        reused for all frames. The default is None (no cropping).
+    area : pyresample.AreaDefinition or str, optional
+        Target area on which to resample the scenes.
+        The default is None (native resampling to the finest resolution).
+    resampler : str, optional
+        The satpy resampler used if `area` is specified. The default is "nearest".
+    cache_dir : str, optional
+        Directory where satpy caches the resampling lookup tables
+        (and `himawari_api.get_lut` the crop lookup tables).
+        The lookup tables are computed for the first frame and reused for the next frames.
+        The default is None (no caching of the resampling lookup tables and
+        crop lookup tables cached in the `himawari_api.get_lut` default directory).
+    n_workers : int, optional
+        Number of processes rendering the frames. The default is 4.
+        If 0, the frames are rendered in the current process.
+    max_pending : int, optional
+        Maximum number of frames rendered concurrently or waiting to be consumed.
+        The default is 2 * n_workers.
+
+    Yields
+    ------
+    (timestep, frame) : tuple
+        The frame is a numpy.ndarray of shape (y, x, bands) and dtype uint8.
+
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+
+    # Retrieve the crop window once for all frames
+    crop_slices = _get_crop_slices(ll_bbox, cache_dir=cache_dir) if ll_bbox is not None else None
+    render_kwargs = dict(
+        composite=composite,
+        reader=reader,
+        ll_bbox=ll_bbox,
+        crop_slices=crop_slices,
+        area=area,
+        resampler=resampler,
+        cache_dir=cache_dir,
+    )
+
+    # Render frames in the current process
+    if n_workers == 0:
+        for timestep, fpaths in _iter_timesteps_fpaths(fpaths_dict):
+            yield timestep, _render_frame(fpaths, **render_kwargs)
+        return
+
+    # Render frames in a bounded pool of processes
+    if max_pending is None:
+        max_pending = 2 * n_workers
+    max_pending = max(max_pending, 1)
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        pending = collections.deque()
+        for timestep, fpaths in _iter_timesteps_fpaths(fpaths_dict):
+            pending.append((timestep, executor.submit(_render_frame, fpaths, **render_kwargs)))
+            # Wait for the oldest frame when the maximum number of frames is reached
+            if len(pending) >= max_pending:
+                timestep, future = pending.popleft()
+                yield timestep, future.result()
+        while pending:
+            timestep, future = pending.popleft()
+            yield timestep, future.result()
+
+
+####--------------------------------------------------------------------------.
+#### Animation
+
+
+def animate(
+    fpaths_dict,
+    filename,
+    composite,
+    fps=5,
+    reader="ahi_hsd",
+    ll_bbox=None,
+    area=None,
+    resampler="nearest",
+    cache_dir=None,
+    n_workers=4,
+    max_pending=None,
+    writer_kwargs={},
+):
+    """
+    Create an animation of a satpy composite.
+
+    The frames are rendered in a pool of processes by `render_timesteps` and
+    streamed in chronological order to the video encoder, so that only a few
+    frames are held in memory at any time.
+    It requires satpy and imageio (and imageio-ffmpeg to create .mp4 files).
+
+    Parameters
+    ----------
+    fpaths_dict : dict or iterable
+        Dictionary with structure {<start_time>: [fpaths]}, as returned by
+        `find_files(group_by_key="start_time")`, or an iterable of such
+        dictionaries, as returned by `iter_files(group_by_key="start_time")`.
+    filename : str
+        Filepath of the animation (i.e. .mp4 or .gif).
+    composite : str
+        Name of the satpy composite (or channel) to animate.
+    fps : int, optional
+        Number of frames per second. The default is 5.
+    writer_kwargs : dict, optional
+        Additional arguments passed to `imageio.get_writer`.
+
+    See `himawari_api.render_timesteps` for the other arguments.
+
+    Returns
+    -------
+    filename : str
+        Filepath of the animation.
+
+    """
+    import imageio
+
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    frames = render_timesteps(
+        fpaths_dict,
+        composite=composite,
+        reader=reader,
+        ll_bbox=ll_bbox,
+        area=area,
+        resampler=resampler,
+        cache_dir=cache_dir,
+        n_workers=n_workers,
+        max_pending=max_pending,
+    )
+    with imageio.get_writer(filename, fps=fps, **writer_kwargs) as writer:
+        for _, frame in frames:
+            writer.append_data(frame)
+    return filename
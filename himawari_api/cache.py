@@ -0,0 +1,617 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Define the local disk caches of the files stored in the cloud buckets.
+
+`LocalCache` manages the files downloaded in the `<base_dir>/<SATELLITE>/<product>/...`
+directory structure used by `himawari_api.download_files`.
+The size and last access time of each file are tracked in a SQLite index
+located in `base_dir`, which can be shared by multiple processes.
+
+`CachedFileSystem` is a read-through cache of the bucket files opened
+directly from the `find_files` output, based on the fsspec caching filesystems.
+"""
+
+import os
+import time
+import sqlite3
+import weakref
+import contextlib
+from himawari_api.metrics import get_metrics
+
+_INDEX_FNAME = ".himawari_api_cache.sqlite"
+
+_EVICTION_POLICIES = ["lru", "age"]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS files_last_access ON files (last_access);
+CREATE TABLE IF NOT EXISTS pins (
+    path TEXT NOT NULL,
+    pid INTEGER NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (path, pid)
+);
+"""
+
+
+def _is_process_alive(pid):
+    """Return True if the process `pid` is running on this host."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class LocalCache:
+    """Local disk cache of Himawari files with a byte quota and LRU eviction.
+
+    Parameters
+    ----------
+    base_dir : str
+        Base directory of the <HIMAWARI-**>/<product>/... directory structure.
+    max_bytes : int, optional
+        Maximum size of the cached files (in bytes).
+        The default is None (no quota).
+    max_age : float, optional
+        Maximum time (in seconds) since the last access of a cached file.
+        The default is None (no age limit).
+    policy : str, optional
+        Eviction policy used to enforce `max_bytes`.
+        "lru" evicts the least recently accessed files first,
+        "age" evicts the files cached first (ignoring later accesses).
+        The default is "lru".
+    protocol : str, optional
+        Cloud bucket storage from which the missing files are downloaded.
+        The default is "s3".
+    fs_args : dict, optional
+        Dictionary specifying optional settings to initiate the fsspec.filesystem.
+    """
+
+    def __init__(self, base_dir, max_bytes=None, max_age=None, policy="lru",
+                 protocol="s3", fs_args={}):
+        from himawari_api.checks import _check_base_dir
+
+        if policy not in _EVICTION_POLICIES:
+            raise ValueError(f"Valid eviction `policy` are {_EVICTION_POLICIES}.")
+        if max_bytes is not None and max_bytes < 0:
+            raise ValueError("`max_bytes` must be a positive integer.")
+        self.base_dir = _check_base_dir(base_dir)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.policy = policy
+        self.protocol = protocol
+        self.fs_args = fs_args
+        self._fs = None
+        self._conn = sqlite3.connect(
+            os.path.join(base_dir, _INDEX_FNAME), timeout=60, check_same_thread=False
+        )
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+
+    def __repr__(self):
+        return f"LocalCache('{self.base_dir}', max_bytes={self.max_bytes}, policy='{self.policy}')"
+
+    def close(self):
+        """Close the connection to the cache index."""
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    @property
+    def fs(self):
+        """Return the fsspec filesystem of the cloud bucket."""
+        if self._fs is None:
+            from himawari_api.io import get_filesystem
+
+            self._fs = get_filesystem(protocol=self.protocol, fs_args=dict(self.fs_args))
+        return self._fs
+
+    ####----------------------------------------------------------------------.
+    #### Index
+
+    def _register(self, local_fpaths, access_time=None):
+        """Add (or update) the files in the index and mark them as accessed."""
+        access_time = time.time() if access_time is None else access_time
+        records = [(fpath, os.path.getsize(fpath), access_time) for fpath in local_fpaths]
+        # With the "age" policy, the access time of indexed files is not updated
+        if self.policy == "age":
+            query = "INSERT OR IGNORE INTO files (path, size, last_access) VALUES (?, ?, ?)"
+        else:
+            query = "INSERT OR REPLACE INTO files (path, size, last_access) VALUES (?, ?, ?)"
+        with self._conn:
+            self._conn.executemany(query, records)
+
+    def _unregister(self, local_fpaths):
+        """Remove the files from the index."""
+        with self._conn:
+            self._conn.executemany("DELETE FROM files WHERE path = ?", [(f,) for f in local_fpaths])
+
+    def scan(self):
+        """Add to the index the files of `base_dir` not downloaded through the cache.
+
+        Only the <SATELLITE>/<product>/... directories are scanned, so that
+        the manifests and checkpoints stored in `base_dir` are never evicted.
+        Returns the number of files added to the index.
+        """
+        from himawari_api.info import available_satellites
+
+        indexed = {row[0] for row in self._conn.execute("SELECT path FROM files")}
+        new_fpaths = []
+        for satellite in available_satellites():
+            satellite_dir = os.path.join(self.base_dir, satellite.upper())
+            for root, dirs, fnames in os.walk(satellite_dir):
+                # Skip the hidden files and directories (i.e. the lock and partial
+                # files of ongoing downloads)
+                dirs[:] = [d for d in dirs if not d.startswith(".")]
+                for fname in fnames:
+                    fpath = os.path.join(root, fname)
+                    if fname.startswith(".") or fpath in indexed:
+                        continue
+                    new_fpaths.append(fpath)
+        # Unknown files are considered accessed at their modification time
+        for fpath in new_fpaths:
+            self._register([fpath], access_time=os.path.getmtime(fpath))
+        return len(new_fpaths)
+
+    def usage(self):
+        """Return the total size (in bytes) of the indexed files."""
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM files").fetchone()[0]
+
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+
+    ####----------------------------------------------------------------------.
+    #### Pins
+
+    def pin(self, local_fpaths):
+        """Protect files from eviction until `unpin` is called (or the process exits).
+
+        The pins of a process are counted, so that a file pinned by several
+        threads is protected until each of them has unpinned it.
+        """
+        pid = os.getpid()
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO pins (path, pid, count) VALUES (?, ?, 1) "
+                "ON CONFLICT (path, pid) DO UPDATE SET count = count + 1",
+                [(fpath, pid) for fpath in local_fpaths],
+            )
+
+    def unpin(self, local_fpaths):
+        """Release a pin of this process on the files."""
+        pid = os.getpid()
+        records = [(fpath, pid) for fpath in local_fpaths]
+        with self._conn:
+            self._conn.executemany("UPDATE pins SET count = count - 1 WHERE path = ? AND pid = ?", records)
+            self._conn.execute("DELETE FROM pins WHERE count <= 0")
+
+    @contextlib.contextmanager
+    def pinned(self, local_fpaths):
+        """Context manager pinning files while they are in use."""
+        self.pin(local_fpaths)
+        try:
+            yield local_fpaths
+        finally:
+            self.unpin(local_fpaths)
+
+    def _get_pinned_fpaths(self):
+        """Return the files pinned by running processes."""
+        rows = self._conn.execute("SELECT path, pid FROM pins").fetchall()
+        dead_pids = {pid for _, pid in rows if not _is_process_alive(pid)}
+        if dead_pids:
+            with self._conn:
+                self._conn.executemany("DELETE FROM pins WHERE pid = ?", [(pid,) for pid in dead_pids])
+        return {path for path, pid in rows if pid not in dead_pids}
+
+    ####----------------------------------------------------------------------.
+    #### Eviction
+
+    def _remove(self, local_fpaths):
+        """Remove files from disk and from the index."""
+        for fpath in local_fpaths:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(fpath)
+        self._unregister(local_fpaths)
+
+    def evict(self, max_bytes=None, max_age=None):
+        """
+        Remove the cached files exceeding the age limit and the byte quota.
+
+        Pinned files are never removed.
+
+        Parameters
+        ----------
+        max_bytes : int, optional
+            Byte quota. The default is the quota of the cache.
+        max_age : float, optional
+            Age limit (in seconds). The default is the age limit of the cache.
+
+        Returns
+        -------
+        evicted_fpaths : list
+            List of the removed files.
+
+        """
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        max_age = self.max_age if max_age is None else max_age
+        pinned = self._get_pinned_fpaths()
+        rows = self._conn.execute("SELECT path, size, last_access FROM files ORDER BY last_access").fetchall()
+        evicted = []
+        # Remove files exceeding the age limit
+        if max_age is not None:
+            limit = time.time() - max_age
+            evicted += [path for path, _, last_access in rows if last_access < limit and path not in pinned]
+        # Remove the oldest files until the quota is satisfied
+        if max_bytes is not None:
+            evicted_set = set(evicted)
+            total_bytes = sum(size for path, size, _ in rows if path not in evicted_set)
+            for path, size, _ in rows:
+                if total_bytes <= max_bytes:
+                    break
+                if path in evicted_set or path in pinned:
+                    continue
+                evicted.append(path)
+                total_bytes -= size
+        self._remove(evicted)
+        return evicted
+
+    ####----------------------------------------------------------------------.
+    #### Cached access
+
+    def get_local_fpaths(self, bucket_fpaths):
+        """Return the local filepaths corresponding to the bucket filepaths."""
+        from himawari_api.info import infer_satellite_from_path
+        from himawari_api.download import _get_local_from_bucket_fpaths
+
+        return [
+            _get_local_from_bucket_fpaths(self.base_dir, infer_satellite_from_path(fpath), [fpath])[0]
+            for fpath in bucket_fpaths
+        ]
+
+    def ensure_local(self, bucket_fpaths, n_threads=20, progress_bar=False):
+        """
+        Return the local filepaths of bucket files, downloading only the missing ones.
+
+        The returned files are accessed (for the LRU policy) and the cache quota
+        is enforced after the download without evicting the returned files.
+
+        Parameters
+        ----------
+        bucket_fpaths : list
+            List of bucket filepaths, as returned by `find_files(protocol="s3")`.
+        n_threads : int, optional
+            Number of files downloaded concurrently. The default is 20.
+        progress_bar : bool, optional
+            If True, display a progress bar of the download. The default is False.
+
+        Returns
+        -------
+        local_fpaths : list
+            List of local filepaths, in the order of `bucket_fpaths`.
+
+        """
+        from himawari_api.download import (
+            _select_missing_fpaths,
+            _fs_get_parallel,
+            create_local_directories,
+        )
+
+        if isinstance(bucket_fpaths, str):
+            bucket_fpaths = [bucket_fpaths]
+        bucket_fpaths = [os.fspath(fpath) for fpath in bucket_fpaths]
+        local_fpaths = self.get_local_fpaths(bucket_fpaths)
+        if len(local_fpaths) == 0:
+            return []
+        with self.pinned(local_fpaths):
+            # Download the missing files
+            missing_local_fpaths, missing_bucket_fpaths = _select_missing_fpaths(
+                local_fpaths=local_fpaths, bucket_fpaths=bucket_fpaths
+            )
+            metrics = get_metrics()
+            metrics.inc("cache_hits", len(local_fpaths) - len(missing_local_fpaths))
+            metrics.inc("cache_misses", len(missing_local_fpaths))
+            if len(missing_local_fpaths) > 0:
+                create_local_directories(missing_local_fpaths)
+                l_bucket_errors = _fs_get_parallel(
+                    bucket_fpaths=missing_bucket_fpaths,
+                    local_fpaths=missing_local_fpaths,
+                    fs=self.fs,
+                    n_threads=n_threads,
+                    progress_bar=progress_bar,
+                )
+                if len(l_bucket_errors) > 0:
+                    failed_fpaths = self.get_local_fpaths(l_bucket_errors)
+                    self._remove(failed_fpaths)
+                    raise OSError(f"Unable to download the following files: {l_bucket_errors}")
+            # Update the index and enforce the quota
+            self._register(local_fpaths)
+            self.evict()
+        return local_fpaths
+
+
+####--------------------------------------------------------------------------.
+#### Read-through caching filesystem
+
+_FSSPEC_CACHE_TYPES = {
+    "blocks": "blockcache",
+    "whole": "filecache",
+}
+
+_FS_SCHEMA = """
+CREATE TABLE IF NOT EXISTS fs_files (
+    path TEXT PRIMARY KEY,
+    size INTEGER NOT NULL,
+    cached_time REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS fs_files_last_access ON fs_files (last_access);
+"""
+
+
+def _get_cache_key(fpath):
+    """Return the bucket path (without protocol) identifying a cached file."""
+    return os.fspath(fpath).split("://", 1)[-1].rstrip("/")
+
+
+def _get_default_fs_cache_dir():
+    """Return the default directory of the read-through cache."""
+    return os.path.join(os.path.expanduser("~"), ".cache", "himawari_api", "fs")
+
+
+class CachedFileSystem:
+    """Read-through local cache of the bucket files.
+
+    The class wraps the fsspec filesystem returned by `himawari_api.io.get_filesystem`
+    in a fsspec block cache ("blocks": only the bytes read are downloaded)
+    or whole-file cache ("whole": the full file is downloaded at first access).
+    The cache directory can be shared across processes and sessions.
+    The size and access times of the cached files are tracked in a SQLite index
+    located in `cache_dir`, and the files are evicted through the fsspec
+    `pop_from_cache` method.
+    The other fsspec methods (i.e. `glob`, `info`, `cat`) are forwarded
+    to the underlying caching filesystem.
+
+    Parameters
+    ----------
+    protocol : str, optional
+        Cloud bucket storage of the files. The default is "s3".
+    cache : str, optional
+        Either "blocks" or "whole". The default is "blocks".
+    cache_dir : str, optional
+        Directory where the cached files are stored.
+        The default is "~/.cache/himawari_api/fs".
+    max_bytes : int, optional
+        Maximum size of the cache directory (in bytes). When exceeded, the least
+        recently used files are removed. The default is None (no limit).
+    expiry_time : float, optional
+        Time (in seconds) after which a cached file is downloaded again.
+        The default is None (no expiry).
+    fs_args : dict, optional
+        Dictionary specifying optional settings to initiate the fsspec.filesystem.
+    """
+
+    def __init__(self, protocol="s3", cache="blocks", cache_dir=None, max_bytes=None,
+                 expiry_time=None, fs_args={}):
+        import fsspec
+        from himawari_api.io import get_filesystem
+
+        if cache not in _FSSPEC_CACHE_TYPES:
+            raise ValueError(f"Valid `cache` are {list(_FSSPEC_CACHE_TYPES)}.")
+        if cache_dir is None:
+            cache_dir = _get_default_fs_cache_dir()
+        os.makedirs(cache_dir, exist_ok=True)
+        self.cache = cache
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.expiry_time = expiry_time
+        self.hits = 0
+        self.misses = 0
+        # Files of the block cache currently open (they can not be evicted)
+        self._open_files = weakref.WeakSet()
+        self._conn = self._connect()
+        self.fs = fsspec.filesystem(
+            _FSSPEC_CACHE_TYPES[cache],
+            fs=get_filesystem(protocol=protocol, fs_args=dict(fs_args)),
+            cache_storage=cache_dir,
+            expiry_time=expiry_time or False,
+            check_files=False,
+        )
+
+    def __repr__(self):
+        return f"CachedFileSystem(cache='{self.cache}', cache_dir='{self.cache_dir}')"
+
+    def __getattr__(self, name):
+        return getattr(self.fs, name)
+
+    def _connect(self):
+        """Open the connection to the cache index."""
+        conn = sqlite3.connect(
+            os.path.join(self.cache_dir, _INDEX_FNAME), timeout=60, check_same_thread=False
+        )
+        conn.executescript(_FS_SCHEMA)
+        conn.commit()
+        return conn
+
+    def close(self):
+        """Close the connection to the cache index."""
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    ####----------------------------------------------------------------------.
+    #### Index
+
+    def _is_cached(self, key):
+        """Return True if the file is in the cache index and not expired."""
+        row = self._conn.execute("SELECT cached_time FROM fs_files WHERE path = ?", (key,)).fetchone()
+        if row is None:
+            return False
+        return not self.expiry_time or time.time() - row[0] < self.expiry_time
+
+    def _record_access(self, fpath):
+        """Update the hit/miss counters before accessing a file.
+
+        Returns True if the file is cached.
+        """
+        if self._is_cached(_get_cache_key(fpath)):
+            self.hits += 1
+            get_metrics().inc("cache_hits")
+            return True
+        self.misses += 1
+        get_metrics().inc("cache_misses")
+        return False
+
+    def _register(self, fpath, size, cached):
+        """Add the accessed file to the cache index (or update its access time)."""
+        key = _get_cache_key(fpath)
+        now = time.time()
+        with self._conn:
+            if cached:
+                self._conn.execute("UPDATE fs_files SET last_access = ? WHERE path = ?", (now, key))
+            else:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO fs_files (path, size, cached_time, last_access) VALUES (?, ?, ?, ?)",
+                    (key, size, now, now),
+                )
+
+    def open(self, fpath, mode="rb", **kwargs):
+        """Open a bucket file through the cache."""
+        cached = self._record_access(fpath)
+        f = self.fs.open(os.fspath(fpath), mode=mode, **kwargs)
+        # - The block cache returns the local copy of the fully cached files
+        if self.cache == "blocks" and not hasattr(f, "name"):
+            self._open_files.add(f)
+            size = f.size
+        else:
+            size = os.path.getsize(f.name)
+        self._register(fpath, size, cached)
+        self._enforce_max_bytes(exclude={_get_cache_key(fpath)})
+        return f
+
+    def open_files(self, fpaths, mode="rb"):
+        """
+        Return ready-to-open file objects of bucket files.
+
+        The files are opened (and cached) only when used as context managers
+        (i.e. `with f as fobj:`) or when calling their `open()` method.
+
+        Returns
+        -------
+        files : list
+            List of fsspec.core.OpenFile.
+        """
+        from fsspec.core import OpenFile
+
+        return [OpenFile(self, os.fspath(fpath), mode=mode) for fpath in fpaths]
+
+    def get_local_fpaths(self, fpaths):
+        """
+        Return the local paths of bucket files, downloading the files not yet cached.
+
+        It is available only with the "whole" cache.
+        """
+        if self.cache != "whole":
+            raise ValueError("Local paths are available only with cache='whole'.")
+        local_fpaths = []
+        for fpath in fpaths:
+            cached = self._record_access(fpath)
+            with self.fs.open(os.fspath(fpath), mode="rb") as f:
+                local_fpaths.append(f.name)
+            self._register(fpath, os.path.getsize(f.name), cached)
+        self._enforce_max_bytes(exclude={_get_cache_key(fpath) for fpath in fpaths})
+        return local_fpaths
+
+    ####----------------------------------------------------------------------.
+    #### Eviction
+
+    def _enforce_max_bytes(self, exclude=()):
+        """Remove the least recently used files exceeding the size limit.
+
+        The files in `exclude` and the open files of the block cache are not removed.
+        Returns the bucket paths of the removed files.
+        """
+        if self.max_bytes is None:
+            return []
+        exclude = set(exclude) | {_get_cache_key(f.path) for f in list(self._open_files) if not f.closed}
+        rows = self._conn.execute("SELECT path, size FROM fs_files ORDER BY last_access").fetchall()
+        total_bytes = sum(size for _, size in rows)
+        if total_bytes <= self.max_bytes:
+            return []
+        # Reload the fsspec metadata of the files cached by other processes
+        self.fs.load_cache()
+        evicted = []
+        for key, size in rows:
+            if total_bytes <= self.max_bytes:
+                break
+            if key in exclude:
+                continue
+            # Remove the cached file and its fsspec metadata
+            with contextlib.suppress(FileNotFoundError):
+                self.fs.pop_from_cache(key)
+            evicted.append(key)
+            total_bytes -= size
+        with self._conn:
+            self._conn.executemany("DELETE FROM fs_files WHERE path = ?", [(key,) for key in evicted])
+        return evicted
+
+    def stats(self):
+        """
+        Return the cache statistics.
+
+        Returns
+        -------
+        stats : dict
+            Dictionary with the number of 'hits' and 'misses', the 'hit_rate',
+            and the number of 'cached_files' and 'cached_bytes'.
+        """
+        n_cached_files, cached_bytes = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM fs_files"
+        ).fetchone()
+        n_accesses = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / n_accesses if n_accesses > 0 else None,
+            "cached_files": n_cached_files,
+            "cached_bytes": cached_bytes,
+        }
+
+    def clear(self):
+        """Remove all the cached files."""
+        # The index is located in the cache directory removed by fsspec
+        self._conn.close()
+        self.fs.clear_cache()
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self._conn = self._connect()
+
+
+####--------------------------------------------------------------------------.
@@ -18,8 +18,16 @@
 
 import os
 import datetime
-import numpy as np
-from himawari_api.alias import PROTOCOLS, _satellites, _sectors, _channels
+from himawari_api.alias import (
+    PROTOCOLS,
+    _satellites,
+    _sectors,
+    _channels,
+    _satellites_lookup,
+    _sectors_lookup,
+    _channels_lookup,
+    _products_lookup,
+)
 
 
 def _check_protocol(protocol):
@@ -51,11 +59,7 @@ def _check_satellite(satellite):
     if not isinstance(satellite, str):
         raise TypeError("`satellite` must be a string.")
     # Retrieve satellite key accounting for possible aliases
-    satellite_key = None
-    for key, possible_values in _satellites.items():
-        if satellite.upper() in possible_values:
-            satellite_key = key
-            break
+    satellite_key = _satellites_lookup.get(satellite.strip().upper())
     if satellite_key is None:
         valid_satellite_key = list(_satellites.keys())
         raise ValueError(f"Available satellite: {valid_satellite_key}")
@@ -64,26 +68,23 @@ def _check_satellite(satellite):
 
 def _check_sector(sector, product=None):                                      
     """Check sector validity."""
-    from himawari_api.info import available_sectors 
-    
+    from himawari_api.listing import AHI_L2_SECTOR_EXCEPTIONS
+
     if sector is None: 
         raise ValueError("'sector' must be specified.")
 
     if not isinstance(sector, str):
         raise TypeError("`sector` must be a string.")
     # Retrieve sector key accounting for possible aliases
-    sector_key = None
-    for key, possible_values in _sectors.items():
-        if sector.upper() in possible_values:
-            sector_key = key
-            break
+    sector_key = _sectors_lookup.get(sector.strip().upper())
     # Raise error if provided unvalid sector key
     if sector_key is None:
         valid_sector_keys = list(_sectors.keys())
         raise ValueError(f"Available sectors: {valid_sector_keys}")
     # Check the sector is valid for a given product (if specified)
-    valid_sectors = available_sectors(product=product)
     if product is not None:
+        product = _check_product(product)
+        valid_sectors = AHI_L2_SECTOR_EXCEPTIONS.get(product, list(_sectors))
         if sector_key not in valid_sectors:
             raise ValueError(
                 f"Valid sectors for product {product} are {valid_sectors}."
@@ -93,15 +94,14 @@ def _check_sector(sector, product=None):
 
 def _check_product_level(product_level, product=None):
     """Check product_level validity."""
-    from himawari_api.info import get_dict_product_level_products
-    
     if not isinstance(product_level, str):
         raise TypeError("`product_level` must be a string.")
     product_level = product_level.capitalize()
     if product_level not in ["L1b", "L2"]:
         raise ValueError("Available product levels are ['L1b', 'L2'].")
     if product is not None:
-        if product not in get_dict_product_level_products()[product_level]:
+        product_info = _products_lookup.get(product.strip().upper())
+        if product_info is None or product_info[1] != product_level:
             raise ValueError(
                 f"`product_level` '{product_level}' does not include product '{product}'."
             )
@@ -119,18 +119,19 @@ def _check_product_levels(product_levels):
 
 def _check_product(product, product_level=None):
     """Check product validity."""
-    from himawari_api.info import available_products 
-    
     if not isinstance(product, str):
         raise TypeError("`product` must be a string.")
-    valid_products = available_products(product_levels=product_level)
     # Retrieve product by accounting for possible aliases (upper/lower case)
     product_key = None
-    for possible_values in valid_products:
-        if possible_values.upper() == product.upper():
-            product_key = possible_values
-            break
+    product_info = _products_lookup.get(product.strip().upper())
+    if product_info is not None:
+        product_key, product_key_level = product_info
+        if product_level is not None and product_key_level != _check_product_level(product_level):
+            product_key = None
     if product_key is None:
+        from himawari_api.info import available_products
+
+        valid_products = available_products(product_levels=product_level)
         if product_level is None:
             raise ValueError(f"Available products: {valid_products}")
         else:
@@ -141,6 +142,8 @@ def _check_product(product, product_level=None):
 
 def _check_time(time):
     """Check time validity."""
+    import numpy as np
+
     if not isinstance(time, (datetime.datetime, datetime.date, np.datetime64, str)):
         raise TypeError(
             "Specify time with datetime.datetime objects or a "
@@ -206,21 +209,12 @@ def _check_channel(channel):
     """Check channel validity."""
     if not isinstance(channel, str):
         raise TypeError("`channel` must be a string.")
-    # Check channel follow standard name
-    channel = channel.upper()
-    if channel in list(_channels.keys()):
-        return channel
     # Retrieve channel key accounting for possible aliases
-    else:
-        channel_key = None
-        for key, possible_values in _channels.items():
-            if channel.upper() in possible_values:
-                channel_key = key
-                break
-        if channel_key is None:
-            valid_channels_key = list(_channels.keys())
-            raise ValueError(f"Available channels: {valid_channels_key}")
-        return channel_key
+    channel_key = _channels_lookup.get(channel.strip().upper())
+    if channel_key is None:
+        valid_channels_key = list(_channels.keys())
+        raise ValueError(f"Available channels: {valid_channels_key}")
+    return channel_key
 
 
 def _check_channels(channels=None):
@@ -235,6 +229,8 @@ def _check_channels(channels=None):
 
 def _check_scene_abbr(scene_abbr, sector=None):                 
     """Check AHI Japan, Target and Landmark sector scene_abbr validity."""
+    import numpy as np
+
     if scene_abbr is None:
         return scene_abbr
     if sector is not None:
@@ -264,19 +260,116 @@ def _check_scene_abbr(scene_abbr, sector=None):
     return scene_abbr
 
 
+_VALID_RESOLUTION_POLICIES = ["finest", "coarsest"]
+
+
+def _check_channel_resolution(resolution):
+    """Check the resolution selection policy of a channel ('finest', 'coarsest' or a km value)."""
+    import numpy as np
+    from himawari_api.geometry import _check_resolution
+
+    if isinstance(resolution, str):
+        if resolution.lower() not in _VALID_RESOLUTION_POLICIES:
+            raise ValueError(
+                f"Valid `resolution` are {_VALID_RESOLUTION_POLICIES} or a spatial resolution in km."
+            )
+        return resolution.lower()
+    if isinstance(resolution, bool) or not isinstance(resolution, (int, float, np.number)):
+        raise TypeError("`resolution` must be a string, a number (in km) or a dictionary.")
+    return _check_resolution(resolution)
+
+
+def _check_resolution_policy(resolution=None):
+    """Check the `resolution` filter parameter validity.
+
+    It can be 'finest', 'coarsest', a spatial resolution in km or
+    a dictionary {channel: resolution} of per-channel policies.
+    """
+    if resolution is None:
+        return resolution
+    if isinstance(resolution, dict):
+        return {
+            _check_channel(channel): _check_channel_resolution(value)
+            for channel, value in resolution.items()
+        }
+    return _check_channel_resolution(resolution)
+
+
+def _check_composites(composites=None):
+    """Check composites validity."""
+    from himawari_api.listing import AHI_COMPOSITES
+
+    if composites is None:
+        return composites
+    if isinstance(composites, str):
+        composites = [composites]
+    valid_composites = list(AHI_COMPOSITES)
+    for composite in composites:
+        if not isinstance(composite, str):
+            raise TypeError("`composites` must be a string or a list of strings.")
+        if composite.lower() not in AHI_COMPOSITES:
+            raise ValueError(f"Available composites: {valid_composites}")
+    composites = [composite.lower() for composite in composites]
+    return composites
+
+
+def _get_composites_channels(composites, channels=None):
+    """Return the channels required by the composites (and the specified channels)."""
+    from himawari_api.listing import AHI_COMPOSITES
+
+    required_channels = set(channels) if channels is not None else set()
+    for composite in composites:
+        required_channels.update(AHI_COMPOSITES[composite])
+    return sorted(required_channels)
+
+
+def _get_composites_resolution(composites, resolution=None):
+    """Return the resolution policy selecting the composites channels at their native resolution.
+
+    A 'finest', 'coarsest' or km `resolution` policy is returned unchanged.
+    The channels of a per-channel `resolution` dictionary keep their policy.
+    """
+    from himawari_api.listing import AHI_CHANNELS_SPATIAL_RES
+
+    if resolution is not None and not isinstance(resolution, dict):
+        return resolution
+    composites_resolution = {
+        channel: AHI_CHANNELS_SPATIAL_RES[channel] / 10
+        for channel in _get_composites_channels(composites)
+    }
+    composites_resolution.update(resolution or {})
+    return composites_resolution
+
+
 def _check_filter_parameters(filter_parameters, sector):          
     """Check filter parameters validity.
 
     It ensures that channels and scene_abbr are valid lists (or None).
+    If `composites` are specified, the channels required to create the
+    composites are added to the `channels` filter and, unless specified
+    otherwise by `resolution`, selected at their native resolution.
+    The `resolution` policy is checked by `_check_resolution_policy`.
     """
     if not isinstance(filter_parameters, dict):
         raise TypeError("filter_parameters must be a dictionary.")
+    filter_parameters = filter_parameters.copy()
     channels = filter_parameters.get("channels")
     scene_abbr = filter_parameters.get("scene_abbr")
+    composites = _check_composites(filter_parameters.pop("composites", None))
     if channels:
         filter_parameters["channels"] = _check_channels(channels)
+    if composites:
+        filter_parameters["channels"] = _get_composites_channels(
+            composites, channels=filter_parameters.get("channels")
+        )
     if scene_abbr:
         filter_parameters["scene_abbr"] = _check_scene_abbr(scene_abbr, sector=sector)
+    if filter_parameters.get("resolution") is not None:
+        filter_parameters["resolution"] = _check_resolution_policy(filter_parameters["resolution"])
+    if composites:
+        filter_parameters["resolution"] = _get_composites_resolution(
+            composites, resolution=filter_parameters.get("resolution")
+        )
     return filter_parameters
 
 
@@ -317,6 +410,8 @@ def _check_connection_type(connection_type, protocol):
 def _check_interval_regularity(list_datetime):
     """Check regularity of a list of timesteps."""
     # TODO: raise info when missing between ... and ...
+    import numpy as np
+
     if len(list_datetime) < 2:
         return None
     list_datetime = sorted(list_datetime)
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Define the `himawari-api` command-line interface.
+
+Examples
+--------
+    himawari-api catalog products
+    himawari-api find --satellite himawari-9 --product-level L1b --product Rad --sector FLDK \\
+        --start-time "2023-01-01 00:00" --end-time "2023-01-01 01:00" --channels B13
+    himawari-api download --base-dir /data ... --report report.json
+    himawari-api download --base-dir /data ... --n-workers 8
+    himawari-api sync --base-dir /data ... --delete
+    himawari-api watch --satellite himawari-9 --product-level L1b --product Rad --sector Japan
+    himawari-api ingest --base-dir /data --satellite himawari-9 --product-level L1b \\
+        --product Rad --sector FLDK --channels B13
+"""
+
+import argparse
+import datetime
+import json
+import sys
+
+_CATALOG_ITEMS = [
+    "protocols",
+    "satellites",
+    "sectors",
+    "product_levels",
+    "products",
+    "channels",
+    "composites",
+    "group_keys",
+    "connection_types",
+]
+
+
+####--------------------------------------------------------------------------.
+#### Arguments
+
+
+def _add_product_arguments(parser):
+    """Add the product and filtering arguments."""
+    parser.add_argument("--satellite", required=True)
+    parser.add_argument("--product-level", required=True)
+    parser.add_argument("--product", required=True)
+    parser.add_argument("--sector", required=True)
+    parser.add_argument("--channels", nargs="+", default=None)
+    parser.add_argument("--composites", nargs="+", default=None)
+    parser.add_argument("--scene-abbr", nargs="+", default=None)
+    _add_resolution_argument(parser)
+
+
+def _parse_resolution(resolution):
+    """Parse the 'finest', 'coarsest', <km> or JSON {channel: resolution} resolution policy."""
+    if resolution.lstrip().startswith("{"):
+        return json.loads(resolution)
+    try:
+        return float(resolution)
+    except ValueError:
+        return resolution
+
+
+def _add_resolution_argument(parser):
+    """Add the L1b Rad resolution selection argument."""
+    parser.add_argument(
+        "--resolution", type=_parse_resolution, default=None,
+        help="'finest' (default), 'coarsest', a resolution in km or a JSON {channel: resolution}.",
+    )
+
+
+def _parse_time(time):
+    """Parse a time string of format 'YYYY-MM-DD hh:mm:ss'."""
+    from himawari_api.checks import _check_time
+
+    try:
+        return _check_time(time)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def _add_time_arguments(parser, required=True):
+    """Add the time period arguments."""
+    for key in ["--start-time", "--end-time"]:
+        parser.add_argument(key, required=required, type=_parse_time, help="Format 'YYYY-MM-DD hh:mm:ss'.")
+
+
+def _add_storage_arguments(parser, local=True):
+    """Add the storage arguments."""
+    if local:
+        parser.add_argument("--base-dir", default=None, help="Search the local storage.")
+    parser.add_argument("--protocol", default=None, help="Cloud bucket storage (i.e. 's3').")
+    parser.add_argument(
+        "--fs-args", type=json.loads, default={}, help="JSON dictionary of fsspec filesystem settings."
+    )
+    parser.add_argument("--max-bytes-per-second", type=float, default=None, help="Download bandwidth limit.")
+    parser.add_argument(
+        "--max-requests-per-second", type=float, default=None, help="Limit of the requests to the bucket."
+    )
+
+
+def _get_filter_parameters(args):
+    """Return the filter_parameters dictionary of the parsed arguments."""
+    filter_parameters = {}
+    for key in ["channels", "composites", "scene_abbr", "resolution"]:
+        value = getattr(args, key)
+        if value is not None:
+            filter_parameters[key] = value
+    return filter_parameters
+
+
+def _get_product_kwargs(args):
+    """Return the product arguments of the himawari_api functions."""
+    return {
+        "satellite": args.satellite,
+        "product_level": args.product_level,
+        "product": args.product,
+        "sector": args.sector,
+        "filter_parameters": _get_filter_parameters(args),
+    }
+
+
+def _get_search_protocol(args):
+    """Return the protocol of a search (None if searching the local storage)."""
+    if args.base_dir is not None and args.protocol is None:
+        return None
+    return args.protocol or "s3"
+
+
+def _print_json(obj):
+    """Print an object in the JSON format."""
+    print(json.dumps(obj, indent=1, default=str))
+
+
+####--------------------------------------------------------------------------.
+#### Commands
+
+
+def _run_catalog(args):
+    import himawari_api
+
+    _print_json(getattr(himawari_api, f"available_{args.item}")())
+
+
+def _run_find(args):
+    from himawari_api.search import find_files
+
+    fpaths = find_files(
+        start_time=args.start_time,
+        end_time=args.end_time,
+        base_dir=args.base_dir,
+        protocol=_get_search_protocol(args),
+        fs_args=args.fs_args,
+        group_by_key=args.group_by_key,
+        connection_type=args.connection_type,
+        verbose=False,
+        **_get_product_kwargs(args),
+    )
+    if isinstance(fpaths, dict):
+        _print_json({str(key): values for key, values in fpaths.items()})
+    else:
+        print("\n".join(fpaths))
+
+
+def _run_download(args):
+    from himawari_api.download import DownloadReport, download_files
+
+    if args.retry is None:
+        required = ["base_dir", "satellite", "product_level", "product", "sector", "start_time", "end_time"]
+        missing = ["--" + key.replace("_", "-") for key in required if getattr(args, key) is None]
+        if missing:
+            raise ValueError(f"the following arguments are required: {', '.join(missing)}")
+    if args.retry is not None:
+        report = DownloadReport.from_json(args.retry)
+        report.retry_failed(fs_args=args.fs_args, n_threads=args.n_threads, progress_bar=not args.quiet)
+    elif args.n_workers is not None:
+        from himawari_api.partition import download_partitioned
+
+        report = download_partitioned(
+            base_dir=args.base_dir,
+            product_specs=_get_product_kwargs(args),
+            start_time=args.start_time,
+            end_time=args.end_time,
+            protocol=args.protocol or "s3",
+            fs_args=args.fs_args,
+            n_workers=args.n_workers,
+            n_threads=args.n_threads,
+            job_dir=args.job_dir,
+            force_download=args.force,
+            check_data_integrity=not args.no_integrity_check,
+            progress_bar=not args.quiet,
+            verbose=not args.quiet,
+        )
+    else:
+        report = download_files(
+            base_dir=args.base_dir,
+            protocol=args.protocol or "s3",
+            fs_args=args.fs_args,
+            start_time=args.start_time,
+            end_time=args.end_time,
+            n_threads=args.n_threads,
+            force_download=args.force,
+            check_data_integrity=not args.no_integrity_check,
+            progress_bar=not args.quiet,
+            verbose=not args.quiet,
+            return_report=True,
+            manifest=args.manifest,
+            **_get_product_kwargs(args),
+        )
+    if args.report is not None:
+        report.to_json(args.report)
+    _print_json(report.summary())
+    return int(len(report.failed_fpaths) > 0)
+
+
+def _run_sync(args):
+    from himawari_api.sync import sync
+
+    spec = _get_product_kwargs(args)
+    report = sync(
+        product_specs=spec,
+        start_time=args.start_time,
+        end_time=args.end_time,
+        base_dir=args.base_dir,
+        protocol=args.protocol or "s3",
+        fs_args=args.fs_args,
+        delete=args.delete,
+        force_delete=args.force_delete,
+        n_threads=args.n_threads,
+        dry_run=args.dry_run,
+        progress_bar=not args.quiet,
+        verbose=not args.quiet,
+    )
+    return int(len(report["failed"]) > 0)
+
+
+def _get_watch_kwargs(args):
+    """Return the polling arguments of the watch and ingest commands."""
+    kwargs = {"lookback": datetime.timedelta(minutes=args.lookback)}
+    if args.poll_interval is not None:
+        kwargs["poll_interval"] = datetime.timedelta(seconds=args.poll_interval)
+    return kwargs
+
+
+def _run_watch(args):
+    from himawari_api.ingest import NRTWatcher
+
+    watcher = NRTWatcher(
+        base_dir=args.base_dir,
+        protocol=_get_search_protocol(args),
+        fs_args=args.fs_args,
+        **_get_product_kwargs(args),
+        **_get_watch_kwargs(args),
+    )
+    for fpaths in watcher.iter_new_files(max_polls=args.max_polls, adaptive=args.adaptive):
+        for fpath in fpaths:
+            print(fpath, flush=True)
+
+
+def _run_ingest(args):
+    from himawari_api.ingest import ingest
+
+    ingest(
+        base_dir=args.base_dir,
+        protocol=args.protocol or "s3",
+        fs_args=args.fs_args,
+        n_threads=args.n_threads,
+        max_polls=args.max_polls,
+        adaptive=args.adaptive,
+        verbose=not args.quiet,
+        **_get_product_kwargs(args),
+        **_get_watch_kwargs(args),
+    )
+
+
+####--------------------------------------------------------------------------.
+#### Parser
+
+
+def get_parser():
+    """Return the `himawari-api` argument parser."""
+    parser = argparse.ArgumentParser(
+        prog="himawari-api",
+        description="Search, download and ingest Himawari AHI data.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    # catalog
+    subparser = subparsers.add_parser("catalog", help="List the available products, channels, ...")
+    subparser.add_argument("item", choices=_CATALOG_ITEMS)
+    subparser.set_defaults(func=_run_catalog)
+
+    # find
+    subparser = subparsers.add_parser("find", help="Search files on local or cloud bucket storage.")
+    _add_product_arguments(subparser)
+    _add_time_arguments(subparser)
+    _add_storage_arguments(subparser)
+    subparser.add_argument("--group-by-key", default=None)
+    subparser.add_argument("--connection-type", default=None)
+    subparser.set_defaults(func=_run_find)
+
+    # download
+    subparser = subparsers.add_parser("download", help="Download files from a cloud bucket.")
+    subparser.add_argument("--retry", default=None, metavar="REPORT", help="Retry the failed files of a JSON report.")
+    # - The product and time arguments are not required with --retry
+    subparser.add_argument("--base-dir", default=None)
+    for key in ["--satellite", "--product-level", "--product", "--sector"]:
+        subparser.add_argument(key, default=None)
+    _add_time_arguments(subparser, required=False)
+    for key in ["--channels", "--composites", "--scene-abbr"]:
+        subparser.add_argument(key, nargs="+", default=None)
+    _add_resolution_argument(subparser)
+    _add_storage_arguments(subparser, local=False)
+    subparser.add_argument("--n-threads", type=int, default=20)
+    subparser.add_argument("--force", action="store_true", help="Overwrite the existing files.")
+    subparser.add_argument("--no-integrity-check", action="store_true")
+    subparser.add_argument(
+        "--n-workers", type=int, default=None,
+        help="Download the daily blocks of each product in parallel worker processes (resumable).",
+    )
+    subparser.add_argument("--job-dir", default=None, help="Directory of the shard checkpoints (with --n-workers).")
+    subparser.add_argument(
+        "--manifest", default=None,
+        help="SQLite job manifest of the completed blocks and verified files, to resume the download.",
+    )
+    subparser.add_argument("--report", default=None, help="Write the JSON download report.")
+    subparser.add_argument("--quiet", action="store_true")
+    subparser.set_defaults(func=_run_download)
+
+    # sync
+    subparser = subparsers.add_parser("sync", help="Synchronize a local mirror with a cloud bucket.")
+    subparser.add_argument("--base-dir", required=True)
+    _add_product_arguments(subparser)
+    _add_time_arguments(subparser)
+    _add_storage_arguments(subparser, local=False)
+    subparser.add_argument("--delete", action="store_true", help="Delete the local files not on the bucket.")
+    subparser.add_argument(
+        "--force-delete", action="store_true", help="Delete also the local files of blocks with no remote files."
+    )
+    subparser.add_argument("--dry-run", action="store_true")
+    subparser.add_argument("--n-threads", type=int, default=20)
+    subparser.add_argument("--quiet", action="store_true")
+    subparser.set_defaults(func=_run_sync)
+
+    # watch and ingest
+    for command in ["watch", "ingest"]:
+        if command == "watch":
+            subparser = subparsers.add_parser("watch", help="Print the new files as they are published.")
+            _add_storage_arguments(subparser)
+        else:
+            subparser = subparsers.add_parser("ingest", help="Continuously download the new files.")
+            subparser.add_argument("--base-dir", required=True)
+            _add_storage_arguments(subparser, local=False)
+            subparser.add_argument("--n-threads", type=int, default=20)
+            subparser.add_argument("--quiet", action="store_true")
+        _add_product_arguments(subparser)
+        subparser.add_argument(
+            "--lookback", type=float, default=30, help="Minutes listed at each poll. The default is 30."
+        )
+        subparser.add_argument(
+            "--poll-interval", type=float, default=None,
+            help="Seconds between two polls. The default is the sector acquisition cadence.",
+        )
+        subparser.add_argument("--max-polls", type=int, default=None)
+        subparser.add_argument(
+            "--adaptive", action="store_true",
+            help="Wait for each next acquisition at its expected publication time.",
+        )
+        subparser.set_defaults(func=_run_watch if command == "watch" else _run_ingest)
+    return parser
+
+
+def main(argv=None):
+    """Run the `himawari-api` command."""
+    parser = get_parser()
+    args = parser.parse_args(argv)
+    try:
+        max_bytes_per_second = getattr(args, "max_bytes_per_second", None)
+        max_requests_per_second = getattr(args, "max_requests_per_second", None)
+        if max_bytes_per_second is not None or max_requests_per_second is not None:
+            from himawari_api.ratelimit import set_rate_limits
+
+            set_rate_limits(bytes_per_second=max_bytes_per_second, requests_per_second=max_requests_per_second)
+        return args.func(args) or 0
+    except KeyboardInterrupt:
+        return 130
+    except BrokenPipeError:
+        # The output is piped into a command which exited (i.e. head)
+        return 0
+    except (ValueError, TypeError, OSError) as e:
+        parser.exit(2, f"himawari-api {args.command}: error: {e}\n")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
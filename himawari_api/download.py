@@ -19,15 +19,15 @@
 import os
 import time
 import datetime
+import contextlib
 import numpy as np
-import pandas as pd
-import concurrent.futures
-from concurrent.futures import ThreadPoolExecutor
-from tqdm import tqdm
 from himawari_api.io import get_filesystem
 from himawari_api.info import group_files
 from himawari_api.checks import _check_satellite, _check_base_dir
+from himawari_api.metrics import get_metrics
+from himawari_api.ratelimit import get_priority, get_rate_limiter
 from himawari_api.search import (
+    _check_search_inputs,
     find_files,
     find_closest_start_time,
     find_latest_start_time,
@@ -71,22 +71,28 @@ def remove_corrupted_files(local_fpaths, bucket_fpaths, fs, return_corrupted_fpa
     (list_<valid/corrupted>_local_filepaths, list_<valid/corrupted>_bucket_filepaths)
 
     """
+    metrics = get_metrics()
+    rate_limiter = get_rate_limiter()
     l_corrupted_local = []
     l_corrupted_bucket = []
     l_valid_local = []
     l_valid_bucket = []
-    for local_fpath, bucket_fpath in zip(local_fpaths, bucket_fpaths):
-        local_exists = os.path.isfile(local_fpath)
-        if local_exists:
-            bucket_size = fs.info(bucket_fpath)["Size"]
-            local_size = os.path.getsize(local_fpath)
-            if bucket_size != local_size:
-                os.remove(local_fpath)
-                l_corrupted_local.append(local_fpath)
-                l_corrupted_bucket.append(bucket_fpath)
-            else:
-                l_valid_local.append(local_fpath)
-                l_valid_bucket.append(bucket_fpath)
+    with metrics.timer("check_size"):
+        for local_fpath, bucket_fpath in zip(local_fpaths, bucket_fpaths):
+            local_exists = os.path.isfile(local_fpath)
+            if local_exists:
+                rate_limiter.request()
+                bucket_size = fs.info(bucket_fpath)["size"]
+                metrics.inc("head_requests")
+                local_size = os.path.getsize(local_fpath)
+                if bucket_size != local_size:
+                    os.remove(local_fpath)
+                    l_corrupted_local.append(local_fpath)
+                    l_corrupted_bucket.append(bucket_fpath)
+                else:
+                    l_valid_local.append(local_fpath)
+                    l_valid_bucket.append(bucket_fpath)
+    metrics.inc("files_corrupted", len(l_corrupted_local))
     if return_corrupted_fpaths:
         return l_corrupted_local, l_corrupted_bucket
     else:
@@ -125,9 +131,174 @@ def _get_local_from_bucket_fpaths(base_dir, satellite, bucket_fpaths):
     return fpaths
 
 
-def _fs_get_parallel(bucket_fpaths, local_fpaths, fs, n_threads=10, progress_bar=True):
+# Directory (within the destination directory) of the lock and partial files
+_DOWNLOAD_TMP_DIR = ".download"
+
+
+def _get_download_tmp_fpaths(local_fpath):
+    """Return the lock and partial filepaths of a local destination filepath.
+
+    They are placed in a hidden subdirectory so that they are never
+    matched by the file search patterns.
+    """
+    tmp_dir = os.path.join(os.path.dirname(local_fpath), _DOWNLOAD_TMP_DIR)
+    fname = os.path.basename(local_fpath)
+    return os.path.join(tmp_dir, fname + ".lock"), os.path.join(tmp_dir, fname + ".part")
+
+
+def _lock_fd(fd):
+    """Try to acquire an exclusive lock on the open file `fd`. Return True if acquired."""
+    try:
+        import fcntl
+
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except ImportError:  # Windows
+        import msvcrt
+
+        try:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            return False
+    except OSError:
+        return False
+    return True
+
+
+def _unlock_fd(fd):
+    """Release the lock acquired by `_lock_fd`."""
+    try:
+        import fcntl
+
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    except ImportError:  # Windows
+        import msvcrt
+
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def _is_same_file(fd, fpath):
+    """Return True if the open file `fd` is the file currently at `fpath`."""
+    try:
+        return os.path.samestat(os.fstat(fd), os.stat(fpath))
+    except FileNotFoundError:
+        return False
+
+
+@contextlib.contextmanager
+def _file_lock(lock_fpath, timeout=None, poll_interval=0.2):
+    """Acquire an exclusive lock on `lock_fpath`, shared across processes.
+
+    If the lock is held by another process, wait until it is released.
+    The lock file is removed when the lock is released (together with its
+    directory if empty), so that no lock files are left on the local storage.
+    """
+    lock_dir = os.path.dirname(lock_fpath)
+    t_start = time.time()
+    while True:
+        try:
+            os.makedirs(lock_dir, exist_ok=True)
+            fd = os.open(lock_fpath, os.O_RDWR | os.O_CREAT, 0o666)
+        except FileNotFoundError:
+            # The directory has been removed by another process in the meantime
+            continue
+        if _lock_fd(fd):
+            # The previous holder might have removed the lock file after it
+            # has been opened: the lock is valid only if the file is still in place
+            if _is_same_file(fd, lock_fpath):
+                break
+            _unlock_fd(fd)
+            os.close(fd)
+            continue
+        os.close(fd)
+        if timeout is not None and time.time() - t_start > timeout:
+            raise TimeoutError(f"Unable to acquire the lock {lock_fpath} within {timeout} seconds.")
+        time.sleep(poll_interval)
+    try:
+        yield
+    finally:
+        # Remove the lock file while the lock is held
+        # - On Windows, an open file can not be removed: the lock file is left in place
+        with contextlib.suppress(OSError):
+            os.remove(lock_fpath)
+        with contextlib.suppress(OSError):
+            os.rmdir(lock_dir)
+        _unlock_fd(fd)
+        os.close(fd)
+
+
+def _fs_get_file(fs, bucket_fpath, local_fpath, overwrite=False, lock_timeout=None, priority=None):
+    """
+    Download a file, coordinating with the other processes downloading the same file.
+
+    The file is downloaded into a partial file which is renamed to `local_fpath`
+    once complete, so that `local_fpath` is never a partially written file.
+    If another process is downloading the same file, wait for its download
+    to complete instead of downloading the file again.
+    The transfer is limited by the process-wide rate limiter
+    (see `himawari_api.set_rate_limits`) with the given `priority`.
+
+    Returns
+    -------
+    downloaded : bool
+        False if the file has been downloaded by another process.
+    """
+    metrics = get_metrics()
+    lock_fpath, part_fpath = _get_download_tmp_fpaths(local_fpath)
+    with _file_lock(lock_fpath, timeout=lock_timeout):
+        # Check if the file was downloaded by another process while waiting
+        if not overwrite and os.path.exists(local_fpath):
+            metrics.inc("files_skipped")
+            return False
+        try:
+            t_i = time.perf_counter()
+            get_rate_limiter().get_file(fs, bucket_fpath, part_fpath, priority=priority)
+            duration = time.perf_counter() - t_i
+            os.replace(part_fpath, local_fpath)
+        except BaseException:
+            with contextlib.suppress(FileNotFoundError):
+                os.remove(part_fpath)
+            raise
+    # Record the transfer
+    n_bytes = os.path.getsize(local_fpath)
+    metrics.inc("get_requests")
+    metrics.inc("bytes_transferred", n_bytes)
+    metrics.observe("download_duration_seconds", duration)
+    if duration > 0:
+        metrics.observe("download_throughput_bytes_per_second", n_bytes / duration)
+    return True
+
+
+def _fs_get_file_result(fs, bucket_fpath, local_fpath, overwrite=False, priority=None):
+    """Download a file with `_fs_get_file` and return the outcome of the transfer."""
+    t_i = time.perf_counter()
+    try:
+        downloaded = _fs_get_file(fs, bucket_fpath, local_fpath, overwrite=overwrite, priority=priority)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+        return {"downloaded": False, "bytes": 0, "duration": time.perf_counter() - t_i, "error": error}
+    n_bytes = os.path.getsize(local_fpath) if downloaded else 0
+    return {"downloaded": downloaded, "bytes": n_bytes, "duration": time.perf_counter() - t_i, "error": None}
+
+
+def _fs_get_parallel(
+    bucket_fpaths,
+    local_fpaths,
+    fs,
+    n_threads=10,
+    progress_bar=True,
+    overwrite=False,
+    return_results=False,
+    n_retries=1,
+):
     """
-    Run fs.get() asynchronously in parallel using multithreading.
+    Download files asynchronously in parallel using multithreading.
+
+    Each file is downloaded with `_fs_get_file`, which prevents concurrent
+    downloads of the same file by multiple processes sharing the local storage.
+    The downloads inherit the rate limiting priority of the calling thread
+    (see `himawari_api.ratelimit.priority`).
+    The failed transfers are retried once all the files have been attempted.
 
     Parameters
     ----------
@@ -138,11 +309,24 @@ def _fs_get_parallel(bucket_fpaths, local_fpaths, fs, n_threads=10, progress_bar
     n_threads : int, optional
         Number of files to be downloaded concurrently.
         The default is 10. The max value is set automatically to 50.
+    overwrite : bool, optional
+        If True, overwrite the files existing on local storage. The default is False.
+    return_results : bool, optional
+        If True, return the outcome of each transfer. The default is False.
+    n_retries : int, optional
+        Maximum number of retries of a failed transfer. The default is 1.
 
     Returns
     -------
     List of cloud bucket filepaths which were not downloaded.
+    If `return_results=True`, dictionary {<bucket_fpath>: <result>} where
+    <result> is a dictionary with keys 'downloaded' (False if the file was
+    downloaded by another process), 'bytes', 'duration' and 'error'.
     """
+    import concurrent.futures
+    from concurrent.futures import ThreadPoolExecutor
+    from tqdm import tqdm
+
     # Check n_threads
     if n_threads < 1:
         n_threads = 1
@@ -153,24 +337,42 @@ def _fs_get_parallel(bucket_fpaths, local_fpaths, fs, n_threads=10, progress_bar
     if progress_bar:
         n_files = len(local_fpaths)
         pbar = tqdm(total=n_files)
-    with ThreadPoolExecutor(max_workers=n_threads) as executor:
-        dict_futures = {
-            executor.submit(fs.get, bucket_path, local_fpath): bucket_path
-            for bucket_path, local_fpath in zip(bucket_fpaths, local_fpaths)
-        }
-        # List files that didn't work
-        l_file_error = []
-        for future in concurrent.futures.as_completed(dict_futures.keys()):
-            # Update the progress bar
-            if progress_bar:
-                pbar.update(1)
-            # Collect all commands that caused problems
-            if future.exception() is not None:
-                l_file_error.append(dict_futures[future])
+    metrics = get_metrics()
+    priority = get_priority()
+    dict_local_fpaths = dict(zip(bucket_fpaths, local_fpaths))
+    dict_results = {}
+    with metrics.timer("transfer"), ThreadPoolExecutor(max_workers=n_threads) as executor:
+        l_bucket_fpaths = list(dict_local_fpaths)
+        for i_attempt in range(n_retries + 1):
+            if i_attempt > 0:
+                metrics.inc("retries", len(l_bucket_fpaths))
+            dict_futures = {
+                executor.submit(
+                    _fs_get_file_result, fs, bucket_path, dict_local_fpaths[bucket_path], overwrite, priority
+                ): bucket_path
+                for bucket_path in l_bucket_fpaths
+            }
+            # Collect the results
+            for future in concurrent.futures.as_completed(dict_futures.keys()):
+                result = future.result()
+                dict_results[dict_futures[future]] = result
+                # Record the files downloaded or failed without retries left
+                if result["error"] is None or i_attempt == n_retries:
+                    if result["error"] is not None:
+                        metrics.inc("download_errors")
+                    if progress_bar:
+                        pbar.update(1)
+            # Retry the failed transfers
+            l_bucket_fpaths = [fpath for fpath in dict_futures.values() if dict_results[fpath]["error"] is not None]
+            if len(l_bucket_fpaths) == 0:
+                break
     if progress_bar:
         pbar.close()
     ##------------------------------------------------------------------------.
+    if return_results:
+        return dict_results
     # Return list of bucket fpaths raising errors
+    l_file_error = [fpath for fpath, result in dict_results.items() if result["error"] is not None]
     return l_file_error
 
 
@@ -190,6 +392,8 @@ def _get_start_of_day(time):
 
 def get_list_daily_time_blocks(start_time, end_time):
     """Return a list of (start_time, end_time) tuple of daily length."""
+    import pandas as pd
+
     # Retrieve timedelta between start_time and end_time
     dt = end_time - start_time
     # If less than a day
@@ -208,6 +412,391 @@ def get_list_daily_time_blocks(start_time, end_time):
 
 
 
+####---------------------------------------------------------------------------.
+#### Job manifest
+
+_JOB_MANIFEST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blocks (
+    block_id TEXT PRIMARY KEY,
+    completed INTEGER
+);
+CREATE TABLE IF NOT EXISTS files (
+    local_fpath TEXT PRIMARY KEY,
+    bucket_fpath TEXT,
+    block_id TEXT,
+    size INTEGER,
+    verified INTEGER
+);
+CREATE INDEX IF NOT EXISTS files_block_id ON files (block_id);
+"""
+
+# Default filename (within base_dir) of the job manifest
+_JOB_MANIFEST_FNAME = ".himawari_api_download.sqlite"
+
+# The daily blocks ending less than this delay ago are never marked as completed,
+# because files can still be published in them
+_JOB_MANIFEST_MIN_BLOCK_AGE = datetime.timedelta(hours=1)
+
+
+def _open_job_manifest(manifest, base_dir):
+    """Open the SQLite job manifest (`manifest=True` for the default manifest of `base_dir`)."""
+    import sqlite3
+
+    if manifest is True:
+        manifest = os.path.join(base_dir, _JOB_MANIFEST_FNAME)
+    if not isinstance(manifest, str):
+        raise TypeError("`manifest` must be a filepath, True or None.")
+    os.makedirs(os.path.dirname(os.path.abspath(manifest)), exist_ok=True)
+    conn = sqlite3.connect(manifest, timeout=60)
+    conn.executescript(_JOB_MANIFEST_SCHEMA)
+    return conn
+
+
+def _get_block_request(protocol, fs_args, satellite, product_level, product, sector,
+                       start_time, end_time, filter_parameters):
+    """Return the checked (satellite, product_level, product, sector, filter_parameters) of a request.
+
+    The daily blocks identifiers are built from the checked inputs, so that the
+    aliases of a product (i.e. 'l1b' and 'L1b', 'Full Disk' and 'FLDK') share
+    the same blocks in the job manifest.
+    """
+    (satellite, product_level, product, _, _, sector, filter_parameters, *_) = _check_search_inputs(
+        satellite=satellite,
+        product_level=product_level,
+        product=product,
+        start_time=start_time,
+        end_time=end_time,
+        sector=sector,
+        filter_parameters=filter_parameters,
+        group_by_key=None,
+        connection_type="bucket",
+        base_dir=None,
+        protocol=protocol,
+        fs_args=fs_args,
+    )
+    # The time period is defined by the block
+    filter_parameters = {
+        key: sorted(value) if isinstance(value, list) else value
+        for key, value in filter_parameters.items()
+        if key not in ["start_time", "end_time"]
+    }
+    return satellite, product_level, product, sector, filter_parameters
+
+
+def _get_block_id(satellite, product_level, product, sector, filter_parameters, start_time, end_time):
+    """Return the identifier of a daily block of a download request.
+
+    The inputs must be checked with `_get_block_request`.
+    """
+    import hashlib
+    import json
+
+    dumped_filter_parameters = json.dumps(filter_parameters, sort_keys=True, default=str)
+    filter_id = hashlib.sha1(dumped_filter_parameters.encode()).hexdigest()[:8]
+    return "/".join(
+        [
+            satellite,
+            product_level,
+            product,
+            str(sector),
+            filter_id,
+            start_time.isoformat(),
+            end_time.isoformat(),
+        ]
+    )
+
+
+def _get_completed_block_files(conn, block_id):
+    """Return the files {local_fpath: bucket_fpath} of a completed block.
+
+    None is returned if the block is not completed or if a file of the block
+    is not anymore on local storage with the recorded size.
+    """
+    row = conn.execute("SELECT completed FROM blocks WHERE block_id = ?", (block_id,)).fetchone()
+    if row is None or not row[0]:
+        return None
+    rows = conn.execute(
+        "SELECT local_fpath, bucket_fpath, size FROM files WHERE block_id = ?", (block_id,)
+    ).fetchall()
+    for local_fpath, _, size in rows:
+        try:
+            if os.path.getsize(local_fpath) != size:
+                return None
+        except OSError:
+            return None
+    return {local_fpath: bucket_fpath for local_fpath, bucket_fpath, _ in rows}
+
+
+def _get_verified_fpaths(conn, local_fpaths):
+    """Return the set of local filepaths verified in a previous run and unchanged on local storage."""
+    verified_fpaths = set()
+    for local_fpath in local_fpaths:
+        row = conn.execute(
+            "SELECT size FROM files WHERE local_fpath = ? AND verified = 1", (local_fpath,)
+        ).fetchone()
+        if row is None:
+            continue
+        try:
+            if os.path.getsize(local_fpath) == row[0]:
+                verified_fpaths.add(local_fpath)
+        except OSError:
+            continue
+    return verified_fpaths
+
+
+def _record_block(conn, block_id, dict_fpaths, verified, completed):
+    """Record the files {local_fpath: bucket_fpath} available on local storage of a block."""
+    with conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO files (local_fpath, bucket_fpath, block_id, size, verified) VALUES (?, ?, ?, ?, ?)",
+            [
+                (local_fpath, bucket_fpath, block_id, os.path.getsize(local_fpath), int(verified))
+                for local_fpath, bucket_fpath in dict_fpaths.items()
+            ],
+        )
+        conn.execute(
+            "INSERT OR REPLACE INTO blocks (block_id, completed) VALUES (?, ?)", (block_id, int(completed))
+        )
+
+
+####---------------------------------------------------------------------------.
+#### Download report
+
+_DOWNLOAD_STATUSES = ["downloaded", "skipped_existing", "corrupted_refetched", "failed"]
+
+
+class DownloadReport:
+    """
+    Report of a download, with the status, bytes, duration and error of each file.
+
+    The status of a file is one of:
+
+    - 'downloaded': the file has been downloaded,
+    - 'skipped_existing': the file was already on local storage (or has been
+      downloaded concurrently by another process),
+    - 'corrupted_refetched': the local file size differed from the bucket file
+      size and the file has been downloaded again,
+    - 'failed': the download failed or the downloaded file is corrupted.
+
+    The report can be serialized with `to_json` (and loaded with `from_json`),
+    so that a follow-up call can download again only the failed files
+    with `retry_failed`.
+    """
+
+    def __init__(self, base_dir, protocol, satellite, files=None, elapsed_time=0.0):
+        self.base_dir = base_dir
+        self.protocol = protocol
+        self.satellite = satellite
+        # {local_fpath: {'bucket_fpath', 'status', 'bytes', 'duration', 'error'}}
+        self.files = {} if files is None else files
+        self.elapsed_time = elapsed_time
+
+    def __repr__(self):
+        counts = ", ".join(f"{status}={n}" for status, n in self.counts.items())
+        return f"<DownloadReport {counts}>"
+
+    def __len__(self):
+        return len(self.files)
+
+    def _add(self, local_fpath, bucket_fpath, status, n_bytes=0, duration=0.0, error=None):
+        """Record the outcome of a file (the first recorded outcome of a file is kept)."""
+        if local_fpath in self.files:
+            return
+        self.files[local_fpath] = {
+            "bucket_fpath": bucket_fpath,
+            "status": status,
+            "bytes": n_bytes,
+            "duration": duration,
+            "error": error,
+        }
+
+    def _add_results(self, local_fpaths, bucket_fpaths, dict_results, corrupted_fpaths=()):
+        """Record the results of `_fs_get_parallel`."""
+        corrupted_fpaths = set(corrupted_fpaths)
+        for local_fpath, bucket_fpath in zip(local_fpaths, bucket_fpaths):
+            result = dict_results[bucket_fpath]
+            if result["error"] is not None:
+                status = "failed"
+            elif not result["downloaded"]:
+                status = "skipped_existing"
+            elif local_fpath in corrupted_fpaths:
+                status = "corrupted_refetched"
+            else:
+                status = "downloaded"
+            self._add(local_fpath, bucket_fpath, status, result["bytes"], result["duration"], result["error"])
+
+    def _set_corrupted(self, local_fpaths):
+        """Set the status of the downloaded files found corrupted to 'failed'."""
+        for local_fpath in local_fpaths:
+            self.files[local_fpath].update(
+                {"status": "failed", "error": "The file size differs from the bucket file size."}
+            )
+
+    def get_fpaths(self, status=None, bucket=False):
+        """
+        Return the filepaths with a given status.
+
+        Parameters
+        ----------
+        status : str or list, optional
+            Status(es) of the files. By default, all files are returned.
+        bucket : bool, optional
+            If True, return the bucket filepaths instead of the local filepaths.
+            The default is False.
+        """
+        if isinstance(status, str):
+            status = [status]
+        if status is not None:
+            invalid_status = set(status) - set(_DOWNLOAD_STATUSES)
+            if invalid_status:
+                raise ValueError(f"Invalid status {invalid_status}. Valid status are {_DOWNLOAD_STATUSES}.")
+        return [
+            info["bucket_fpath"] if bucket else local_fpath
+            for local_fpath, info in self.files.items()
+            if status is None or info["status"] in status
+        ]
+
+    @property
+    def local_fpaths(self):
+        """Local filepaths of the files available on local storage."""
+        return self.get_fpaths(status=["downloaded", "skipped_existing", "corrupted_refetched"])
+
+    @property
+    def failed_fpaths(self):
+        """Local filepaths of the files which failed to download."""
+        return self.get_fpaths(status="failed")
+
+    @property
+    def counts(self):
+        """Number of files of each status."""
+        counts = dict.fromkeys(_DOWNLOAD_STATUSES, 0)
+        for info in self.files.values():
+            counts[info["status"]] += 1
+        return counts
+
+    @property
+    def n_bytes(self):
+        """Number of bytes transferred."""
+        return sum(info["bytes"] for info in self.files.values())
+
+    @property
+    def throughput(self):
+        """Aggregate throughput (bytes/s) over the elapsed time of the download."""
+        if self.elapsed_time <= 0:
+            return None
+        return self.n_bytes / self.elapsed_time
+
+    def summary(self):
+        """Return a dictionary with the number of files of each status, bytes and throughput."""
+        summary = self.counts
+        summary.update(
+            {
+                "n_files": len(self),
+                "bytes": self.n_bytes,
+                "elapsed_time": self.elapsed_time,
+                "throughput": self.throughput,
+            }
+        )
+        return summary
+
+    ####----------------------------------------------------------------------.
+    #### Serialization
+
+    def to_dict(self):
+        """Return the report as a JSON serializable dictionary."""
+        return {
+            "base_dir": self.base_dir,
+            "protocol": self.protocol,
+            "satellite": self.satellite,
+            "elapsed_time": self.elapsed_time,
+            "files": self.files,
+        }
+
+    @classmethod
+    def from_dict(cls, dict_report):
+        """Create a report from the output of `to_dict`.
+
+        The additional keys (i.e. of the job manifests) are ignored.
+        """
+        keys = ["base_dir", "protocol", "satellite", "files", "elapsed_time"]
+        return cls(**{key: dict_report[key] for key in keys if key in dict_report})
+
+    def to_json(self, fpath=None):
+        """Return the report as a JSON string, optionally written to `fpath`."""
+        import json
+
+        json_report = json.dumps(self.to_dict(), indent=1)
+        if fpath is not None:
+            with open(fpath, "w") as f:
+                f.write(json_report)
+        return json_report
+
+    @classmethod
+    def from_json(cls, json_report):
+        """Create a report from a JSON string or the filepath of a JSON file."""
+        import json
+
+        if os.path.isfile(json_report):
+            with open(json_report, "r") as f:
+                json_report = f.read()
+        return cls.from_dict(json.loads(json_report))
+
+    ####----------------------------------------------------------------------.
+    #### Retry
+
+    def retry_failed(self, fs_args={}, n_threads=20, check_data_integrity=True, progress_bar=True):
+        """
+        Download again the failed files.
+
+        Parameters
+        ----------
+        fs_args : dict, optional
+            Dictionary specifying optional settings to initiate the fsspec.filesystem.
+        n_threads : int, optional
+            Number of files to be downloaded concurrently. The default is 20.
+        check_data_integrity : bool, optional
+            If True, check that the downloaded files are not corrupted. The default is True.
+        progress_bar : bool, optional
+            If True, display a progress bar of the download. The default is True.
+
+        Returns
+        -------
+        report : DownloadReport
+            The report of the retried files.
+            The status of the retried files is also updated in this report.
+        """
+        t_i = time.time()
+        report = DownloadReport(base_dir=self.base_dir, protocol=self.protocol, satellite=self.satellite)
+        local_fpaths = self.failed_fpaths
+        if len(local_fpaths) == 0:
+            return report
+        bucket_fpaths = [self.files[local_fpath]["bucket_fpath"] for local_fpath in local_fpaths]
+        get_metrics().inc("retries", len(local_fpaths))
+        fs = get_filesystem(protocol=self.protocol, fs_args=dict(fs_args))
+        create_local_directories(local_fpaths)
+        dict_results = _fs_get_parallel(
+            bucket_fpaths=bucket_fpaths,
+            local_fpaths=local_fpaths,
+            fs=fs,
+            n_threads=n_threads,
+            progress_bar=progress_bar,
+            overwrite=True,
+            return_results=True,
+        )
+        report._add_results(local_fpaths, bucket_fpaths, dict_results)
+        if check_data_integrity:
+            downloaded_fpaths = report.get_fpaths(status="downloaded")
+            corrupted_fpaths, _ = remove_corrupted_files(
+                downloaded_fpaths,
+                report.get_fpaths(status="downloaded", bucket=True),
+                fs=fs,
+            )
+            report._set_corrupted(corrupted_fpaths)
+        report.elapsed_time = time.time() - t_i
+        self.files.update(report.files)
+        return report
+
+
 ####---------------------------------------------------------------------------.
 #### Download functions 
 
@@ -228,6 +817,8 @@ def download_files(
     verbose=True,
     filter_parameters={},
     fs_args={},
+    return_report=False,
+    manifest=None,
 ):
     """
     Download files from a cloud bucket storage.
@@ -262,7 +853,7 @@ def download_files(
         See `himawari_api.available_sectors()` for a list of available sectors.
     filter_parameters : dict, optional
         Dictionary specifying option filtering parameters.
-        Valid keys includes: `channels`, `scan_modes`, `scene_abbr`.
+        Valid keys includes: `channels`, `composites`, `scan_modes`, `scene_abbr`, `resolution`.
         The default is a empty dictionary (no filtering).
     n_threads: int
         Number of files to be downloaded concurrently.
@@ -281,6 +872,22 @@ def download_files(
     verbose : bool, optional
         If True, it print some information concerning the download process.
         The default is False.
+    return_report : bool, optional
+        If True, return a `DownloadReport` with the status, bytes, duration and
+        error of each file instead of the list of local filepaths.
+        The default is False.
+    manifest : str or bool, optional
+        Filepath of a SQLite job manifest recording the completed daily blocks
+        and the verified files (with their sizes), so that a restarted download
+        skips the completed blocks without listing the bucket and does not check
+        again the verified files. If True, the manifest is <base_dir>/.himawari_api_download.sqlite.
+        The blocks ending less than one hour ago are never marked as completed.
+        The default is None (no manifest).
+
+    Returns
+    -------
+    local_fpaths : list or DownloadReport
+        List of local filepaths, or the `DownloadReport` if `return_report=True`.
 
     """
     # -------------------------------------------------------------------------.
@@ -303,11 +910,40 @@ def download_files(
         print("-------------------------------------------------------------------- ")
         print(f"Starting downloading data between {start_time} and {end_time}.")
 
+    # Open the job manifest
+    conn = None
+    if manifest is not None:
+        conn = _open_job_manifest(manifest, base_dir)
+        block_request = _get_block_request(
+            protocol, fs_args, satellite, product_level, product, sector,
+            start_time, end_time, filter_parameters,
+        )
+
     # Loop over daily time blocks (to search for data)
+    report = DownloadReport(base_dir=base_dir, protocol=protocol, satellite=satellite)
     list_all_local_fpaths = []
-    list_all_bucket_fpaths = []
     n_downloaded_files = 0
+    n_corrupted_files = 0
+    n_completed_blocks = 0
     for start_time, end_time in time_blocks:
+        # Skip the blocks completed in a previous run (without remote calls)
+        if conn is not None:
+            block_id = _get_block_id(*block_request, start_time, end_time)
+            if not force_download:
+                dict_completed = _get_completed_block_files(conn, block_id)
+                if dict_completed is not None:
+                    dict_completed = {
+                        local_fpath: bucket_fpath
+                        for local_fpath, bucket_fpath in dict_completed.items()
+                        if local_fpath not in report.files
+                    }
+                    for local_fpath, bucket_fpath in dict_completed.items():
+                        report._add(local_fpath, bucket_fpath, status="skipped_existing")
+                    list_all_local_fpaths += list(dict_completed)
+                    get_metrics().inc("files_skipped", len(dict_completed))
+                    n_completed_blocks += 1
+                    continue
+
         # Retrieve bucket fpaths
         bucket_fpaths = find_files(
             protocol=protocol,
@@ -324,95 +960,133 @@ def download_files(
             group_by_key=None,
             verbose=False,
         )
-        # Check there are files to retrieve
-        n_files = len(bucket_fpaths)
-        if n_files == 0:
-            continue
 
         # Define local destination fpaths
         local_fpaths = _get_local_from_bucket_fpaths(
             base_dir=base_dir, satellite=satellite, bucket_fpaths=bucket_fpaths
         )
+        dict_block_fpaths = dict(zip(local_fpaths, bucket_fpaths))
 
-        # Record the local and bucket fpath queried
-        list_all_local_fpaths = list_all_local_fpaths + local_fpaths
-        list_all_bucket_fpaths = list_all_bucket_fpaths + bucket_fpaths
+        # Exclude the files already processed by the previous block
+        # - Consecutive daily blocks share the midnight timestep
+        local_fpaths = [fpath for fpath in dict_block_fpaths if fpath not in report.files]
+        bucket_fpaths = [dict_block_fpaths[fpath] for fpath in local_fpaths]
+        dict_new_fpaths = dict(zip(local_fpaths, bucket_fpaths))
 
         # Remove corrupted data
-        _ = remove_corrupted_files(
-            local_fpaths=local_fpaths, bucket_fpaths=bucket_fpaths, fs=fs
+        # - The files verified in a previous run (and unchanged) are not checked again
+        verified_fpaths = set()
+        if conn is not None and not force_download:
+            verified_fpaths = _get_verified_fpaths(conn, local_fpaths)
+        corrupted_local_fpaths, _ = remove_corrupted_files(
+            local_fpaths=[fpath for fpath in local_fpaths if fpath not in verified_fpaths],
+            bucket_fpaths=[dict_new_fpaths[fpath] for fpath in local_fpaths if fpath not in verified_fpaths],
+            fs=fs,
         )
 
         # Optionally exclude files that already exist on disk
         if not force_download:
+            existing_fpaths = dict(dict_new_fpaths)
             local_fpaths, bucket_fpaths = _select_missing_fpaths(
                 local_fpaths=local_fpaths, bucket_fpaths=bucket_fpaths
             )
+            for local_fpath in local_fpaths:
+                del existing_fpaths[local_fpath]
+            for local_fpath, bucket_fpath in existing_fpaths.items():
+                report._add(local_fpath, bucket_fpath, status="skipped_existing")
+            get_metrics().inc("files_skipped", len(existing_fpaths))
 
-        # Check there are still files to retrieve
+        # Download the missing files
         n_files = len(local_fpaths)
         n_downloaded_files += n_files
-        if n_files == 0:
-            continue
-
-        # Create local directories
-        create_local_directories(local_fpaths)
-
-        # Print # files to download
-        if verbose:
-            print(f" - Downloading {n_files} files from {start_time} to {end_time}")
+        if n_files > 0:
+            # Create local directories
+            create_local_directories(local_fpaths)
+
+            # Print # files to download
+            if verbose:
+                print(f" - Downloading {n_files} files from {start_time} to {end_time}")
+
+            # Download data asynchronously with multithreading
+            dict_results = _fs_get_parallel(
+                bucket_fpaths=bucket_fpaths,
+                local_fpaths=local_fpaths,
+                fs=fs,
+                n_threads=n_threads,
+                progress_bar=progress_bar,
+                overwrite=force_download,
+                return_results=True,
+            )
+            report._add_results(
+                local_fpaths, bucket_fpaths, dict_results, corrupted_fpaths=corrupted_local_fpaths
+            )
+            # Report errors if occured
+            if verbose:
+                l_bucket_errors = [fpath for fpath, result in dict_results.items() if result["error"] is not None]
+                n_errors = len(l_bucket_errors)
+                if n_errors > 0:
+                    print(f" - Unable to download the following files: {l_bucket_errors}")
+
+            # Check for data corruption of the downloaded files
+            # - The files already on disk have been checked by remove_corrupted_files
+            if check_data_integrity:
+                downloaded_fpaths = [
+                    fpath for fpath in local_fpaths
+                    if report.files[fpath]["status"] in ["downloaded", "corrupted_refetched"]
+                ]
+                corrupted_fpaths, _ = remove_corrupted_files(
+                    downloaded_fpaths,
+                    [dict_block_fpaths[fpath] for fpath in downloaded_fpaths],
+                    fs=fs,
+                )
+                report._set_corrupted(corrupted_fpaths)
+                n_corrupted_files += len(corrupted_fpaths)
+
+        # Record the local fpaths available
+        block_local_fpaths = [
+            fpath for fpath in dict_block_fpaths if report.files[fpath]["status"] != "failed"
+        ]
+        list_all_local_fpaths += [fpath for fpath in block_local_fpaths if fpath in dict_new_fpaths]
+
+        # Record the block in the job manifest
+        # - A block is completed if all its files are available (and published)
+        if conn is not None:
+            completed = (
+                len(block_local_fpaths) == len(dict_block_fpaths)
+                and end_time <= datetime.datetime.utcnow() - _JOB_MANIFEST_MIN_BLOCK_AGE
+            )
+            _record_block(
+                conn,
+                block_id,
+                {fpath: dict_block_fpaths[fpath] for fpath in block_local_fpaths},
+                verified=check_data_integrity,
+                completed=completed,
+            )
 
-        # Download data asynchronously with multithreading
-        l_bucket_errors = _fs_get_parallel(
-            bucket_fpaths=bucket_fpaths,
-            local_fpaths=local_fpaths,
-            fs=fs,
-            n_threads=n_threads,
-            progress_bar=progress_bar,
-        )
-        # Report errors if occured
-        if verbose:
-            n_errors = len(l_bucket_errors)
-            if n_errors > 0:
-                print(f" - Unable to download the following files: {l_bucket_errors}")
+    if conn is not None:
+        conn.close()
 
     # Report the total number of file downloaded
     if verbose:
         t_f = time.time()
         t_elapsed = round(t_f - t_i)
+        if n_completed_blocks > 0:
+            print(f" - {n_completed_blocks} daily blocks were already completed.")
         print(
             f"--> {n_downloaded_files} files have been downloaded in {t_elapsed} seconds !"
         )
+        if check_data_integrity:
+            print(f" - {n_corrupted_files} corrupted files were identified and removed.")
         print("-------------------------------------------------------------------- ")
 
-    # Check for data corruption
-    if check_data_integrity:
-        if verbose:
-            print("Checking data integrity:")
-        list_all_local_fpaths, _ = remove_corrupted_files(
-            list_all_local_fpaths,
-            list_all_bucket_fpaths,
-            fs=fs,
-            return_corrupted_fpaths=False,
-        )
-        if verbose:
-            n_corrupted = len(list_all_bucket_fpaths) - len(list_all_local_fpaths)
-            print(f" - {n_corrupted} corrupted files were identified and removed.")
-            print(
-                "--------------------------------------------------------------------"
-            )
-            
     # Decompress bz2 files
     # if decompress_files:
     #     list_all_local_fpaths, _ = remove_compressed_files(list_all_local_fpaths)
-            
-        
-            
-            
-            
-        
 
     # Return list of local fpaths
+    report.elapsed_time = time.time() - t_i
+    if return_report:
+        return report
     return list_all_local_fpaths
 
 
@@ -463,7 +1137,7 @@ def download_closest_files(
         See `himawari_api.available_sectors()` for a list of available sectors.
     filter_parameters : dict, optional
         Dictionary specifying option filtering parameters.
-        Valid keys includes: `channels`, `scan_modes`, `scene_abbr`.
+        Valid keys includes: `channels`, `composites`, `scan_modes`, `scene_abbr`, `resolution`.
         The default is a empty dictionary (no filtering).
     n_threads: int
         Number of files to be downloaded concurrently.
@@ -579,7 +1253,7 @@ def download_latest_files(
         See `himawari_api.available_sectors()` for a list of available sectors.
     filter_parameters : dict, optional
         Dictionary specifying option filtering parameters.
-        Valid keys includes: `channels`, `scan_modes`, `scene_abbr`.
+        Valid keys includes: `channels`, `composites`, `scan_modes`, `scene_abbr`, `resolution`.
         The default is a empty dictionary (no filtering).
     n_threads: int
         Number of files to be downloaded concurrently.
@@ -702,7 +1376,7 @@ def download_previous_files(
         See `himawari_api.available_sectors()` for a list of available sectors.
     filter_parameters : dict, optional
         Dictionary specifying option filtering parameters.
-        Valid keys includes: `channels`, `scan_modes`, `scene_abbr`.
+        Valid keys includes: `channels`, `composites`, `scan_modes`, `scene_abbr`, `resolution`.
         The default is a empty dictionary (no filtering).
     n_threads: int
         Number of files to be downloaded concurrently.
@@ -833,7 +1507,7 @@ def download_next_files(
         See `himawari_api.available_sectors()` for a list of available sectors.
     filter_parameters : dict, optional
         Dictionary specifying option filtering parameters.
-        Valid keys includes: `channels`, `scan_modes`, `scene_abbr`.
+        Valid keys includes: `channels`, `composites`, `scan_modes`, `scene_abbr`, `resolution`.
         The default is a empty dictionary (no filtering).
     n_threads: int
         Number of files to be downloaded concurrently.
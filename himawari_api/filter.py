@@ -18,39 +18,69 @@
 import numpy as np
 from himawari_api.checks import (
      _check_channels,
+     _check_composites,
+     _get_composites_channels,
      _check_scene_abbr,
+     _check_resolution_policy,
+     _get_composites_resolution,
      _check_start_end_time,
+     _check_time,
      _check_product_level,
 )
-from himawari_api.info import _get_info_from_filepath, get_key_from_filepaths, group_files
-
-
-def _drop_duplicate_radiance_files(fpaths):
-    """Ensure that the AHI L1b Rad files have per channel same resolution."""
-    # Group by timesteps 
-    fpaths_dict = group_files(fpaths, key="start_time")
-    # Loop over each timestep 
-    list_fpaths = []
-    for tmp_fpaths in fpaths_dict.values():
-        fpaths_channel_dict = group_files(tmp_fpaths, key="channel")
-        # Loop over each channel
-        for ch_fpaths in fpaths_channel_dict.values():
-            # Get available resolutions
-            resolutions = np.array(get_key_from_filepaths(ch_fpaths, "spatial_res"))
-            # If single resolution, append to filepath list 
-            if len(np.unique(resolutions) == 1) == 1: 
-                # Append to valid filepath list 
-                list_fpaths += ch_fpaths
-            else:
-                # Select file with highest resolution 
-                highest_resolution = np.min(resolutions)
-                ch_fpaths = np.array(ch_fpaths)
-                ch_fpaths = ch_fpaths[resolutions == highest_resolution]
-                ch_fpaths = ch_fpaths.tolist()
-                # Append to valid filepath list 
-                list_fpaths += ch_fpaths
-    
-    return list_fpaths  
+from himawari_api.info import (
+    HimawariFile,
+    _get_info_from_filepath,
+    get_file_records,
+)
+
+
+def _get_resolution_rank(spatial_res, resolution):
+    """Return the rank of the spatial resolutions (in 0.1 km) for a selection policy.
+
+    The files with the lowest rank of each (start_time, channel) group are selected.
+    """
+    if resolution == "finest":
+        return spatial_res
+    if resolution == "coarsest":
+        return -spatial_res
+    # Closest to the requested resolution (in km), preferring the finest in case of tie
+    return np.abs(spatial_res - resolution * 10) * 1000 + spatial_res
+
+
+def _drop_duplicate_radiance_files(fpaths, resolution=None):
+    """Select a single resolution per channel and timestep of the AHI L1b Rad files.
+
+    When a channel is available at multiple resolutions, the files are selected
+    according to `resolution`: 'finest' (the default), 'coarsest', the closest
+    to a spatial resolution in km, or a dictionary of per-channel policies
+    (the channels not in the dictionary keep the finest resolution).
+    The selection is a vectorized groupby on the parsed (start_time, channel, spatial_res)
+    table, and the order of the files is preserved.
+    """
+    import pandas as pd
+
+    if len(fpaths) == 0:
+        return list(fpaths)
+    resolution = "finest" if resolution is None else resolution
+    records = get_file_records(fpaths)
+    df = pd.DataFrame(
+        {
+            "start_time": [record["start_time"] for record in records],
+            "channel": [record["channel"] for record in records],
+            "spatial_res": np.array([record["spatial_res"] for record in records], dtype=float),
+        }
+    )
+    spatial_res = df["spatial_res"].to_numpy()
+    if isinstance(resolution, dict):
+        rank = _get_resolution_rank(spatial_res, "finest").copy()
+        for channel, channel_resolution in resolution.items():
+            is_channel = (df["channel"] == channel).to_numpy()
+            rank[is_channel] = _get_resolution_rank(spatial_res[is_channel], channel_resolution)
+    else:
+        rank = _get_resolution_rank(spatial_res, resolution)
+    df["rank"] = rank
+    is_selected = df["rank"] == df.groupby(["start_time", "channel"], sort=False)["rank"].transform("min")
+    return [fpath for fpath, selected in zip(fpaths, is_selected.to_numpy()) if selected]
 
 
 def _filter_file(
@@ -113,6 +143,25 @@ def _filter_file(
     return fpath
 
 
+def _prefilter_fnames(fnames, product_level, channels=None):
+    """Select the filenames matching the product level and channels without parsing them.
+
+    This cheap string-based selection is applied before `_filter_files`,
+    which parses the remaining filenames.
+    """
+    import fnmatch
+    from himawari_api.io import get_fname_glob_pattern
+
+    fnames = fnmatch.filter(fnames, get_fname_glob_pattern(product_level))
+    if product_level == "L1b":
+        # HS_<platform>_<YYYYMMDD>_<HHMM>_<channel>_...
+        fnames = [fname for fname in fnames if fname.startswith("HS_")]
+        if channels is not None:
+            channels = set(channels)
+            fnames = [fname for fname in fnames if fname[21:24] in channels]
+    return fnames
+
+
 def _filter_files(
     fpaths,
     product, 
@@ -121,13 +170,17 @@ def _filter_files(
     end_time=None,
     channels=None,
     scene_abbr=None,
+    resolution=None,
 ):
     """Utility function to select filepaths matching optional filter_parameters."""
-    if isinstance(fpaths, str):
+    if isinstance(fpaths, (str, HimawariFile)):
         fpaths = [fpaths]
-    fpaths = [
+    # Parse the filepaths only once
+    # - Filtering and grouping is then performed on the HimawariFile records
+    records = get_file_records(fpaths)
+    records = [
         _filter_file(
-            fpath,
+            record,
             product, 
             product_level,
             start_time=start_time,
@@ -135,16 +188,20 @@ def _filter_files(
             channels=channels,
             scene_abbr=scene_abbr,
         )
-        for fpath in fpaths
+        for record in records
     ]
-    fpaths = [fpath for fpath in fpaths if fpath is not None]
+    records = [record for record in records if record is not None]
     
     # Special treatment for AHI L1b Rad data 
     # - Multiple resolutions per band might be present on the bucket
     if product == "Rad" and product_level == "L1b":
-        fpaths = _drop_duplicate_radiance_files(fpaths)
-        
-    return fpaths
+        records = _drop_duplicate_radiance_files(records, resolution=resolution)
+
+    # Return HimawariFile records only if records were provided
+    return_records = len(fpaths) > 0 and all(isinstance(fpath, HimawariFile) for fpath in fpaths)
+    if not return_records:
+        return [record.fpath for record in records]
+    return records
 
 
 def filter_files(
@@ -155,6 +212,8 @@ def filter_files(
     end_time=None,
     scene_abbr=None,
     channels=None,
+    composites=None,
+    resolution=None,
 ):
     """
     Filter files by optional parameters.
@@ -165,7 +224,7 @@ def filter_files(
     Parameters
     ----------
     fpaths : list
-        List of filepaths.
+        List of filepaths (or `HimawariFile` records).
     product_level : str
         Product level.
         See `himawari_api.available_product_levels()` for available product levels.
@@ -183,12 +242,35 @@ def filter_files(
         List of AHI channels to select.
         See `himawari_api.available_channels()` for available AHI channels.
         The default is None (no filtering by channels).
+    composites : list, optional
+        List of satpy composites to create.
+        Only the channels required to create the composites are selected,
+        at their native spatial resolution unless specified by `resolution`.
+        See `himawari_api.available_composites()` for available composites.
+        The default is None (no filtering by composites).
+    resolution : str, float or dict, optional
+        Resolution of the AHI L1b Rad files to select when a channel is
+        available at multiple resolutions: 'finest', 'coarsest', a spatial
+        resolution in km (the closest available is selected) or a dictionary
+        {channel: resolution} (the other channels keep the finest resolution).
+        The channels available at a single resolution are not affected.
+        The default is None ('finest').
 
     """
     product_level = _check_product_level(product_level, product=None)
     channels = _check_channels(channels)
+    composites = _check_composites(composites)
+    if composites:
+        channels = _get_composites_channels(composites, channels=channels)
     scene_abbr = _check_scene_abbr(scene_abbr)
-    start_time, end_time = _check_start_end_time(start_time, end_time)
+    resolution = _check_resolution_policy(resolution)
+    if composites:
+        resolution = _get_composites_resolution(composites, resolution=resolution)
+    if start_time is not None and end_time is not None:
+        start_time, end_time = _check_start_end_time(start_time, end_time)
+    else:
+        start_time = _check_time(start_time) if start_time is not None else None
+        end_time = _check_time(end_time) if end_time is not None else None
     fpaths = _filter_files(
         fpaths=fpaths,
         product=product, 
@@ -197,6 +279,7 @@ def filter_files(
         end_time=end_time,
         channels=channels,
         scene_abbr=scene_abbr,
+        resolution=resolution,
     )
     return fpaths
 
@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Define the AHI fixed grid geometry.
+
+The conversion between line/column and longitude/latitude follows the
+CGMS LRIT/HRIT Global Specification (Section 4.4.3.2), as described in
+the Himawari Standard Data (HSD) User's Guide.
+The lines and columns returned by these functions are 0-based array indices.
+"""
+
+import functools
+import numpy as np
+
+# Nominal AHI Full Disk projection parameters (HSD header block #3)
+# - Keys are the spatial resolutions in km
+_AHI_FLDK_GRIDS = {
+    0.5: {"cfac": 81865099, "lfac": 81865099, "coff": 11000.5, "loff": 11000.5, "ncols": 22000, "nlines": 22000},
+    1.0: {"cfac": 40932549, "lfac": 40932549, "coff": 5500.5, "loff": 5500.5, "ncols": 11000, "nlines": 11000},
+    2.0: {"cfac": 20466275, "lfac": 20466275, "coff": 2750.5, "loff": 2750.5, "ncols": 5500, "nlines": 5500},
+}
+
+_AHI_EARTH_AND_ORBIT = {
+    "sub_lon": 140.7,  # degrees
+    "h": 42164.0,  # distance from Earth center to satellite (km)
+    "req": 6378.1370,  # Earth equatorial radius (km)
+    "rpol": 6356.7523,  # Earth polar radius (km)
+}
+
+# Number of FLDK segments of the HSD files
+AHI_FLDK_N_SEGMENTS = 10
+
+
+def _check_resolution(resolution):
+    """Check AHI spatial resolution (in km) validity."""
+    valid_resolutions = list(_AHI_FLDK_GRIDS)
+    try:
+        resolution = float(resolution)
+    except (TypeError, ValueError):
+        raise TypeError("`resolution` must be a number (in km).")
+    if resolution not in valid_resolutions:
+        raise ValueError(f"Valid AHI `resolution` (in km) are {valid_resolutions}.")
+    return resolution
+
+
+def get_projection_info(resolution, sector="FLDK"):
+    """
+    Return the AHI fixed grid projection parameters.
+
+    Parameters
+    ----------
+    resolution : float
+        Spatial resolution in km (0.5, 1 or 2).
+    sector : str, optional
+        The AHI sector. Only the 'FLDK' sector has a fixed grid.
+        The grid of the 'Japan' and 'Target' sectors must be retrieved from
+        the HSD file header. The default is "FLDK".
+
+    Returns
+    -------
+    proj_info : dict
+        Dictionary with the CFAC, LFAC, COFF, LOFF scaling factors,
+        the number of columns and lines, the sub-satellite longitude and
+        the Earth and orbit parameters (in km).
+
+    """
+    from himawari_api.checks import _check_sector
+
+    sector = _check_sector(sector)
+    if sector != "FLDK":
+        raise NotImplementedError(
+            f"The {sector} grid is not fixed. Retrieve it from the HSD file header."
+        )
+    resolution = _check_resolution(resolution)
+    proj_info = _AHI_FLDK_GRIDS[resolution].copy()
+    proj_info.update(_AHI_EARTH_AND_ORBIT)
+    return proj_info
+
+
+def linecol_to_lonlat(lines, cols, proj_info):
+    """
+    Convert 0-based line/column indices into longitude/latitude (in degrees).
+
+    Pixels outside the Earth disk are set to NaN.
+    """
+    lines = np.asarray(lines, dtype=float) + 1
+    cols = np.asarray(cols, dtype=float) + 1
+    h, req, rpol = proj_info["h"], proj_info["req"], proj_info["rpol"]
+    # Scanning angles
+    x = np.deg2rad((cols - proj_info["coff"]) * 2**16 / proj_info["cfac"])
+    y = np.deg2rad((lines - proj_info["loff"]) * 2**16 / proj_info["lfac"])
+    cos_x, cos_y = np.cos(x), np.cos(y)
+    sin_x, sin_y = np.sin(x), np.sin(y)
+    ratio = req**2 / rpol**2
+    denominator = cos_y**2 + ratio * sin_y**2
+    with np.errstate(invalid="ignore"):
+        sd = np.sqrt((h * cos_x * cos_y) ** 2 - denominator * (h**2 - req**2))
+    sn = (h * cos_x * cos_y - sd) / denominator
+    s1 = h - sn * cos_x * cos_y
+    s2 = sn * sin_x * cos_y
+    s3 = -sn * sin_y
+    sxy = np.sqrt(s1**2 + s2**2)
+    lons = np.rad2deg(np.arctan(s2 / s1)) + proj_info["sub_lon"]
+    lats = np.rad2deg(np.arctan(ratio * s3 / sxy))
+    lons = (lons + 180) % 360 - 180
+    return lons, lats
+
+
+def lonlat_to_linecol(lons, lats, proj_info):
+    """
+    Convert longitude/latitude (in degrees) into fractional 0-based line/column indices.
+
+    Locations not visible from the satellite are set to NaN.
+    """
+    lons = np.asarray(lons, dtype=float)
+    lats = np.asarray(lats, dtype=float)
+    h, req, rpol = proj_info["h"], proj_info["req"], proj_info["rpol"]
+    lat = np.deg2rad(lats)
+    dlon = np.deg2rad(lons - proj_info["sub_lon"])
+    # Geocentric latitude
+    c_lat = np.arctan(rpol**2 / req**2 * np.tan(lat))
+    e2 = (req**2 - rpol**2) / req**2
+    rl = rpol / np.sqrt(1 - e2 * np.cos(c_lat) ** 2)
+    r1 = h - rl * np.cos(c_lat) * np.cos(dlon)
+    r2 = -rl * np.cos(c_lat) * np.sin(dlon)
+    r3 = rl * np.sin(c_lat)
+    rn = np.sqrt(r1**2 + r2**2 + r3**2)
+    # Scanning angles
+    x = np.rad2deg(np.arctan(-r2 / r1))
+    y = np.rad2deg(np.arcsin(-r3 / rn))
+    cols = proj_info["coff"] + x * proj_info["cfac"] / 2**16 - 1
+    lines = proj_info["loff"] + y * proj_info["lfac"] / 2**16 - 1
+    # Mask locations on the far side of the Earth
+    visible = h * (h - r1) > rl**2
+    cols = np.where(visible, cols, np.nan)
+    lines = np.where(visible, lines, np.nan)
+    return lines, cols
+
+
+def get_bbox_linecol_slices(ll_bbox, proj_info, n_points=200):
+    """
+    Return the (line_slice, col_slice) of the grid enclosing a longitude/latitude box.
+
+    Parameters
+    ----------
+    ll_bbox : list
+        Bounding box [lon_min, lat_min, lon_max, lat_max] in degrees.
+    proj_info : dict
+        The AHI projection parameters. See `get_projection_info`.
+    n_points : int, optional
+        Number of points sampled along each edge of the box. The default is 200.
+
+    Returns
+    -------
+    (line_slice, col_slice) : tuple
+        Slices of the 0-based line and column indices.
+
+    """
+    lon_min, lat_min, lon_max, lat_max = ll_bbox
+    if lon_min >= lon_max or lat_min >= lat_max:
+        raise ValueError("`ll_bbox` must be [lon_min, lat_min, lon_max, lat_max].")
+    # The extreme lines/columns of the box are located on its edges
+    lons = np.linspace(lon_min, lon_max, n_points)
+    lats = np.linspace(lat_min, lat_max, n_points)
+    edge_lons = np.concatenate([lons, lons, np.full(n_points, lon_min), np.full(n_points, lon_max)])
+    edge_lats = np.concatenate([np.full(n_points, lat_min), np.full(n_points, lat_max), lats, lats])
+    lines, cols = lonlat_to_linecol(edge_lons, edge_lats, proj_info)
+    if np.all(np.isnan(lines)):
+        raise ValueError(f"The bounding box {ll_bbox} is not visible from the satellite.")
+    first_line = max(int(np.floor(np.nanmin(lines))), 0)
+    last_line = min(int(np.ceil(np.nanmax(lines))), proj_info["nlines"] - 1)
+    first_col = max(int(np.floor(np.nanmin(cols))), 0)
+    last_col = min(int(np.ceil(np.nanmax(cols))), proj_info["ncols"] - 1)
+    return slice(first_line, last_line + 1), slice(first_col, last_col + 1)
+
+
+####--------------------------------------------------------------------------.
+#### Segments index
+
+
+def get_segments_line_ranges(resolution, n_segments=AHI_FLDK_N_SEGMENTS):
+    """
+    Return the full disk line range of each FLDK segment.
+
+    Returns
+    -------
+    line_ranges : dict
+        Dictionary with structure {<segment_number>: (first_line, last_line)}.
+        The segment numbers start at 1 and the lines are 0-based and inclusive.
+
+    """
+    proj_info = get_projection_info(resolution)
+    n_lines = proj_info["nlines"] // n_segments
+    return {i + 1: (i * n_lines, (i + 1) * n_lines - 1) for i in range(n_segments)}
+
+
+@functools.lru_cache(maxsize=128)
+def _get_bbox_segments_index(ll_bbox, resolution):
+    """Compute (and cache) the segments index of a bounding box tuple."""
+    proj_info = get_projection_info(resolution)
+    line_slice, col_slice = get_bbox_linecol_slices(ll_bbox, proj_info)
+    index = []
+    for segment, (first_line, last_line) in get_segments_line_ranges(resolution).items():
+        start = max(line_slice.start, first_line)
+        stop = min(line_slice.stop - 1, last_line)
+        if start > stop:
+            continue
+        index.append((segment, start - first_line, stop - first_line, col_slice.start, col_slice.stop - 1))
+    return tuple(index)
+
+
+def get_bbox_segments_index(ll_bbox, resolution):
+    """
+    Return the FLDK segments and the segment lines/columns enclosing a bounding box.
+
+    The index of a given bounding box and resolution is computed once and cached.
+
+    Parameters
+    ----------
+    ll_bbox : list
+        Bounding box [lon_min, lat_min, lon_max, lat_max] in degrees.
+    resolution : float
+        Spatial resolution in km (0.5, 1 or 2).
+
+    Returns
+    -------
+    index : list
+        List of (segment_number, first_line, last_line, first_col, last_col).
+        The lines are relative to the segment, 0-based and inclusive.
+
+    """
+    ll_bbox = tuple(float(v) for v in ll_bbox)
+    resolution = _check_resolution(resolution)
+    return list(_get_bbox_segments_index(ll_bbox, resolution))
@@ -0,0 +1,663 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Define a lightweight reader of the Himawari Standard Data (HSD) format.
+
+The header blocks and the count array are decoded directly with numpy.
+The format is described in the HSD User's Guide:
+https://www.data.jma.go.jp/mscweb/en/himawari89/space_segment/hsd_sample/HS_D_users_guide_en_v13.pdf
+"""
+
+import os
+import datetime
+import numpy as np
+
+####--------------------------------------------------------------------------.
+#### HSD header blocks
+
+_BASIC_INFO = [
+    ("hblock_number", "u1"),
+    ("block_length", "u2"),
+    ("total_number_of_header_blocks", "u2"),
+    ("byte_order", "u1"),
+    ("satellite", "S16"),
+    ("processing_center_name", "S16"),
+    ("observation_area", "S4"),
+    ("other_observation_information", "S2"),
+    ("observation_timeline", "u2"),
+    ("observation_start_time", "f8"),
+    ("observation_end_time", "f8"),
+    ("file_creation_time", "f8"),
+    ("total_header_length", "u4"),
+    ("total_data_length", "u4"),
+    ("quality_flag1", "u1"),
+    ("quality_flag2", "u1"),
+    ("quality_flag3", "u1"),
+    ("quality_flag4", "u1"),
+    ("file_format_version", "S32"),
+    ("file_name", "S128"),
+    ("spare", "S40"),
+]
+
+_DATA_INFO = [
+    ("hblock_number", "u1"),
+    ("block_length", "u2"),
+    ("number_of_bits_per_pixel", "u2"),
+    ("number_of_columns", "u2"),
+    ("number_of_lines", "u2"),
+    ("compression_flag_for_data", "u1"),
+    ("spare", "S40"),
+]
+
+_PROJ_INFO = [
+    ("hblock_number", "u1"),
+    ("block_length", "u2"),
+    ("sub_lon", "f8"),
+    ("CFAC", "u4"),
+    ("LFAC", "u4"),
+    ("COFF", "f4"),
+    ("LOFF", "f4"),
+    ("distance_from_earth_center", "f8"),
+    ("earth_equatorial_radius", "f8"),
+    ("earth_polar_radius", "f8"),
+    ("req2_rpol2_req2", "f8"),
+    ("rpol2_req2", "f8"),
+    ("req2_rpol2", "f8"),
+    ("coeff_for_sd", "f8"),
+    ("resampling_types", "i2"),
+    ("resampling_size", "i2"),
+    ("spare", "S40"),
+]
+
+_CAL_INFO = [
+    ("hblock_number", "u1"),
+    ("block_length", "u2"),
+    ("band_number", "u2"),
+    ("central_wave_length", "f8"),
+    ("valid_number_of_bits_per_pixel", "u2"),
+    ("count_value_error_pixels", "u2"),
+    ("count_value_outside_scan_pixels", "u2"),
+    ("gain_count2rad_conversion", "f8"),
+    ("offset_count2rad_conversion", "f8"),
+]
+
+_IR_CAL_INFO = _CAL_INFO + [
+    ("c0_rad2tb_conversion", "f8"),
+    ("c1_rad2tb_conversion", "f8"),
+    ("c2_rad2tb_conversion", "f8"),
+    ("c0_tb2rad_conversion", "f8"),
+    ("c1_tb2rad_conversion", "f8"),
+    ("c2_tb2rad_conversion", "f8"),
+    ("speed_of_light", "f8"),
+    ("planck_constant", "f8"),
+    ("boltzmann_constant", "f8"),
+    ("spare", "S40"),
+]
+
+_VIS_CAL_INFO = _CAL_INFO + [
+    ("coeff_rad2albedo_conversion", "f8"),
+    ("coeff_update_time", "f8"),
+    ("cali_gain_count2rad_conversion", "f8"),
+    ("cali_offset_count2rad_conversion", "f8"),
+    ("spare", "S80"),
+]
+
+_SEGMENT_INFO = [
+    ("hblock_number", "u1"),
+    ("block_length", "u2"),
+    ("total_number_of_segments", "u1"),
+    ("segment_sequence_number", "u1"),
+    ("first_line_number_of_image_segment", "u2"),
+    ("spare", "S40"),
+]
+
+# Size of the header read before knowing the total header length
+_BASIC_INFO_SIZE = 282
+
+_VIS_BANDS = [1, 2, 3, 4, 5, 6]
+
+_CALIBRATIONS = ["auto", "counts", "radiance", "reflectance", "brightness_temperature"]
+
+_CALIBRATION_UNITS = {
+    "counts": "1",
+    "radiance": "W m-2 sr-1 um-1",
+    "reflectance": "%",
+    "brightness_temperature": "K",
+}
+
+
+def _get_dtype(fields, byte_order):
+    """Return the numpy dtype of a header block."""
+    endian = ">" if byte_order == 1 else "<"
+    return np.dtype([(name, endian + fmt if fmt[0] != "S" else fmt) for name, fmt in fields])
+
+
+def _read_block(buffer, fields, offset, byte_order):
+    """Decode a header block into a dictionary of python scalars."""
+    record = np.frombuffer(buffer, dtype=_get_dtype(fields, byte_order), count=1, offset=offset)[0]
+    return {name: record[name].item() for name, _ in fields if name != "spare"}
+
+
+def _get_block_length(buffer, offset, byte_order):
+    """Return the length of the header block starting at `offset`."""
+    endian = ">" if byte_order == 1 else "<"
+    return int(np.frombuffer(buffer, dtype=endian + "u2", count=1, offset=offset + 1)[0])
+
+
+def _mjd_to_datetime(mjd):
+    """Convert a Modified Julian Date into a datetime."""
+    return datetime.datetime(1858, 11, 17) + datetime.timedelta(days=mjd)
+
+
+def _parse_header(buffer):
+    """Decode the HSD header blocks required to read and calibrate the data."""
+    byte_order = np.frombuffer(buffer, dtype="u1", count=1, offset=5)[0]
+    header = {}
+    header["basic_info"] = _read_block(buffer, _BASIC_INFO, 0, byte_order)
+    offset = header["basic_info"]["block_length"]
+    # - Data information block
+    header["data_info"] = _read_block(buffer, _DATA_INFO, offset, byte_order)
+    offset += header["data_info"]["block_length"]
+    # - Projection information block
+    header["proj_info"] = _read_block(buffer, _PROJ_INFO, offset, byte_order)
+    offset += header["proj_info"]["block_length"]
+    # - Navigation information block (skipped)
+    offset += _get_block_length(buffer, offset, byte_order)
+    # - Calibration information block
+    cal_info = _read_block(buffer, _CAL_INFO, offset, byte_order)
+    fields = _VIS_CAL_INFO if cal_info["band_number"] in _VIS_BANDS else _IR_CAL_INFO
+    header["calibration"] = _read_block(buffer, fields, offset, byte_order)
+    offset += header["calibration"]["block_length"]
+    # - Inter-calibration information block (skipped)
+    offset += _get_block_length(buffer, offset, byte_order)
+    # - Segment information block
+    header["segment_info"] = _read_block(buffer, _SEGMENT_INFO, offset, byte_order)
+    header["byte_order"] = int(byte_order)
+    return header
+
+
+####--------------------------------------------------------------------------.
+#### HSD file access
+
+
+def _open_hsd(fpath):
+    """Open a (bz2 compressed) HSD file on local or cloud storage."""
+    import fsspec
+
+    return fsspec.open(os.fspath(fpath), mode="rb", compression="infer")
+
+
+def read_hsd_header(fpath):
+    """
+    Read the header of a HSD file.
+
+    Only the header bytes are decompressed.
+
+    Parameters
+    ----------
+    fpath : str
+        Filepath (or URL) of a .DAT or .DAT.bz2 HSD file.
+
+    Returns
+    -------
+    header : dict
+        Dictionary with the 'basic_info', 'data_info', 'proj_info',
+        'calibration' and 'segment_info' header blocks.
+
+    """
+    with _open_hsd(fpath) as f:
+        header = _read_header(f)
+    return header
+
+
+def _read_header(f):
+    """Read the header of an open HSD file."""
+    buffer = f.read(_BASIC_INFO_SIZE)
+    total_header_length = int(
+        np.frombuffer(buffer, dtype=_get_dtype(_BASIC_INFO, buffer[5]), count=1)[0]["total_header_length"]
+    )
+    buffer += f.read(total_header_length - _BASIC_INFO_SIZE)
+    return _parse_header(buffer)
+
+
+def _read_hsd_lines(fpath, line_slice, header=None):
+    """Read the header (if not provided) and a range of lines of a HSD file.
+
+    The bytes after the last line are not read (nor decompressed).
+    For uncompressed files, the lines are retrieved with a single ranged read.
+    """
+    with _open_hsd(fpath) as f:
+        if header is None:
+            header = _read_header(f)
+        n_cols = header["data_info"]["number_of_columns"]
+        n_lines = header["data_info"]["number_of_lines"]
+        start, stop, _ = line_slice.indices(n_lines)
+        f.seek(header["basic_info"]["total_header_length"] + start * n_cols * 2)
+        buffer = f.read((stop - start) * n_cols * 2)
+    endian = ">" if header["byte_order"] == 1 else "<"
+    counts = np.frombuffer(buffer, dtype=endian + "u2").reshape(stop - start, n_cols)
+    return header, counts
+
+
+def _read_hsd_buffer(fpath):
+    """Read the full (decompressed) content of a HSD file."""
+    with _open_hsd(fpath) as f:
+        buffer = f.read()
+    return buffer
+
+
+def _is_local_dat(fpath):
+    """Return True if the filepath is an uncompressed HSD file on local storage."""
+    fpath = os.fspath(fpath)
+    is_local = "://" not in fpath or fpath.startswith("file://")
+    return is_local and not fpath.endswith(".bz2")
+
+
+def _get_local_path(fpath):
+    """Remove the 'file://' prefix of a local filepath."""
+    fpath = os.fspath(fpath)
+    if fpath.startswith("file://"):
+        fpath = fpath[len("file://"):]
+    return fpath
+
+
+def _memmap_counts(fpath, header):
+    """Return the count array of a local .DAT file as a read-only memory-mapped array.
+
+    Only the pages of the file touched by the subsequent operations are read from disk.
+    """
+    endian = ">" if header["byte_order"] == 1 else "<"
+    shape = (header["data_info"]["number_of_lines"], header["data_info"]["number_of_columns"])
+    return np.memmap(
+        _get_local_path(fpath),
+        dtype=endian + "u2",
+        mode="r",
+        offset=header["basic_info"]["total_header_length"],
+        shape=shape,
+    )
+
+
+def _get_counts(buffer, header):
+    """Return the count array as a view of the HSD file content."""
+    endian = ">" if header["byte_order"] == 1 else "<"
+    n_lines = header["data_info"]["number_of_lines"]
+    n_cols = header["data_info"]["number_of_columns"]
+    counts = np.frombuffer(
+        buffer,
+        dtype=endian + "u2",
+        count=n_lines * n_cols,
+        offset=header["basic_info"]["total_header_length"],
+    )
+    return counts.reshape(n_lines, n_cols)
+
+
+####--------------------------------------------------------------------------.
+#### Calibration
+
+
+def _check_calibrate(calibrate):
+    """Check calibration validity."""
+    if not isinstance(calibrate, str):
+        raise TypeError("`calibrate` must be a string.")
+    if calibrate not in _CALIBRATIONS:
+        raise ValueError(f"Valid `calibrate` are {_CALIBRATIONS}.")
+    return calibrate
+
+
+def _get_band_calibration(band_number, calibrate):
+    """Resolve the 'auto' calibration and check it is available for the band."""
+    is_vis = band_number in _VIS_BANDS
+    if calibrate == "auto":
+        return "reflectance" if is_vis else "brightness_temperature"
+    if calibrate == "reflectance" and not is_vis:
+        raise ValueError(f"Reflectance is not available for the infrared band B{band_number:02d}.")
+    if calibrate == "brightness_temperature" and is_vis:
+        raise ValueError(f"Brightness temperature is not available for the visible band B{band_number:02d}.")
+    return calibrate
+
+
+def _calibrate(counts, header, calibrate):
+    """Calibrate the counts of a HSD segment.
+
+    Error and outside scan pixels are set to NaN.
+    """
+    cal = header["calibration"]
+    if calibrate == "counts":
+        return counts
+    # Radiance
+    invalid = (counts == cal["count_value_error_pixels"]) | (
+        counts == cal["count_value_outside_scan_pixels"]
+    )
+    rad = counts * np.float32(cal["gain_count2rad_conversion"]) + np.float32(
+        cal["offset_count2rad_conversion"]
+    )
+    rad[invalid] = np.nan
+    if calibrate == "radiance":
+        return rad
+    # Reflectance (in percent)
+    if calibrate == "reflectance":
+        rad *= np.float32(cal["coeff_rad2albedo_conversion"] * 100)
+        return rad
+    # Brightness temperature
+    # - Effective brightness temperature from the inverse Planck function
+    # - Radiances are in W m-2 sr-1 um-1 and the wavelength in um
+    wavelength = cal["central_wave_length"] * 1e-6
+    c, h, k = cal["speed_of_light"], cal["planck_constant"], cal["boltzmann_constant"]
+    a = (h * c) / (k * wavelength)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        b = (2 * h * c**2) / (rad.astype(np.float64) * 1.0e6 * wavelength**5) + 1
+        te = a / np.log(b)
+    # - Correction of the effective brightness temperature
+    tb = cal["c0_rad2tb_conversion"] + cal["c1_rad2tb_conversion"] * te + cal["c2_rad2tb_conversion"] * te**2
+    return tb.astype(np.float32)
+
+
+def _read_segment(fpath, calibrate, header=None, buffer=None, line_slice=slice(None), col_slice=slice(None)):
+    """Read and calibrate (the lines and columns of) a single HSD segment file.
+
+    The counts of local .DAT files are memory-mapped instead of read into memory.
+    If a line range is specified, only the required bytes of the other files are read.
+    If the `header` already parsed is provided, it is not decoded again.
+    """
+    if buffer is None and _is_local_dat(fpath):
+        if header is None:
+            header = read_hsd_header(_get_local_path(fpath))
+        counts = _memmap_counts(fpath, header)[line_slice, col_slice]
+    elif buffer is None and line_slice != slice(None):
+        header, counts = _read_hsd_lines(fpath, line_slice, header=header)
+        counts = counts[:, col_slice]
+    else:
+        if buffer is None:
+            buffer = _read_hsd_buffer(fpath)
+        if header is None:
+            header = _parse_header(buffer)
+        counts = _get_counts(buffer, header)[line_slice, col_slice]
+    calibrate = _get_band_calibration(header["calibration"]["band_number"], calibrate)
+    return _calibrate(counts, header, calibrate)
+
+
+####--------------------------------------------------------------------------.
+#### Segment stitching
+
+
+def _group_segments_by_band(headers):
+    """Group the (fpath, header) of the segments by band, sorted by first line."""
+    dict_band = {}
+    for fpath, header in headers:
+        band = "B{:02d}".format(header["calibration"]["band_number"])
+        dict_band.setdefault(band, []).append((fpath, header))
+    for band, segments in dict_band.items():
+        segments.sort(key=lambda item: item[1]["segment_info"]["first_line_number_of_image_segment"])
+        # Check segments are of the same timestep
+        start_times = {header["basic_info"]["observation_start_time"] for _, header in segments}
+        if len(start_times) > 1:
+            raise ValueError(f"The {band} segments belong to different timesteps.")
+    return dict_band
+
+
+def _get_header_resolution(header):
+    """Return the spatial resolution (in km) of a FLDK HSD file."""
+    observation_area = header["basic_info"]["observation_area"].decode().strip("\x00")
+    if observation_area != "FLDK":
+        raise NotImplementedError("Reading a bounding box is available only for the FLDK sector.")
+    return 11000 / header["data_info"]["number_of_columns"]
+
+
+def _get_segments_pieces(segments, ll_bbox=None):
+    """Return the (fpath, header, first_line, line_slice, col_slice) to read for each segment.
+
+    `first_line` is the 0-based full disk line of the first line to read.
+    The line and column slices are relative to the segment.
+    The segments not intersecting the bounding box are discarded.
+    """
+    pieces = []
+    if ll_bbox is None:
+        for fpath, header in segments:
+            first_line = header["segment_info"]["first_line_number_of_image_segment"] - 1
+            pieces.append((fpath, header, first_line, slice(None), slice(None)))
+        return pieces
+
+    from himawari_api.geometry import get_bbox_segments_index
+
+    resolution = _get_header_resolution(segments[0][1])
+    index = {item[0]: item[1:] for item in get_bbox_segments_index(ll_bbox, resolution)}
+    for fpath, header in segments:
+        segment = header["segment_info"]["segment_sequence_number"]
+        if segment not in index:
+            continue
+        first_line, last_line, first_col, last_col = index[segment]
+        segment_first_line = header["segment_info"]["first_line_number_of_image_segment"] - 1
+        pieces.append(
+            (
+                fpath,
+                header,
+                segment_first_line + first_line,
+                slice(first_line, last_line + 1),
+                slice(first_col, last_col + 1),
+            )
+        )
+    if len(pieces) == 0:
+        raise ValueError(f"None of the segments intersects the bounding box {ll_bbox}.")
+    return pieces
+
+
+def _get_piece_shape(piece):
+    """Return the shape of the counts to read for a segment."""
+    _, header, _, line_slice, col_slice = piece
+    n_lines = len(range(*line_slice.indices(header["data_info"]["number_of_lines"])))
+    n_cols = len(range(*col_slice.indices(header["data_info"]["number_of_columns"])))
+    return n_lines, n_cols
+
+
+def _get_segments_layout(pieces):
+    """Return the first line (0-based), the total number of lines and the row offset of each piece."""
+    first_lines = [piece[2] for piece in pieces]
+    first_line = first_lines[0]
+    total_lines = first_lines[-1] + _get_piece_shape(pieces[-1])[0] - first_line
+    offsets = [line - first_line for line in first_lines]
+    return first_line, total_lines, offsets
+
+
+def _get_array_attrs(pieces, calibrate):
+    """Return the attributes of a stitched band."""
+    header = pieces[0][1]
+    basic_info = header["basic_info"]
+    proj_info = header["proj_info"]
+    attrs = {
+        "band": "B{:02d}".format(header["calibration"]["band_number"]),
+        "calibration": calibrate,
+        "units": _CALIBRATION_UNITS[calibrate],
+        "satellite": basic_info["satellite"].decode().strip("\x00"),
+        "observation_area": basic_info["observation_area"].decode().strip("\x00"),
+        "start_time": _mjd_to_datetime(basic_info["observation_start_time"]),
+        "end_time": _mjd_to_datetime(pieces[-1][1]["basic_info"]["observation_end_time"]),
+        "central_wavelength": header["calibration"]["central_wave_length"],
+        "first_line": pieces[0][2],
+        "first_col": pieces[0][4].start or 0,
+        "sub_lon": proj_info["sub_lon"],
+        "cfac": proj_info["CFAC"],
+        "lfac": proj_info["LFAC"],
+        "coff": proj_info["COFF"],
+        "loff": proj_info["LOFF"],
+        "h": proj_info["distance_from_earth_center"],
+        "req": proj_info["earth_equatorial_radius"],
+        "rpol": proj_info["earth_polar_radius"],
+    }
+    return attrs
+
+
+def _get_fill_value(pieces, calibrate):
+    """Return the value of the missing segments: the outside scan count value or NaN."""
+    if calibrate == "counts":
+        return pieces[0][1]["calibration"]["count_value_outside_scan_pixels"]
+    return np.nan
+
+
+def _stitch_segments(pieces, calibrate, buffers):
+    """Calibrate and stitch the segments of a band into a numpy array."""
+    first_line, total_lines, offsets = _get_segments_layout(pieces)
+    arrays = [
+        _read_segment(
+            fpath,
+            calibrate,
+            header=header,
+            buffer=buffers.pop(fpath, None),
+            line_slice=line_slice,
+            col_slice=col_slice,
+        )
+        for fpath, header, _, line_slice, col_slice in pieces
+    ]
+    if len(arrays) == 1:
+        return arrays[0]
+    fill_value = _get_fill_value(pieces, calibrate)
+    # Missing segments are filled with fill_value
+    data = np.full((total_lines, arrays[0].shape[1]), fill_value, dtype=arrays[0].dtype)
+    for offset, arr in zip(offsets, arrays):
+        data[offset: offset + arr.shape[0]] = arr
+    return data
+
+
+def _get_segment_lazy(piece, calibrate, chunks):
+    """Return the dask array of (the lines and columns of) a single HSD segment."""
+    import dask
+    import dask.array as da
+
+    fpath, header, _, line_slice, col_slice = piece
+    dtype = np.uint16 if calibrate == "counts" else np.float32
+    if not _is_local_dat(fpath):
+        delayed_segment = dask.delayed(_read_segment)(
+            fpath, calibrate, header=header, line_slice=line_slice, col_slice=col_slice
+        )
+        arr = da.from_delayed(delayed_segment, shape=_get_piece_shape(piece), dtype=dtype)
+        if chunks is not None:
+            arr = arr.rechunk(chunks)
+        return arr
+    # Local .DAT files: the chunks are views of the memory-mapped counts
+    counts = _memmap_counts(fpath, header)
+    counts = da.from_array(counts, chunks=chunks or counts.shape, name=False)[line_slice, col_slice]
+    if calibrate == "counts":
+        return counts
+    return counts.map_blocks(_calibrate, header=header, calibrate=calibrate, dtype=dtype)
+
+
+def _stitch_segments_lazy(pieces, calibrate, chunks=None):
+    """Stitch the segments of a band into a dask array.
+
+    By default, the array has one chunk per segment.
+    The concatenation of the segments does not copy any data.
+    """
+    import dask.array as da
+
+    first_line, total_lines, offsets = _get_segments_layout(pieces)
+    dtype = np.uint16 if calibrate == "counts" else np.float32
+    fill_value = _get_fill_value(pieces, calibrate)
+    arrays = []
+    next_line = 0
+    for offset, piece in zip(offsets, pieces):
+        arr = _get_segment_lazy(piece, calibrate, chunks)
+        # Fill missing segments
+        if offset > next_line:
+            arrays.append(da.full((offset - next_line, arr.shape[1]), fill_value, dtype=dtype))
+        arrays.append(arr)
+        next_line = offset + arr.shape[0]
+    if len(arrays) == 1:
+        return arrays[0]
+    return da.concatenate(arrays, axis=0)
+
+
+def read_hsd(fpaths, calibrate="auto", ll_bbox=None, lazy=False, chunks=None, as_xarray=False):
+    """
+    Read Himawari Standard Data (HSD) files without satpy.
+
+    The segments of each band are stitched along the lines.
+    Missing segments between the first and last segment are filled with NaN,
+    or with the header `count_value_outside_scan_pixels` if `calibrate="counts"`.
+
+    Parameters
+    ----------
+    fpaths : list
+        Filepaths (or URLs) of .DAT or .DAT.bz2 HSD files of a single timestep.
+        They can include multiple bands and segments.
+    calibrate : str, optional
+        Either "counts", "radiance", "reflectance", "brightness_temperature" or "auto".
+        If "auto" (the default), the visible bands (B01-B06) are calibrated
+        to reflectance (%) and the infrared bands (B07-B16) to brightness temperature (K).
+    ll_bbox : list, optional
+        Bounding box [lon_min, lat_min, lon_max, lat_max] to read (FLDK only).
+        Only the lines and columns of the segments enclosing the bounding box are read:
+        the segments not intersecting the box are skipped, local .DAT files
+        are read only where required and the decompression of the other files
+        stops after the last required line.
+        The default is None (read the full segments).
+    lazy : bool, optional
+        If True, return dask arrays with one chunk per segment.
+        Only the file headers are read when calling the function.
+        The counts of local uncompressed .DAT files are memory-mapped, so that
+        computing a crop of the array reads only the touched pages of the files.
+        The default is False.
+    chunks : tuple or int, optional
+        Chunk size of each segment if `lazy=True`. Small chunks reduce the
+        data read from local .DAT files when computing a crop.
+        The default is None (one chunk per segment).
+    as_xarray : bool, optional
+        If True, return xarray.DataArray(s) with the HSD metadata in the attributes.
+        The attributes `first_line` and `first_col` are the 0-based full disk line
+        and column of the first array element and can be passed to
+        `himawari_api.apply_lut`. The default is False.
+
+    Returns
+    -------
+    data : dict
+        Dictionary with structure {<band>: array}.
+
+    """
+    calibrate = _check_calibrate(calibrate)
+    if isinstance(fpaths, (str, os.PathLike)):
+        fpaths = [fpaths]
+    if len(fpaths) == 0:
+        raise ValueError("No HSD files specified.")
+    # Read the headers
+    # - If lazy, for bounding box reads or for local .DAT files, only the header bytes are read
+    # - Otherwise, the files are read once and the headers decoded from the file content
+    buffers = {}
+    headers = []
+    for fpath in fpaths:
+        if lazy or ll_bbox is not None or _is_local_dat(fpath):
+            headers.append((fpath, read_hsd_header(fpath)))
+        else:
+            buffers[fpath] = _read_hsd_buffer(fpath)
+            headers.append((fpath, _parse_header(buffers[fpath])))
+    dict_band = _group_segments_by_band(headers)
+
+    # Read the bands
+    data = {}
+    for band, segments in sorted(dict_band.items()):
+        band_calibrate = _get_band_calibration(int(band[1:]), calibrate)
+        pieces = _get_segments_pieces(segments, ll_bbox=ll_bbox)
+        if lazy:
+            arr = _stitch_segments_lazy(pieces, band_calibrate, chunks=chunks)
+        else:
+            arr = _stitch_segments(pieces, band_calibrate, buffers)
+        if as_xarray:
+            import xarray as xr
+
+            attrs = _get_array_attrs(pieces, band_calibrate)
+            arr = xr.DataArray(arr, dims=("y", "x"), name=band, attrs=attrs)
+        data[band] = arr
+    return data
+
+
+####--------------------------------------------------------------------------.
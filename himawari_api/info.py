@@ -16,9 +16,9 @@
 # himawari_api. If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import sys
 import datetime
-import numpy as np
-from trollsift import Parser
+import functools
 from himawari_api.checks import _check_group_by_key, _check_time
 from himawari_api.alias import (
     BUCKET_PROTOCOLS,
@@ -172,8 +172,7 @@ def available_sectors(product=None):
 def available_product_levels():
     """Return a list of available product levels."""
     from himawari_api.listing import PRODUCTS
-    product_levels = list(PRODUCTS["AHI"])        
-    product_levels = np.unique(product_levels).tolist()
+    product_levels = sorted(set(PRODUCTS["AHI"]))
     return product_levels
 
 
@@ -183,6 +182,25 @@ def available_channels():
     return channels
 
 
+def available_composites():
+    """Return a list of satpy composites which can be used to filter AHI channels."""
+    from himawari_api.listing import AHI_COMPOSITES
+
+    return list(AHI_COMPOSITES)
+
+
+def get_composites_channels(composites):
+    """Return the list of AHI channels required to create the satpy composites.
+
+    See `himawari_api.available_composites()` for available composites.
+    The channels are retrieved from a static table, without opening any data.
+    """
+    from himawari_api.checks import _check_composites, _get_composites_channels
+
+    composites = _check_composites(composites)
+    return _get_composites_channels(composites)
+
+
 def available_products(product_levels=None):
     """Return a list of available products.
     
@@ -225,9 +243,9 @@ def infer_satellite_from_path(path):
     """Infer the satellite from the file path."""
     himawari8_patterns = ['himawari8', 'himawari-8', 'H8', 'H08']
     himawari9_patterns = ['himawari9', 'himawari-9', 'H9', 'H09'] 
-    if np.any([pattern in path for pattern in himawari8_patterns]):
+    if any(pattern in path for pattern in himawari8_patterns):
         return 'himawari-8'
-    if np.any([pattern in path for pattern in himawari9_patterns]):
+    if any(pattern in path for pattern in himawari9_patterns):
         return 'himawari-9'
     else:
         raise ValueError("Unexpected HIMAWARI file path.")
@@ -239,7 +257,7 @@ def _infer_product_level(fpath):
     # Check if it is a L2 product 
     l2_products = ["HYDRO_RAIN_RATE", "RRQPE", "CLOUD_HEIGHT", "CHGT", "CLOUD_MASK", "CMSK", "CLOUD_PHASE", "CPHS"]
     bool_valid_product = [product in fname for product in l2_products]
-    if np.any(bool_valid_product):
+    if any(bool_valid_product):
         product_level = "L2"
     # Otherwise check if it is a L1b Rad product  
     # - It could also check that "_B" is in fname  
@@ -257,8 +275,8 @@ def _infer_product(fpath):
     # Check if it is a L2 product 
     l2_products = ["HYDRO_RAIN_RATE", "RRQPE", "CLOUD_HEIGHT", "CHGT", "CLOUD_MASK", "CMSK", "CLOUD_PHASE", "CPHS"]
     bool_valid_product = [product in fname for product in l2_products]
-    if np.any(bool_valid_product):
-        product = l2_products[np.argwhere(bool_valid_product)[0][0]]
+    if any(bool_valid_product):
+        product = l2_products[bool_valid_product.index(True)]
     # Otherwise check if it is a L1b Rad product  
     # - It could also check that "_B" is in fname  
     elif 'HS' in fname:
@@ -276,9 +294,9 @@ def _infer_satellite(fpath):
     himawari8_patterns = ['himawari8', 'himawari-8', 'H8', 'H08']
     himawari9_patterns = ['himawari9', 'himawari-9', 'H9', 'H09'] 
     
-    if np.any([pattern in fpath for pattern in himawari8_patterns]):
+    if any(pattern in fpath for pattern in himawari8_patterns):
         return 'himawari-8'
-    if np.any([pattern in fpath for pattern in himawari9_patterns]):
+    if any(pattern in fpath for pattern in himawari9_patterns):
         return 'himawari-9'
     else: 
         raise ValueError(f"`satellite` could not be inferred from {fname}.")
@@ -317,6 +335,14 @@ def _separate_sector_observation_number(sector_observation_number):
     return sector, scene_abbr, observation_number
 
 
+@functools.lru_cache(maxsize=None)
+def _get_parser(fpattern):
+    """Return the (cached) trollsift parser of a filename pattern."""
+    from trollsift import Parser
+
+    return Parser(fpattern)
+
+
 def _get_info_from_filename(fname):
     """Retrieve file information dictionary from filename."""
     from himawari_api.listing import GLOB_FNAME_PATTERN
@@ -330,7 +356,7 @@ def _get_info_from_filename(fname):
     fpattern = GLOB_FNAME_PATTERN[sensor][product_level][product]       
     
     # Retrieve information from filename 
-    p = Parser(fpattern)
+    p = _get_parser(fpattern)
     info_dict = p.parse(fname)
     
     info_dict["sensor"] = sensor
@@ -422,17 +448,152 @@ def _get_info_from_filename(fname):
     return info_dict
 
 
+####--------------------------------------------------------------------------.
+#### File records
+
+# Keys of the information extracted from the filenames
+_FILE_RECORD_KEYS = (
+    "satellite",
+    "sensor",
+    "product_level",
+    "product",
+    "sector",
+    "scene_abbr",
+    "channel",
+    "platform_shortname",
+    "platform_fullname",
+    "sector_observation_number",
+    "start_time",
+    "end_time",
+    "production_time",
+    "creation_time",
+    "spatial_res",
+    "segment_number",
+    "segment_total",
+    "data_format",
+    "version",
+)
+
+# Keys with few possible values, whose strings are interned and shared across records
+_CATEGORICAL_KEYS = (
+    "satellite",
+    "sensor",
+    "product_level",
+    "product",
+    "sector",
+    "channel",
+    "platform_shortname",
+    "platform_fullname",
+    "sector_observation_number",
+    "data_format",
+    "version",
+)
+
+
+class HimawariFile:
+    """Compact record of the information contained in a Himawari filepath.
+
+    The record can be used in place of the file information dictionary
+    (i.e. `record["channel"]` or `record.get("channel")`), but it stores
+    the information in `__slots__` and shares the categorical strings
+    (satellite, product, sector, channel, ...) across records.
+    A record requires less than half of the memory of the equivalent
+    info dictionary.
+
+    The record is path-like: it can be passed to `open()` and `os.path`
+    functions and it can be used in place of the filepath in the
+    `himawari_api` filtering and grouping functions.
+    """
+
+    __slots__ = ("fpath",) + _FILE_RECORD_KEYS
+
+    def __init__(self, fpath, **info):
+        self.fpath = fpath
+        for key in _FILE_RECORD_KEYS:
+            value = info.get(key)
+            if isinstance(value, str) and key in _CATEGORICAL_KEYS:
+                value = sys.intern(value)
+            elif isinstance(value, list):
+                value = tuple(sys.intern(v) for v in value)
+            setattr(self, key, value)
+
+    def __getitem__(self, key):
+        # As the info dictionary, raise a KeyError for the information not available
+        value = getattr(self, key) if key in _FILE_RECORD_KEYS else None
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __contains__(self, key):
+        return key in _FILE_RECORD_KEYS and getattr(self, key) is not None
+
+    def __fspath__(self):
+        return self.fpath
+
+    def __repr__(self):
+        return f"HimawariFile('{self.fpath}')"
+
+    def __eq__(self, other):
+        if isinstance(other, HimawariFile):
+            return self.fpath == other.fpath
+        return NotImplemented
+
+    def __hash__(self):
+        return hash(self.fpath)
+
+    def get(self, key, default=None):
+        """Return the value of `key` if available, else `default`."""
+        value = getattr(self, key, None) if key in _FILE_RECORD_KEYS else None
+        return default if value is None else value
+
+    def keys(self):
+        """Return the keys of the information available for the file."""
+        return [key for key in _FILE_RECORD_KEYS if getattr(self, key) is not None]
+
+    def to_dict(self):
+        """Return the file information dictionary."""
+        return {key: getattr(self, key) for key in self.keys()}
+
+
 def _get_info_from_filepath(fpath):
-    """Retrieve file information dictionary from filepath."""
+    """Retrieve the file information record from filepath.
+
+    If a `HimawariFile` record is provided, it is returned as it is.
+    """
+    if isinstance(fpath, HimawariFile):
+        return fpath
     if not isinstance(fpath, str):
         raise TypeError("'fpath' must be a string.")
     fname = os.path.basename(fpath)
-    return _get_info_from_filename(fname)
+    info_dict = _get_info_from_filename(fname)
+    return HimawariFile(fpath, **info_dict)
+
+
+def get_file_records(fpaths):
+    """
+    Return the `HimawariFile` records of a list of filepaths.
+
+    Parameters
+    ----------
+    fpaths : list
+        List of filepaths.
+
+    Returns
+    -------
+    records : list
+        List of `HimawariFile` records.
+        The records can be passed to `filter_files`, `group_files` and to the
+        `himawari_api.query` functions in place of the filepaths.
+
+    """
+    if isinstance(fpaths, (str, HimawariFile)):
+        fpaths = [fpaths]
+    return [_get_info_from_filepath(fpath) for fpath in fpaths]
 
 
 def _get_key_from_filepaths(fpaths, key):
     """Extract specific key information from a list of filepaths."""
-    if isinstance(fpaths, str):
+    if isinstance(fpaths, (str, HimawariFile)):
         fpaths = [fpaths]
     return [
         _get_info_from_filepath(fpath)[key] for fpath in fpaths
@@ -452,11 +613,16 @@ def get_key_from_filepaths(fpaths, key):
 
 def _group_fpaths_by_key(fpaths, product_level=None, key="start_time"):
     """Utils function to group filepaths by key contained into filename.""" 
+    import numpy as np
+
     # - Retrieve key sorting index 
     list_key_values = [_get_info_from_filepath(fpath)[key] for fpath in fpaths]
     idx_key_sorting = np.array(list_key_values).argsort()
     # - Sort fpaths and key_values by key values
-    fpaths = np.array(fpaths)[idx_key_sorting]
+    # --> Object array to also support HimawariFile records
+    arr_fpaths = np.empty(len(fpaths), dtype=object)
+    arr_fpaths[:] = fpaths
+    fpaths = arr_fpaths[idx_key_sorting]
     list_key_values = np.array(list_key_values)[idx_key_sorting]
     # - Retrieve first occurence of new key value
     unique_key_values, cut_idx = np.unique(list_key_values, return_index=True)
@@ -476,7 +642,7 @@ def group_files(fpaths, key="start_time"):
     Parameters
     ----------
     fpaths : list
-        List of filepaths.
+        List of filepaths (or `HimawariFile` records).
     key : str
         Key by which to group the list of filepaths.
         The default key is "start_time".
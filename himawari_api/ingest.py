@@ -0,0 +1,556 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Define himawari_api functions for the continuous near real-time (NRT) ingestion.
+
+A `NRTWatcher` polls the most recent time directories of a product at the
+cadence of the sector acquisitions and returns only the files not seen in the
+previous cycles. The filesystem (and its connections) and the set of files
+already seen are kept across the cycles, so that a single long-running process
+can watch or ingest the new acquisitions.
+
+With `adaptive=True`, the watcher learns the publication delay of the sector
+from the `LastModified` time of the listed files (`PublicationDelayEstimator`),
+sleeps until the next acquisition is expected and then lists only the time
+directory of that acquisition, with an exponential backoff.
+
+The polls and downloads preempt the other rate-limited requests of the process
+(see `himawari_api.set_rate_limits`).
+"""
+
+import datetime
+import time
+
+import numpy as np
+
+from himawari_api.metrics import get_metrics
+from himawari_api.ratelimit import PRIORITY_NRT, priority
+
+
+####--------------------------------------------------------------------------.
+#### Publication delay
+
+
+def _to_naive_utc(time):
+    """Convert a (timezone-aware) datetime to a naive UTC datetime."""
+    if time.tzinfo is not None:
+        time = time.astimezone(datetime.timezone.utc).replace(tzinfo=None)
+    return time
+
+
+class PublicationDelayEstimator:
+    """
+    Estimate the delay between the start of the acquisitions and their publication.
+
+    The delay of an acquisition is the time between its start_time and the
+    `LastModified` time of its first published file. The estimate is a quantile
+    of the delays of the most recent acquisitions.
+
+    Parameters
+    ----------
+    cadence : datetime.timedelta
+        Time between two acquisitions of the sector.
+    default_delay : datetime.timedelta, optional
+        Delay returned before any acquisition is recorded.
+        The default is the `cadence`.
+    quantile : float, optional
+        Quantile of the recorded delays. The default is 0.5 (median).
+    max_samples : int, optional
+        Number of most recent acquisitions used by the estimate. The default is 50.
+
+    """
+
+    def __init__(self, cadence, default_delay=None, quantile=0.5, max_samples=50):
+        if not isinstance(cadence, datetime.timedelta):
+            raise TypeError("`cadence` must be a datetime.timedelta.")
+        if default_delay is None:
+            default_delay = cadence
+        if not isinstance(default_delay, datetime.timedelta):
+            raise TypeError("`default_delay` must be a datetime.timedelta.")
+        if not 0 <= quantile <= 1:
+            raise ValueError("`quantile` must be between 0 and 1.")
+        self.cadence = cadence
+        self.default_delay = default_delay
+        self.quantile = quantile
+        self.max_samples = max_samples
+        # First publication time of the acquisitions {start_time: last_modified}
+        self._published = {}
+
+    def __repr__(self):
+        return f"<PublicationDelayEstimator delay={self.get_delay()} ({self.n_samples} acquisitions)>"
+
+    @property
+    def n_samples(self):
+        """Number of acquisitions used by the estimate."""
+        return len(self._published)
+
+    def update(self, start_time, last_modified):
+        """Record the publication time of a file of the acquisition starting at `start_time`."""
+        last_modified = _to_naive_utc(last_modified)
+        if last_modified < start_time:
+            return
+        if start_time in self._published:
+            self._published[start_time] = min(self._published[start_time], last_modified)
+            return
+        self._published[start_time] = last_modified
+        if len(self._published) > self.max_samples:
+            del self._published[min(self._published)]
+
+    def update_from_info(self, dict_info):
+        """Record the files of a detailed listing {fpath: info}.
+
+        The files without a `LastModified` time (i.e. on local storage) are ignored.
+        """
+        from himawari_api.info import _get_info_from_filepath
+
+        for fpath, info in dict_info.items():
+            last_modified = info.get("LastModified")
+            if isinstance(last_modified, datetime.datetime):
+                self.update(_get_info_from_filepath(fpath)["start_time"], last_modified)
+
+    def get_delay(self, quantile=None):
+        """Return the estimated publication delay (datetime.timedelta)."""
+        if self.n_samples == 0:
+            return self.default_delay
+        quantile = self.quantile if quantile is None else quantile
+        delays = [
+            (last_modified - start_time).total_seconds()
+            for start_time, last_modified in self._published.items()
+        ]
+        return datetime.timedelta(seconds=float(np.quantile(delays, quantile)))
+
+    def get_next_start_time(self, start_time):
+        """Return the start_time of the acquisition following `start_time`."""
+        return start_time + self.cadence
+
+    def get_expected_publication_time(self, start_time, quantile=None):
+        """Return the time at which the acquisition starting at `start_time` is expected to be published."""
+        return start_time + self.get_delay(quantile=quantile)
+
+
+####--------------------------------------------------------------------------.
+#### Near real-time watcher
+
+
+class NRTWatcher:
+    """
+    Watch a product for new files.
+
+    Parameters
+    ----------
+    satellite : str
+        The name of the satellite.
+    product_level : str
+        Product level.
+    product : str
+        The name of the product.
+    sector : str
+        The acronym of the AHI sector.
+    filter_parameters : dict, optional
+        Dictionary specifying option filtering parameters (i.e. `channels`).
+    protocol : str, optional
+        String specifying the cloud bucket storage. The default is "s3".
+        If `base_dir` is specified, the local storage is watched instead.
+    fs_args : dict, optional
+        Dictionary specifying optional settings to initiate the fsspec.filesystem.
+    base_dir : str, optional
+        Base directory path where the <HIMAWARI-**> satellite is located.
+    lookback : datetime.timedelta, optional
+        Time window (before the current time) of the directories listed at each poll.
+        The default is 30 minutes.
+    poll_interval : datetime.timedelta, optional
+        Time between two polls. The default is the sector acquisition cadence.
+    min_backoff : datetime.timedelta, optional
+        First waiting time between two listings of an expected acquisition
+        which is not yet published (see `poll_next`). It is doubled at each
+        listing, up to the sector acquisition cadence. The default is 5 seconds.
+
+    """
+
+    def __init__(
+        self,
+        satellite,
+        product_level,
+        product,
+        sector,
+        filter_parameters={},
+        protocol="s3",
+        fs_args={},
+        base_dir=None,
+        lookback=datetime.timedelta(minutes=30),
+        poll_interval=None,
+        min_backoff=datetime.timedelta(seconds=5),
+    ):
+        from himawari_api.search import _check_search_inputs, _get_acquisition_max_timedelta
+
+        now = datetime.datetime.utcnow()
+        (
+            self.satellite,
+            self.product_level,
+            self.product,
+            _,
+            _,
+            self.sector,
+            self.filter_parameters,
+            _,
+            _,
+            self.base_dir,
+            self.protocol,
+            self.fs_args,
+        ) = _check_search_inputs(
+            satellite=satellite,
+            product_level=product_level,
+            product=product,
+            start_time=now - lookback,
+            end_time=now,
+            sector=sector,
+            filter_parameters=filter_parameters,
+            group_by_key=None,
+            connection_type=None,
+            base_dir=base_dir,
+            protocol=None if base_dir is not None else protocol,
+            fs_args=dict(fs_args),
+        )
+        if not isinstance(lookback, datetime.timedelta):
+            raise TypeError("`lookback` must be a datetime.timedelta.")
+        cadence = _get_acquisition_max_timedelta(self.sector)
+        if poll_interval is None:
+            poll_interval = cadence
+        if not isinstance(poll_interval, datetime.timedelta):
+            raise TypeError("`poll_interval` must be a datetime.timedelta.")
+        if not isinstance(min_backoff, datetime.timedelta):
+            raise TypeError("`min_backoff` must be a datetime.timedelta.")
+        self.lookback = lookback
+        self.poll_interval = poll_interval
+        self.min_backoff = min_backoff
+        self.estimator = PublicationDelayEstimator(cadence=cadence)
+        # Files already returned {fpath: start_time}
+        self._seen = {}
+        # Files to return again at the next poll {fpath: start_time}
+        self._retry = {}
+        self._latest_start_time = None
+        self.n_polls = 0
+
+    def __repr__(self):
+        return (
+            f"<NRTWatcher {self.satellite} {self.product_level} {self.product} {self.sector} "
+            f"(poll every {self.poll_interval}, {len(self._seen)} files seen)>"
+        )
+
+    def _prune_seen(self, start_time):
+        """Forget the files which can not be listed anymore.
+
+        A file starting (at most 10 minutes) before the lookback window is still
+        listed if it ends within the window.
+        """
+        start_time = start_time - datetime.timedelta(minutes=10)
+        self._seen = {fpath: time for fpath, time in self._seen.items() if time >= start_time}
+        self._retry = {fpath: time for fpath, time in self._retry.items() if time >= start_time}
+
+    @property
+    def latest_start_time(self):
+        """Start time of the most recent acquisition seen (None if no file was seen)."""
+        return self._latest_start_time
+
+    def retry(self, fpaths):
+        """Return the files again at the next poll (i.e. if their download failed).
+
+        The files are retried until they are older than the lookback window.
+        """
+        from himawari_api.info import _get_info_from_filepath
+
+        for fpath in fpaths:
+            start_time = self._seen.get(fpath)
+            if start_time is None:
+                start_time = _get_info_from_filepath(fpath)["start_time"]
+            self._retry[fpath] = start_time
+
+    def _pop_retry_fpaths(self):
+        """Return (and forget) the files to retry."""
+        fpaths = list(self._retry)
+        self._retry = {}
+        return fpaths
+
+    def _list_new_files(self, start_time, end_time, time_dir_trees=None):
+        """List the files of a time period (or of some time directories) and return the files not seen before."""
+        from himawari_api.info import _get_info_from_filepath
+        from himawari_api.search import _iter_directories_fpaths
+
+        filter_parameters = self.filter_parameters.copy()
+        filter_parameters.update({"start_time": start_time, "end_time": end_time})
+        new_fpaths = []
+        # The filesystem instance (and its connections) is cached by fsspec across the polls
+        # The listings preempt the rate-limited backfill requests of the process
+        with priority(PRIORITY_NRT):
+            l_dict_info = list(
+                _iter_directories_fpaths(
+                    satellite=self.satellite,
+                    product_level=self.product_level,
+                    product=self.product,
+                    start_time=start_time,
+                    end_time=end_time,
+                    sector=self.sector,
+                    filter_parameters=filter_parameters,
+                    base_dir=self.base_dir,
+                    protocol=self.protocol,
+                    fs_args=self.fs_args,
+                    detail=True,
+                    time_dir_trees=time_dir_trees,
+                )
+            )
+        for dict_info in l_dict_info:
+            self.estimator.update_from_info(dict_info)
+            for fpath in dict_info:
+                if fpath not in self._seen:
+                    start_time = _get_info_from_filepath(fpath)["start_time"]
+                    self._seen[fpath] = start_time
+                    new_fpaths.append(fpath)
+                    if self._latest_start_time is None or start_time > self._latest_start_time:
+                        self._latest_start_time = start_time
+        self.n_polls += 1
+        get_metrics().inc("nrt_new_files", len(new_fpaths))
+        return new_fpaths
+
+    def poll(self, now=None):
+        """
+        List the files of the lookback window and return the files not seen before.
+
+        The files to retry (see `retry`) are also returned.
+
+        Returns
+        -------
+        fpaths : list
+            The files to retry and the new filepaths, in chronological order.
+        """
+        now = datetime.datetime.utcnow() if now is None else now
+        start_time = now - self.lookback
+        new_fpaths = self._list_new_files(start_time, now)
+        self._prune_seen(start_time)
+        return self._pop_retry_fpaths() + new_fpaths
+
+    def poll_next(self, timeout=None):
+        """
+        Wait for the next acquisition and return its files (and the other files not seen before).
+
+        The next acquisition starts one sector cadence after the most recent
+        acquisition seen. The method sleeps until its expected publication time
+        (see `PublicationDelayEstimator`) and then lists only its time directory,
+        waiting `min_backoff` (doubled at each listing, up to the sector cadence)
+        between two listings until new files are found.
+        If no file is found within `timeout` (by default, one sector cadence after
+        the expected publication time), an empty list is returned.
+        If no file was seen before or if the next acquisition is overdue, the whole
+        lookback window is first listed with `poll`, and the missing acquisitions
+        are skipped.
+        The files to retry (see `retry`) are returned together with the new files.
+
+        Returns
+        -------
+        fpaths : list
+            The files to retry and the new filepaths, in chronological order.
+        """
+        from himawari_api.search import _get_list_time_dir_tree
+
+        if timeout is None:
+            timeout = self.estimator.cadence
+        if not isinstance(timeout, datetime.timedelta):
+            raise TypeError("`timeout` must be a datetime.timedelta.")
+        latest_start_time = self.latest_start_time
+        if latest_start_time is None:
+            return self.poll()
+        next_start_time = self.estimator.get_next_start_time(latest_start_time)
+
+        def _is_overdue(start_time):
+            expected_time = self.estimator.get_expected_publication_time(start_time)
+            return expected_time + timeout < datetime.datetime.utcnow()
+
+        if _is_overdue(next_start_time):
+            # Catch up the acquisitions published since the last poll
+            new_fpaths = self.poll()
+            if len(new_fpaths) > 0:
+                return new_fpaths
+            # Skip the missing acquisitions
+            while _is_overdue(next_start_time):
+                next_start_time = self.estimator.get_next_start_time(next_start_time)
+        expected_time = self.estimator.get_expected_publication_time(next_start_time)
+        deadline = max(expected_time, datetime.datetime.utcnow()) + timeout
+        time.sleep(max((expected_time - datetime.datetime.utcnow()).total_seconds(), 0))
+
+        # Time directory of the next acquisition
+        time_dir_trees = [next(_get_list_time_dir_tree(next_start_time, next_start_time))]
+        backoff = self.min_backoff
+        while True:
+            new_fpaths = self._list_new_files(
+                start_time=next_start_time,
+                end_time=next_start_time + self.estimator.cadence,
+                time_dir_trees=time_dir_trees,
+            )
+            # Forget the files older than the lookback window
+            self._prune_seen(next_start_time - self.lookback)
+            if len(new_fpaths) > 0:
+                return self._pop_retry_fpaths() + new_fpaths
+            remaining = (deadline - datetime.datetime.utcnow()).total_seconds()
+            if remaining <= 0:
+                return self._pop_retry_fpaths()
+            time.sleep(min(backoff.total_seconds(), remaining))
+            backoff = min(2 * backoff, self.estimator.cadence)
+
+    def iter_new_files(self, max_polls=None, adaptive=False):
+        """
+        Poll at `poll_interval` and yield the list of new files of each poll.
+
+        The polls are scheduled at fixed times, so that the listing duration
+        does not delay the schedule.
+
+        Parameters
+        ----------
+        max_polls : int, optional
+            Maximum number of polls. By default, poll forever.
+        adaptive : bool, optional
+            If True, after a first `poll` of the lookback window, wait for each
+            next acquisition with `poll_next` instead of polling at fixed times.
+            The default is False.
+        """
+        interval = self.poll_interval.total_seconds()
+        next_poll = time.monotonic()
+        n_polls = 0
+        while max_polls is None or n_polls < max_polls:
+            if adaptive and n_polls > 0:
+                yield self.poll_next()
+                n_polls += 1
+                continue
+            yield self.poll()
+            n_polls += 1
+            if max_polls is not None and n_polls >= max_polls:
+                break
+            if adaptive:
+                continue
+            next_poll += interval
+            now = time.monotonic()
+            if next_poll < now:
+                # The poll lasted longer than the interval: reset the schedule
+                next_poll = now
+            time.sleep(next_poll - now)
+
+
+def ingest(
+    base_dir,
+    satellite,
+    product_level,
+    product,
+    sector,
+    filter_parameters={},
+    protocol="s3",
+    fs_args={},
+    lookback=datetime.timedelta(minutes=30),
+    poll_interval=None,
+    n_threads=20,
+    max_polls=None,
+    adaptive=False,
+    callback=None,
+    progress_bar=False,
+    verbose=True,
+):
+    """
+    Continuously download the new files of a product (near real-time ingestion).
+
+    The bucket is polled at the sector acquisition cadence (or every `poll_interval`)
+    within a single process. The new files are downloaded into
+    <base_dir>/<HIMAWARI-**>/<product>/..., skipping the files already present.
+
+    Parameters
+    ----------
+    base_dir : str
+        Base directory path where the <HIMAWARI-**>/<product>/... directory structure
+        should be created.
+    satellite, product_level, product, sector, filter_parameters, protocol, fs_args :
+        See `himawari_api.download_files`.
+    lookback : datetime.timedelta, optional
+        Time window (before the current time) of the directories listed at each poll.
+        The default is 30 minutes.
+    poll_interval : datetime.timedelta, optional
+        Time between two polls. The default is the sector acquisition cadence.
+    n_threads : int, optional
+        Number of files to be downloaded concurrently. The default is 20.
+    max_polls : int, optional
+        Maximum number of polls. By default, ingest forever.
+    adaptive : bool, optional
+        If True, wait for each next acquisition at its expected publication time
+        instead of polling at fixed times. See `NRTWatcher.poll_next`.
+        The default is False.
+    callback : callable, optional
+        Function called with the list of new local filepaths after each poll.
+    progress_bar : bool, optional
+        If True, display a progress bar of the downloads. The default is False.
+    verbose : bool, optional
+        If True, print the number of new files at each poll. The default is True.
+
+    """
+    from himawari_api.io import get_filesystem
+    from himawari_api.checks import _check_base_dir
+    from himawari_api.download import (
+        _check_download_protocol,
+        _fs_get_parallel,
+        _get_local_from_bucket_fpaths,
+        create_local_directories,
+    )
+
+    _check_download_protocol(protocol)
+    base_dir = _check_base_dir(base_dir)
+    watcher = NRTWatcher(
+        satellite=satellite,
+        product_level=product_level,
+        product=product,
+        sector=sector,
+        filter_parameters=filter_parameters,
+        protocol=protocol,
+        fs_args=fs_args,
+        lookback=lookback,
+        poll_interval=poll_interval,
+    )
+    fs = get_filesystem(protocol=protocol, fs_args=dict(watcher.fs_args))
+    for bucket_fpaths in watcher.iter_new_files(max_polls=max_polls, adaptive=adaptive):
+        local_fpaths = _get_local_from_bucket_fpaths(
+            base_dir=base_dir, satellite=watcher.satellite, bucket_fpaths=bucket_fpaths
+        )
+        l_bucket_errors = []
+        if len(local_fpaths) > 0:
+            create_local_directories(local_fpaths)
+            # The downloads preempt the rate-limited backfill requests of the process
+            with priority(PRIORITY_NRT):
+                l_bucket_errors = _fs_get_parallel(
+                    bucket_fpaths=bucket_fpaths,
+                    local_fpaths=local_fpaths,
+                    fs=fs,
+                    n_threads=n_threads,
+                    progress_bar=progress_bar,
+                )
+            # Download the failed files again at the next poll
+            watcher.retry(l_bucket_errors)
+        failed_fpaths = set(l_bucket_errors)
+        local_fpaths = [
+            local_fpath
+            for local_fpath, bucket_fpath in zip(local_fpaths, bucket_fpaths)
+            if bucket_fpath not in failed_fpaths
+        ]
+        if verbose:
+            now = datetime.datetime.utcnow().replace(microsecond=0)
+            print(f"{now}: {len(local_fpaths)} new files ingested, {len(failed_fpaths)} failed.")
+        if callback is not None:
+            callback(local_fpaths)
+
+
+####--------------------------------------------------------------------------.
@@ -16,12 +16,11 @@
 # himawari_api. If not, see <http://www.gnu.org/licenses/>.
 
 import os
-import fsspec
  
  
 ####--------------------------------------------------------------------------.
 #### Filesystems, buckets and directory structures
-def get_filesystem(protocol, fs_args={}):
+def get_filesystem(protocol, fs_args={}, cache=None, cache_options={}):
     """
     Define ffspec filesystem.
 
@@ -32,10 +31,22 @@ def get_filesystem(protocol, fs_args={}):
     fs_args : dict, optional
        Dictionary specifying optional settings to initiate the fsspec.filesystem.
        The default is an empty dictionary. Anonymous connection is set by default.
+    cache : str, optional
+       If "blocks" or "whole", return a `himawari_api.CachedFileSystem`
+       caching locally the bytes (or the files) read from the bucket.
+       The default is None (no caching).
+    cache_options : dict, optional
+       Arguments of `himawari_api.CachedFileSystem` (i.e. `cache_dir`, `max_bytes`).
 
     """
+    import fsspec
+
     if not isinstance(fs_args, dict):
         raise TypeError("fs_args must be a dictionary.")
+    if cache is not None:
+        from himawari_api.cache import CachedFileSystem
+
+        return CachedFileSystem(protocol=protocol, cache=cache, fs_args=fs_args, **cache_options)
     if protocol == "s3":
         # Set defaults
         # - Use the anonymous credentials to access public data
@@ -71,6 +82,15 @@ def get_bucket(protocol, satellite):
     }
     return bucket_dict[protocol]
 
+
+def _get_https_base_url(protocol, satellite):
+    """Get the https address of the cloud bucket of a specific satellite."""
+    https_base_url_dict = {
+        "s3": "https://noaa-{}.s3.amazonaws.com".format(satellite.replace("-", "")),
+    }
+    return https_base_url_dict[protocol]
+
+
 def _switch_to_https_fpath(fpath, protocol): 
     """
     Switch bucket address with https address.
@@ -85,15 +105,12 @@ def _switch_to_https_fpath(fpath, protocol):
     """
     from himawari_api.info import infer_satellite_from_path
     satellite = infer_satellite_from_path(fpath)
-    https_base_url_dict = {
-        "s3": "https://noaa-{}.s3.amazonaws.com".format(satellite.replace("-", "")),
-    }
-    base_url = https_base_url_dict[protocol]
+    base_url = _get_https_base_url(protocol, satellite)
     fpath = os.path.join(base_url, fpath.split("/", 3)[3])  
     return fpath 
     
 
-def _switch_to_https_fpaths(fpaths, protocol):
+def _switch_to_https_fpaths(fpaths, protocol, satellite=None, suffix=""):
     """
     Switch bucket address with https address.
 
@@ -104,9 +121,27 @@ def _switch_to_https_fpaths(fpaths, protocol):
     protocol : str
          String specifying the cloud bucket storage from which to retrieve
          the data. Use `himawari_api.available_protocols()` to retrieve available protocols.
+    satellite : str, optional
+        The satellite of the bucket filepaths.
+        If specified, the bucket and https addresses are resolved only once
+        and the conversion reduces to a prefix swap of the filepaths within
+        the satellite bucket.
+        The satellite of the other filepaths is inferred from each filepath.
+        If None (the default), the satellite is inferred from each filepath.
+    suffix : str, optional
+        String to append to the https addresses. The default is "".
     """
-    fpaths = [_switch_to_https_fpath(fpath, protocol) for fpath in fpaths]
-    return fpaths
+    if satellite is None:
+        return [_switch_to_https_fpath(fpath, protocol) + suffix for fpath in fpaths]
+    bucket = get_bucket(protocol, satellite) + "/"
+    base_url = _get_https_base_url(protocol, satellite) + "/"
+    n_chars = len(bucket)
+    return [
+        base_url + fpath[n_chars:] + suffix
+        if fpath.startswith(bucket)
+        else _switch_to_https_fpath(fpath, protocol) + suffix
+        for fpath in fpaths
+    ]
 
 
 def _get_bucket_prefix(protocol):
@@ -155,6 +190,57 @@ def _get_product_dir(satellite, product_level, product, sector, protocol=None, b
     return product_dir
 
 
+def _get_time_dir_bounds(start_time, end_time):
+    """Return the YYYYMMDDHHMM names of the first and last time directories of a period."""
+    import datetime
+    from himawari_api.search import _dt_to_year_month_day_hhmm
+
+    # Same directories as himawari_api.search._get_list_time_dir_tree
+    first_dir = "".join(_dt_to_year_month_day_hhmm(start_time))
+    last_dir = "".join(_dt_to_year_month_day_hhmm(end_time + datetime.timedelta(minutes=10)))
+    return first_dir, last_dir
+
+
+def _scandir_subdirs(dir_path):
+    """Return the sorted names of the numeric subdirectories of a directory."""
+    try:
+        with os.scandir(dir_path) as it:
+            return sorted(entry.name for entry in it if entry.name.isdigit() and entry.is_dir())
+    except FileNotFoundError:
+        return []
+
+
+def _iter_local_time_dirs(product_dir, start_time, end_time):
+    """Yield the local <YYYY>/<MM>/<DD>/<HHMM> directories of a product within a time period.
+
+    The directory tree is walked once with `os.scandir`, pruning at each level
+    the directories outside the time period.
+    """
+    first_dir, last_dir = _get_time_dir_bounds(start_time, end_time)
+
+    def _iter_level(dir_path, prefix, level):
+        n_chars = [4, 6, 8, 12][level]
+        for name in _scandir_subdirs(dir_path):
+            key = prefix + name
+            if not first_dir[:n_chars] <= key <= last_dir[:n_chars]:
+                continue
+            sub_dir_path = os.path.join(dir_path, name)
+            if level == 3:
+                yield sub_dir_path
+            else:
+                yield from _iter_level(sub_dir_path, key, level + 1)
+
+    yield from _iter_level(product_dir, "", 0)
+
+
+def _scandir_files(dir_path, detail=False):
+    """Return the filepaths (or {fpath: size}) of the files of a local directory."""
+    with os.scandir(dir_path) as it:
+        if detail:
+            return {entry.path: entry.stat().st_size for entry in it if entry.is_file()}
+        return [entry.path for entry in it if entry.is_file()]
+
+
 def get_fname_glob_pattern(product_level): 
     if product_level == "L1b": 
         fname_pattern = "*.bz2*"
@@ -167,10 +253,18 @@ def get_fname_glob_pattern(product_level):
 #### Output options
 
 
-def _add_nc_bytes(fpaths):
-    """Add `#mode=bytes` to the HTTP netCDF4 url."""
-    fpaths = [fpath + "#mode=bytes" for fpath in fpaths]
-    return fpaths
+def _switch_to_https_array(fpaths, protocol, satellite, suffix):
+    """Switch bucket address with https address in a list or array of filepaths."""
+    if isinstance(fpaths, (list, tuple)):
+        return _switch_to_https_fpaths(fpaths, protocol, satellite=satellite, suffix=suffix)
+    # numpy arrays
+    import numpy as np
+
+    fpaths = np.asarray(fpaths)
+    https_fpaths = _switch_to_https_fpaths(
+        fpaths.ravel().tolist(), protocol, satellite=satellite, suffix=suffix
+    )
+    return np.array(https_fpaths).reshape(fpaths.shape)
 
 
 def _set_connection_type(fpaths, satellite, protocol=None, connection_type=None):
@@ -183,19 +277,15 @@ def _set_connection_type(fpaths, satellite, protocol=None, connection_type=None)
     if connection_type == "bucket":
         return fpaths
     if connection_type in ["https", "nc_bytes"]:
-        if isinstance(fpaths, list):
-            fpaths = _switch_to_https_fpaths(fpaths, protocol=protocol)
-            if connection_type == "nc_bytes":
-                fpaths = _add_nc_bytes(fpaths)
+        # Add `#mode=bytes` to the HTTP netCDF4 url if nc_bytes
+        suffix = "#mode=bytes" if connection_type == "nc_bytes" else ""
         if isinstance(fpaths, dict):
             fpaths = {
-                tt: _switch_to_https_fpaths(l_fpaths, protocol=protocol)           
+                tt: _switch_to_https_array(l_fpaths, protocol, satellite, suffix)
                 for tt, l_fpaths in fpaths.items()
             }
-            if connection_type == "nc_bytes":
-                fpaths = {
-                    tt: _add_nc_bytes(l_fpaths) for tt, l_fpaths in fpaths.items()
-                }
+        else:
+            fpaths = _switch_to_https_array(fpaths, protocol, satellite, suffix)
         return fpaths
     else:
         raise NotImplementedError(
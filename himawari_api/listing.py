@@ -86,6 +86,50 @@ PRODUCTS = {
     },
 }
 
+#-----------------------------------------------------------------------------.
+# AHI channels native spatial resolution (in 0.1 km, as in the L1b filenames R<spatial_res>)
+AHI_CHANNELS_SPATIAL_RES = {
+    "B01": 10,
+    "B02": 10,
+    "B03": 5,
+    "B04": 10,
+    "B05": 20,
+    "B06": 20,
+    "B07": 20,
+    "B08": 20,
+    "B09": 20,
+    "B10": 20,
+    "B11": 20,
+    "B12": 20,
+    "B13": 20,
+    "B14": 20,
+    "B15": 20,
+    "B16": 20,
+}
+
+# AHI channels required to create the satpy composites
+# - Derived from the recipes in satpy/etc/composites/ahi.yaml and visir.yaml
+# - Wavelengths are matched to the closest AHI channel
+AHI_COMPOSITES = {
+    "true_color": ["B01", "B02", "B03", "B04"],
+    "true_color_nocorr": ["B01", "B02", "B03", "B04"],
+    "natural_color": ["B03", "B04", "B05"],
+    "overview": ["B03", "B04", "B13"],
+    "green_snow": ["B03", "B05", "B13"],
+    "cloud_phase_distinction": ["B03", "B05", "B13"],
+    "cloud_phase": ["B03", "B05", "B06"],
+    "fire_temperature": ["B05", "B06", "B07"],
+    "day_microphysics": ["B04", "B07", "B13"],
+    "night_microphysics": ["B07", "B13", "B15"],
+    "convection": ["B03", "B05", "B07", "B09", "B10", "B13"],
+    "airmass": ["B08", "B10", "B12", "B13"],
+    "ash": ["B11", "B13", "B15"],
+    "dust": ["B11", "B13", "B15"],
+    "fog": ["B11", "B13", "B15"],
+    "colorized_ir_clouds": ["B13"],
+    "ir_cloud_day": ["B13"],
+}
+
  
 GLOB_FNAME_PATTERN = {
     "AHI": {
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Define himawari_api functions to cache the crop and resampling lookup tables of the AHI grid.
+
+The AHI FLDK grid is fixed for a given spatial resolution.
+The crop slices and the resampling indices onto a target area are therefore
+computed once, saved as .npy files and memory-mapped at the next calls.
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+
+_LUT_METHODS = ["nearest", "bilinear"]
+
+_LUT_ARRAYS = {
+    "nearest": ["lines", "cols", "valid"],
+    "bilinear": ["lines", "cols", "line_weights", "col_weights", "valid"],
+}
+
+
+####--------------------------------------------------------------------------.
+#### Checks
+
+
+def _check_method(method):
+    """Check resampling method validity."""
+    if not isinstance(method, str):
+        raise TypeError("`method` must be a string.")
+    if method not in _LUT_METHODS:
+        raise ValueError(f"Valid `method` are {_LUT_METHODS}.")
+    return method
+
+
+def _check_target_lonlats(target_lons, target_lats):
+    """Check the target longitude/latitude arrays."""
+    if target_lons is None and target_lats is None:
+        return None, None
+    if target_lons is None or target_lats is None:
+        raise ValueError("Specify both `target_lons` and `target_lats`.")
+    target_lons = np.asarray(target_lons, dtype=float)
+    target_lats = np.asarray(target_lats, dtype=float)
+    if target_lons.shape != target_lats.shape:
+        raise ValueError("`target_lons` and `target_lats` must have the same shape.")
+    return target_lons, target_lats
+
+
+def _get_default_cache_dir():
+    """Return the default directory where the lookup tables are cached."""
+    return os.path.join(os.path.expanduser("~"), ".cache", "himawari_api", "lut")
+
+
+####--------------------------------------------------------------------------.
+#### Target areas
+
+
+def get_lonlat_grid(ll_bbox, resolution):
+    """
+    Define a regular longitude/latitude target grid.
+
+    Parameters
+    ----------
+    ll_bbox : list
+        Bounding box [lon_min, lat_min, lon_max, lat_max] in degrees.
+    resolution : float
+        Grid spacing in degrees.
+
+    Returns
+    -------
+    (lons, lats) : tuple
+        2D arrays of the grid cell centers. The first row is the northernmost.
+
+    """
+    lon_min, lat_min, lon_max, lat_max = ll_bbox
+    lons = np.arange(lon_min + resolution / 2, lon_max, resolution)
+    lats = np.arange(lat_max - resolution / 2, lat_min, -resolution)
+    lons, lats = np.meshgrid(lons, lats)
+    return lons, lats
+
+
+####--------------------------------------------------------------------------.
+#### Lookup tables computation
+
+
+def _get_lut_key(resolution, sector, ll_bbox, method, target_lons, target_lats):
+    """Return the hash identifying a lookup table."""
+    hasher = hashlib.sha1()
+    hasher.update(repr((float(resolution), sector, ll_bbox, method)).encode())
+    if target_lons is not None:
+        hasher.update(repr(target_lons.shape).encode())
+        hasher.update(np.ascontiguousarray(target_lons).tobytes())
+        hasher.update(np.ascontiguousarray(target_lats).tobytes())
+    return hasher.hexdigest()
+
+
+def _compute_indices(lines, cols, line_slice, col_slice, method):
+    """Compute the resampling indices relative to the crop window."""
+    n_lines = line_slice.stop - line_slice.start
+    n_cols = col_slice.stop - col_slice.start
+    lines = lines - line_slice.start
+    cols = cols - col_slice.start
+    with np.errstate(invalid="ignore"):
+        if method == "nearest":
+            lines = np.rint(lines)
+            cols = np.rint(cols)
+            valid = (lines >= 0) & (lines < n_lines) & (cols >= 0) & (cols < n_cols)
+        else:  # bilinear
+            line_weights = lines - np.floor(lines)
+            col_weights = cols - np.floor(cols)
+            lines = np.floor(lines)
+            cols = np.floor(cols)
+            valid = (lines >= 0) & (lines < n_lines - 1) & (cols >= 0) & (cols < n_cols - 1)
+    # Invalid locations point to the first pixel of the window and are masked at application
+    lut = {}
+    lut["lines"] = np.where(valid, lines, 0).astype(np.int32)
+    lut["cols"] = np.where(valid, cols, 0).astype(np.int32)
+    if method == "bilinear":
+        lut["line_weights"] = np.where(valid, line_weights, 0).astype(np.float32)
+        lut["col_weights"] = np.where(valid, col_weights, 0).astype(np.float32)
+    lut["valid"] = valid
+    return lut
+
+
+def compute_lut(resolution, ll_bbox=None, target_lons=None, target_lats=None,
+                method="nearest", sector="FLDK"):
+    """
+    Compute the crop and resampling lookup table of the AHI grid.
+
+    See `himawari_api.get_lut` for the description of the arguments.
+    The lookup table is not cached.
+    """
+    from himawari_api.geometry import (
+        get_projection_info,
+        lonlat_to_linecol,
+        get_bbox_linecol_slices,
+    )
+
+    method = _check_method(method)
+    target_lons, target_lats = _check_target_lonlats(target_lons, target_lats)
+    if ll_bbox is None and target_lons is None:
+        raise ValueError("Specify `ll_bbox` and/or `target_lons` and `target_lats`.")
+    proj_info = get_projection_info(resolution, sector=sector)
+
+    # Compute the fractional lines/columns of the target locations
+    if target_lons is not None:
+        lines, cols = lonlat_to_linecol(target_lons, target_lats, proj_info)
+        if np.all(np.isnan(lines)):
+            raise ValueError("The target area is not visible from the satellite.")
+
+    # Define the crop window
+    if ll_bbox is not None:
+        line_slice, col_slice = get_bbox_linecol_slices(ll_bbox, proj_info)
+    else:
+        # - Include the neighbours required by the bilinear interpolation
+        first_line = max(int(np.floor(np.nanmin(lines))) - 1, 0)
+        last_line = min(int(np.ceil(np.nanmax(lines))) + 1, proj_info["nlines"] - 1)
+        first_col = max(int(np.floor(np.nanmin(cols))) - 1, 0)
+        last_col = min(int(np.ceil(np.nanmax(cols))) + 1, proj_info["ncols"] - 1)
+        line_slice = slice(first_line, last_line + 1)
+        col_slice = slice(first_col, last_col + 1)
+
+    lut = {}
+    lut["method"] = method
+    lut["slices"] = np.array(
+        [line_slice.start, line_slice.stop, col_slice.start, col_slice.stop], dtype=np.int64
+    )
+    if target_lons is not None:
+        lut.update(_compute_indices(lines, cols, line_slice, col_slice, method))
+    return lut
+
+
+####--------------------------------------------------------------------------.
+#### Lookup tables cache
+
+
+def _save_lut(lut, lut_dir):
+    """Save the lookup table arrays as .npy files in an atomic way."""
+    parent_dir = os.path.dirname(lut_dir)
+    os.makedirs(parent_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent_dir, prefix=".tmp_")
+    try:
+        for key, value in lut.items():
+            if key == "method":
+                continue
+            np.save(os.path.join(tmp_dir, f"{key}.npy"), value)
+        os.rename(tmp_dir, lut_dir)
+    except OSError:
+        # Another process already saved the same lookup table
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.exists(lut_dir):
+            raise
+
+
+def _load_lut(lut_dir, method):
+    """Load the lookup table arrays as memory-mapped arrays."""
+    lut = {"method": method}
+    lut["slices"] = np.load(os.path.join(lut_dir, "slices.npy"))
+    for key in _LUT_ARRAYS[method]:
+        fpath = os.path.join(lut_dir, f"{key}.npy")
+        if not os.path.exists(fpath):
+            break
+        lut[key] = np.load(fpath, mmap_mode="r")
+    return lut
+
+
+def get_lut(resolution, ll_bbox=None, target_lons=None, target_lats=None,
+            method="nearest", sector="FLDK", cache_dir=None):
+    """
+    Retrieve the crop and resampling lookup table of the AHI grid.
+
+    The lookup table is computed at the first call and saved in `cache_dir`.
+    The next calls with the same arguments memory-map the saved arrays.
+
+    Parameters
+    ----------
+    resolution : float
+        Spatial resolution of the AHI channel in km (0.5, 1 or 2).
+    ll_bbox : list, optional
+        Bounding box [lon_min, lat_min, lon_max, lat_max] used to crop the AHI grid.
+        If None, the crop window is the smallest one enclosing the target area.
+    target_lons : numpy.ndarray, optional
+        Longitudes of the target area. If None, only the crop slices are computed.
+    target_lats : numpy.ndarray, optional
+        Latitudes of the target area.
+    method : str, optional
+        Resampling method. Either "nearest" or "bilinear". The default is "nearest".
+    sector : str, optional
+        The AHI sector. Only the "FLDK" sector is currently supported.
+    cache_dir : str, optional
+        Directory where the lookup tables are saved.
+        The default is "~/.cache/himawari_api/lut".
+
+    Returns
+    -------
+    lut : dict
+        Dictionary with the crop 'slices' [first_line, last_line + 1, first_col, last_col + 1]
+        and, if a target area is specified, the 'lines', 'cols', 'valid'
+        (and 'line_weights', 'col_weights' for bilinear) arrays with the shape of the target area.
+        The lines and columns are relative to the crop window.
+
+    """
+    from himawari_api.checks import _check_sector
+
+    sector = _check_sector(sector)
+    method = _check_method(method)
+    target_lons, target_lats = _check_target_lonlats(target_lons, target_lats)
+    if ll_bbox is not None:
+        ll_bbox = [float(v) for v in ll_bbox]
+    if cache_dir is None:
+        cache_dir = _get_default_cache_dir()
+    key = _get_lut_key(resolution, sector, ll_bbox, method, target_lons, target_lats)
+    lut_dir = os.path.join(cache_dir, key)
+    if not os.path.exists(lut_dir):
+        lut = compute_lut(
+            resolution,
+            ll_bbox=ll_bbox,
+            target_lons=target_lons,
+            target_lats=target_lats,
+            method=method,
+            sector=sector,
+        )
+        _save_lut(lut, lut_dir)
+    return _load_lut(lut_dir, method)
+
+
+####--------------------------------------------------------------------------.
+#### Lookup tables application
+
+
+def crop_with_lut(data, lut, first_line=0, first_col=0):
+    """
+    Crop an AHI array with the slices of a lookup table.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        Array of shape (lines, columns). It can be the full disk,
+        the stack of consecutive segments starting at line `first_line`
+        or a bounding box read by `himawari_api.read_hsd`.
+    lut : dict
+        Lookup table returned by `himawari_api.get_lut`.
+    first_line : int, optional
+        The 0-based full disk line of the first row of `data`. The default is 0.
+    first_col : int, optional
+        The 0-based full disk column of the first column of `data`. The default is 0.
+
+    Returns
+    -------
+    data : numpy.ndarray
+        A view of the crop window of `data` (no copy).
+
+    """
+    line_start, line_stop, col_start, col_stop = (int(v) for v in lut["slices"])
+    if line_start < first_line or line_stop > first_line + data.shape[-2]:
+        raise ValueError(
+            f"`data` covers the lines [{first_line}, {first_line + data.shape[-2]}) "
+            f"but the lookup table requires the lines [{line_start}, {line_stop})."
+        )
+    if col_start < first_col or col_stop > first_col + data.shape[-1]:
+        raise ValueError(
+            f"`data` covers the columns [{first_col}, {first_col + data.shape[-1]}) "
+            f"but the lookup table requires the columns [{col_start}, {col_stop})."
+        )
+    return data[
+        ..., line_start - first_line: line_stop - first_line, col_start - first_col: col_stop - first_col
+    ]
+
+
+def apply_lut(data, lut, first_line=0, first_col=0, fill_value=np.nan):
+    """
+    Crop and resample an AHI array with a lookup table.
+
+    Parameters
+    ----------
+    data : numpy.ndarray
+        Array of shape (lines, columns). It can be the full disk,
+        the stack of consecutive segments starting at line `first_line`
+        or a bounding box read by `himawari_api.read_hsd`.
+        Memory-mapped arrays are read only where required.
+    lut : dict
+        Lookup table returned by `himawari_api.get_lut`.
+    first_line : int, optional
+        The 0-based full disk line of the first row of `data`. The default is 0.
+    first_col : int, optional
+        The 0-based full disk column of the first column of `data`. The default is 0.
+    fill_value : float, optional
+        Value of the target locations outside of the AHI grid. The default is np.nan.
+
+    Returns
+    -------
+    data : numpy.ndarray
+        If the lookup table has no target area, a view of the crop window.
+        Otherwise, the array resampled on the target area.
+
+    """
+    data = crop_with_lut(data, lut, first_line=first_line, first_col=first_col)
+    if "lines" not in lut:
+        return data
+    lines, cols, valid = lut["lines"], lut["cols"], lut["valid"]
+    if lut["method"] == "nearest":
+        values = data[lines, cols]
+    else:  # bilinear
+        wl = lut["line_weights"]
+        wc = lut["col_weights"]
+        values = (
+            (1 - wl) * (1 - wc) * data[lines, cols]
+            + (1 - wl) * wc * data[lines, cols + 1]
+            + wl * (1 - wc) * data[lines + 1, cols]
+            + wl * wc * data[lines + 1, cols + 1]
+        )
+    if not np.all(valid):
+        values = np.where(valid, values, fill_value)
+    return values
+
+
+####--------------------------------------------------------------------------.
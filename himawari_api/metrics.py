@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Define the himawari_api instrumentation of the search and download functions.
+
+The search and download functions record in a process-wide `Metrics` registry:
+
+- phase durations (`list`, `filter`, `check_size`, `transfer`, and `throttle`
+  for the waits of the rate limiter),
+- counters (`list_requests`, `head_requests`, `get_requests`, `bytes_transferred`,
+  `files_listed`, `files_skipped`, `files_corrupted`, `download_errors`, `retries`,
+  `cache_hits`, `cache_misses`),
+- histograms (`download_duration_seconds`, `download_throughput_bytes_per_second`).
+
+The registry is returned by `himawari_api.get_metrics()` and can be exported
+as a dictionary (`snapshot`), in the Prometheus text format (`to_prometheus`)
+or to a logger (`log`). Callbacks registered with `add_callback` are called
+with (kind, name, value) at each record.
+"""
+
+import bisect
+import contextlib
+import logging
+import threading
+import time
+
+# Upper bounds of the histogram buckets
+_HISTOGRAM_BUCKETS = {
+    "download_duration_seconds": [0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120],
+    "download_throughput_bytes_per_second": [1e5, 5e5, 1e6, 5e6, 1e7, 5e7, 1e8, 5e8],
+}
+_DEFAULT_BUCKETS = [0.001, 0.01, 0.1, 1, 10, 100, 1000]
+
+
+class Metrics:
+    """Thread-safe registry of counters, phase durations and histograms."""
+
+    def __init__(self, namespace="himawari_api"):
+        self.namespace = namespace
+        self._lock = threading.Lock()
+        self._callbacks = []
+        self.reset()
+
+    def __repr__(self):
+        return f"<Metrics counters={self.counters} phases={list(self.phases)}>"
+
+    def reset(self):
+        """Reset all metrics (the callbacks are preserved)."""
+        with self._lock:
+            self.counters = {}
+            self.phases = {}  # {phase: [total_seconds, count]}
+            self.histograms = {}  # {name: [bucket_counts, sum, count]}
+
+    ####----------------------------------------------------------------------.
+    #### Callbacks
+
+    def add_callback(self, callback):
+        """Register a callable called with (kind, name, value) at each record.
+
+        `kind` is 'counter', 'phase' or 'histogram'.
+        """
+        if not callable(callback):
+            raise TypeError("`callback` must be a callable.")
+        self._callbacks.append(callback)
+
+    def remove_callback(self, callback):
+        """Unregister a callback."""
+        self._callbacks.remove(callback)
+
+    def _notify(self, kind, name, value):
+        for callback in self._callbacks:
+            callback(kind, name, value)
+
+    ####----------------------------------------------------------------------.
+    #### Records
+
+    def inc(self, name, value=1):
+        """Increment a counter."""
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        self._notify("counter", name, value)
+
+    def add_duration(self, phase, seconds):
+        """Add the duration (in seconds) of a phase."""
+        with self._lock:
+            total, count = self.phases.get(phase, (0.0, 0))
+            self.phases[phase] = [total + seconds, count + 1]
+        self._notify("phase", phase, seconds)
+
+    @contextlib.contextmanager
+    def timer(self, phase):
+        """Context manager recording the duration of a phase."""
+        t_i = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_duration(phase, time.perf_counter() - t_i)
+
+    def observe(self, name, value):
+        """Record a value in a histogram."""
+        buckets = _HISTOGRAM_BUCKETS.get(name, _DEFAULT_BUCKETS)
+        with self._lock:
+            if name not in self.histograms:
+                self.histograms[name] = [[0] * (len(buckets) + 1), 0.0, 0]
+            histogram = self.histograms[name]
+            histogram[0][bisect.bisect_left(buckets, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+        self._notify("histogram", name, value)
+
+    ####----------------------------------------------------------------------.
+    #### Exports
+
+    def snapshot(self):
+        """
+        Return a copy of the metrics.
+
+        Returns
+        -------
+        stats : dict
+            Dictionary with keys 'counters' ({name: value}), 'phases'
+            ({phase: {'seconds', 'count'}}) and 'histograms'
+            ({name: {'buckets', 'counts', 'sum', 'count'}}).
+            If bytes were transferred, the 'throughput_bytes_per_second' of the
+            'transfer' phase is also reported.
+        """
+        with self._lock:
+            stats = {
+                "counters": dict(self.counters),
+                "phases": {
+                    phase: {"seconds": total, "count": count}
+                    for phase, (total, count) in self.phases.items()
+                },
+                "histograms": {
+                    name: {
+                        "buckets": _HISTOGRAM_BUCKETS.get(name, _DEFAULT_BUCKETS),
+                        "counts": list(counts),
+                        "sum": total,
+                        "count": count,
+                    }
+                    for name, (counts, total, count) in self.histograms.items()
+                },
+            }
+        transfer_seconds = stats["phases"].get("transfer", {}).get("seconds", 0)
+        if transfer_seconds > 0 and "bytes_transferred" in stats["counters"]:
+            stats["throughput_bytes_per_second"] = stats["counters"]["bytes_transferred"] / transfer_seconds
+        return stats
+
+    def to_prometheus(self):
+        """Return the metrics in the Prometheus text exposition format."""
+        ns = self.namespace
+        stats = self.snapshot()
+        lines = []
+        for name, value in sorted(stats["counters"].items()):
+            lines.append(f"# TYPE {ns}_{name}_total counter")
+            lines.append(f"{ns}_{name}_total {value}")
+        if stats["phases"]:
+            lines.append(f"# TYPE {ns}_phase_seconds summary")
+            for phase, values in sorted(stats["phases"].items()):
+                lines.append(f'{ns}_phase_seconds_sum{{phase="{phase}"}} {values["seconds"]}')
+                lines.append(f'{ns}_phase_seconds_count{{phase="{phase}"}} {values["count"]}')
+        for name, values in sorted(stats["histograms"].items()):
+            lines.append(f"# TYPE {ns}_{name} histogram")
+            cumulative = 0
+            for upper_bound, count in zip(values["buckets"] + ["+Inf"], values["counts"]):
+                cumulative += count
+                lines.append(f'{ns}_{name}_bucket{{le="{upper_bound}"}} {cumulative}')
+            lines.append(f"{ns}_{name}_sum {values['sum']}")
+            lines.append(f"{ns}_{name}_count {values['count']}")
+        return "\n".join(lines) + "\n"
+
+    def log(self, logger=None, level=logging.INFO):
+        """Log the counters and phase durations."""
+        logger = logging.getLogger("himawari_api") if logger is None else logger
+        stats = self.snapshot()
+        for phase, values in sorted(stats["phases"].items()):
+            logger.log(level, "phase %s: %.3f s (%d calls)", phase, values["seconds"], values["count"])
+        for name, value in sorted(stats["counters"].items()):
+            logger.log(level, "%s: %s", name, value)
+        if "throughput_bytes_per_second" in stats:
+            logger.log(level, "throughput: %.0f bytes/s", stats["throughput_bytes_per_second"])
+
+
+####--------------------------------------------------------------------------.
+#### Process-wide registry
+
+_METRICS = Metrics()
+
+
+def get_metrics():
+    """
+    Return the process-wide `Metrics` registry of the search and download functions.
+
+    Use `get_metrics().snapshot()` to retrieve the statistics,
+    `get_metrics().to_prometheus()` to export them in the Prometheus text format,
+    `get_metrics().add_callback(func)` to forward each record and
+    `get_metrics().reset()` to reset them.
+    """
+    return _METRICS
+
+
+####--------------------------------------------------------------------------.
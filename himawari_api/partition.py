@@ -0,0 +1,403 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Define himawari_api functions to download long time periods in parallel shards.
+
+A download request (one or more products over a time period) is split into
+deterministic shards: one shard per product and daily time block
+(see `himawari_api.download.get_list_daily_time_blocks`).
+The shards are downloaded by the workers of a process pool (or of any executor
+implementing `submit`, i.e. a `dask.distributed.Client`) and each completed
+shard writes its `DownloadReport` as a checkpoint in the job directory.
+A restarted job skips the completed shards, and the shard reports are merged
+into a single job manifest. The shards share the SQLite job manifest of
+`download_files`, so that the files verified by an interrupted shard are not
+checked again.
+
+Multiple nodes sharing the job directory can split the shards of a job with
+the `node_index` and `n_nodes` arguments.
+"""
+
+import datetime
+import hashlib
+import json
+import os
+import time
+
+# Directory (within base_dir) of the partitioned download jobs
+_JOBS_DIR = ".himawari_api_jobs"
+
+# Filename (within the job directory) of the job manifest shared by the shards
+_JOB_MANIFEST_FNAME = "manifest.sqlite"
+
+
+####--------------------------------------------------------------------------.
+#### Shards
+
+
+def _get_spec_id(spec):
+    """Return a short deterministic identifier of a product specification."""
+    dumped_spec = json.dumps(spec, sort_keys=True, default=str)
+    return hashlib.sha1(dumped_spec.encode()).hexdigest()[:8]
+
+
+def get_download_shards(product_specs, start_time, end_time):
+    """
+    Split a download request into shards of one product and one daily time block.
+
+    Parameters
+    ----------
+    product_specs : dict or list
+        Product specification(s), dictionaries with keys `satellite`,
+        `product_level`, `product`, `sector` and optionally `filter_parameters`.
+    start_time : datetime.datetime
+        The start (inclusive) time of the interval period.
+    end_time : datetime.datetime
+        The end (exclusive) time of the interval period.
+
+    Returns
+    -------
+    shards : list
+        List of shards, dictionaries with keys `shard_id`, `spec`, `start_time`
+        and `end_time`, ordered by time and product.
+        The shard identifiers depend only on the request.
+    """
+    from himawari_api.checks import _check_start_end_time
+    from himawari_api.download import get_list_daily_time_blocks
+    from himawari_api.sync import _check_product_specs
+
+    product_specs = _check_product_specs(product_specs)
+    start_time, end_time = _check_start_end_time(start_time, end_time)
+    shards = []
+    for block_start_time, block_end_time in get_list_daily_time_blocks(start_time, end_time):
+        for spec in product_specs:
+            shard_id = "_".join(
+                [
+                    spec["satellite"],
+                    spec["product_level"],
+                    spec["product"],
+                    spec["sector"],
+                    _get_spec_id(spec),
+                    block_start_time.strftime("%Y%m%dT%H%M%S"),
+                    block_end_time.strftime("%Y%m%dT%H%M%S"),
+                ]
+            )
+            shards.append(
+                {
+                    "shard_id": shard_id,
+                    "spec": spec,
+                    "start_time": block_start_time,
+                    "end_time": block_end_time,
+                }
+            )
+    return shards
+
+
+def _get_job_id(product_specs, start_time, end_time):
+    """Return a deterministic identifier of a download request."""
+    request = {"product_specs": product_specs, "start_time": start_time, "end_time": end_time}
+    dumped_request = json.dumps(request, sort_keys=True, default=str)
+    return hashlib.sha1(dumped_request.encode()).hexdigest()[:16]
+
+
+def _get_shard_checkpoint_fpath(job_dir, shard_id):
+    """Return the filepath of the checkpoint (JSON report) of a shard."""
+    return os.path.join(job_dir, "shards", shard_id + ".json")
+
+
+def _write_json(obj, fpath):
+    """Write a JSON file atomically."""
+    os.makedirs(os.path.dirname(fpath), exist_ok=True)
+    tmp_fpath = f"{fpath}.{os.getpid()}.tmp"
+    with open(tmp_fpath, "w") as f:
+        json.dump(obj, f, indent=1, default=str)
+    os.replace(tmp_fpath, fpath)
+
+
+def _is_shard_completed(checkpoint_fpath, end_time):
+    """Return True if a shard checkpoint exists and reports no failed file.
+
+    As the completed blocks of the job manifest, a shard is completed only if
+    it was downloaded when its time block was older than `_JOB_MANIFEST_MIN_BLOCK_AGE`,
+    because files can still be published in the recent blocks.
+    """
+    from himawari_api.download import _JOB_MANIFEST_MIN_BLOCK_AGE, DownloadReport
+
+    if not os.path.isfile(checkpoint_fpath):
+        return False
+    try:
+        with open(checkpoint_fpath, "r") as f:
+            report_dict = json.load(f)
+        download_time = datetime.datetime.fromisoformat(report_dict["download_time"])
+        report = DownloadReport.from_dict(report_dict)
+    except (ValueError, TypeError, KeyError):
+        # Unreadable checkpoint: download the shard again
+        return False
+    if end_time > download_time - _JOB_MANIFEST_MIN_BLOCK_AGE:
+        return False
+    return len(report.failed_fpaths) == 0
+
+
+def _download_shard(
+    shard,
+    base_dir,
+    protocol,
+    fs_args,
+    n_threads,
+    force_download,
+    check_data_integrity,
+    checkpoint_fpath,
+    manifest=None,
+):
+    """Download the files of a shard and write its report in `checkpoint_fpath`.
+
+    This function is executed by the workers: it must be importable and its
+    arguments picklable.
+    """
+    from himawari_api.download import download_files
+
+    spec = shard["spec"]
+    download_time = datetime.datetime.utcnow()
+    report = download_files(
+        base_dir=base_dir,
+        protocol=protocol,
+        fs_args=fs_args,
+        satellite=spec["satellite"],
+        product_level=spec["product_level"],
+        product=spec["product"],
+        sector=spec["sector"],
+        filter_parameters=spec.get("filter_parameters", {}),
+        start_time=shard["start_time"],
+        end_time=shard["end_time"],
+        n_threads=n_threads,
+        force_download=force_download,
+        check_data_integrity=check_data_integrity,
+        progress_bar=False,
+        verbose=False,
+        return_report=True,
+        manifest=manifest,
+    )
+    report_dict = report.to_dict()
+    report_dict["shard_id"] = shard["shard_id"]
+    report_dict["download_time"] = download_time.isoformat()
+    _write_json(report_dict, checkpoint_fpath)
+    return report.summary()
+
+
+####--------------------------------------------------------------------------.
+#### Job manifest
+
+
+def _merge_shard_reports(job_dir, shards, base_dir, protocol):
+    """Merge the available shard checkpoints into a single `DownloadReport`."""
+    from himawari_api.download import DownloadReport
+
+    satellites = {shard["spec"]["satellite"] for shard in shards}
+    satellite = satellites.pop() if len(satellites) == 1 else None
+    merged_report = DownloadReport(base_dir=base_dir, protocol=protocol, satellite=satellite)
+    for shard in shards:
+        checkpoint_fpath = _get_shard_checkpoint_fpath(job_dir, shard["shard_id"])
+        if os.path.isfile(checkpoint_fpath):
+            merged_report.files.update(DownloadReport.from_json(checkpoint_fpath).files)
+    return merged_report
+
+
+def download_partitioned(
+    base_dir,
+    product_specs,
+    start_time,
+    end_time,
+    protocol="s3",
+    fs_args={},
+    n_workers=4,
+    n_threads=20,
+    executor=None,
+    job_dir=None,
+    node_index=0,
+    n_nodes=1,
+    force_download=False,
+    check_data_integrity=True,
+    progress_bar=True,
+    verbose=True,
+):
+    """
+    Download files of long time periods with parallel workers, in resumable shards.
+
+    The request is split into shards of one product and one daily time block
+    (see `get_download_shards`), downloaded in parallel by `n_workers` processes
+    (each downloading `n_threads` files concurrently).
+    Each completed shard writes its `DownloadReport` in <job_dir>/shards.
+    If the job is restarted, the shards already completed without failed files
+    are skipped (unless `force_download=True`), except the shards downloaded
+    when their time block was less than one hour old, and the files verified by the
+    interrupted shards (recorded in the <job_dir>/manifest.sqlite job manifest
+    of `download_files`) are not checked again.
+    The shard reports are merged into <job_dir>/manifest.json.
+
+    Parameters
+    ----------
+    base_dir : str
+        Base directory path where the <HIMAWARI-**>/<product>/... directory structure
+        should be created.
+    product_specs : dict or list
+        Product specification(s), dictionaries with keys `satellite`,
+        `product_level`, `product`, `sector` and optionally `filter_parameters`.
+    start_time : datetime.datetime
+        The start (inclusive) time of the interval period.
+    end_time : datetime.datetime
+        The end (exclusive) time of the interval period.
+    protocol : str, optional
+        String specifying the cloud bucket storage. The default is "s3".
+    fs_args : dict, optional
+        Dictionary specifying optional settings to initiate the fsspec.filesystem.
+    n_workers : int, optional
+        Number of worker processes. The default is 4.
+        It is ignored if `executor` is specified.
+    n_threads : int, optional
+        Number of files downloaded concurrently by each worker. The default is 20.
+    executor : object, optional
+        Executor running the shards, implementing `submit(func, *args)` and returning
+        futures with a `result()` method (i.e. `concurrent.futures.ThreadPoolExecutor`
+        or a `dask.distributed.Client`). The default is a process pool of `n_workers`.
+    job_dir : str, optional
+        Directory of the shard checkpoints and job manifest. The default is
+        <base_dir>/.himawari_api_jobs/<job_id>, where <job_id> is derived from the request.
+    node_index : int, optional
+        Index of this node when the shards are split across `n_nodes` nodes
+        sharing `base_dir`. The default is 0.
+    n_nodes : int, optional
+        Number of nodes downloading the shards of the job. The default is 1.
+    force_download : bool, optional
+        If True, download and overwrite the files already existing on local storage.
+        The default is False.
+    check_data_integrity : bool, optional
+        If True, check that the downloaded files are not corrupted. The default is True.
+    progress_bar : bool, optional
+        If True, display a progress bar of the completed shards. The default is True.
+    verbose : bool, optional
+        If True, print the progress of the job. The default is True.
+
+    Returns
+    -------
+    report : DownloadReport
+        The job manifest, merging the reports of all completed shards of the job.
+    """
+    import concurrent.futures
+    from tqdm import tqdm
+    from himawari_api.checks import _check_base_dir, _check_start_end_time
+    from himawari_api.download import _check_download_protocol
+    from himawari_api.sync import _check_product_specs
+
+    _check_download_protocol(protocol)
+    base_dir = _check_base_dir(base_dir)
+    if not isinstance(n_nodes, int) or n_nodes < 1:
+        raise ValueError("`n_nodes` must be a positive integer.")
+    if not isinstance(node_index, int) or not 0 <= node_index < n_nodes:
+        raise ValueError("`node_index` must be an integer between 0 and `n_nodes` - 1.")
+    t_i = time.time()
+
+    # Define the shards and the job directory
+    product_specs = _check_product_specs(product_specs)
+    start_time, end_time = _check_start_end_time(start_time, end_time)
+    shards = get_download_shards(product_specs, start_time, end_time)
+    if job_dir is None:
+        job_id = _get_job_id(product_specs, start_time, end_time)
+        job_dir = os.path.join(base_dir, _JOBS_DIR, job_id)
+    os.makedirs(job_dir, exist_ok=True)
+
+    # Select the shards of this node which are not completed
+    node_shards = shards[node_index::n_nodes]
+    todo_shards = [
+        shard
+        for shard in node_shards
+        if force_download
+        or not _is_shard_completed(_get_shard_checkpoint_fpath(job_dir, shard["shard_id"]), shard["end_time"])
+    ]
+    if verbose:
+        print("-------------------------------------------------------------------- ")
+        print(
+            f"Starting downloading {len(todo_shards)} shards between {start_time} and {end_time} "
+            f"({len(node_shards) - len(todo_shards)} shards already completed)."
+        )
+
+    # Download the shards
+    n_failed_shards = 0
+    if len(todo_shards) > 0:
+        own_executor = executor is None
+        if own_executor:
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=max(n_workers, 1))
+        if progress_bar:
+            pbar = tqdm(total=len(todo_shards), unit="shard")
+        try:
+            futures = [
+                executor.submit(
+                    _download_shard,
+                    shard,
+                    base_dir,
+                    protocol,
+                    dict(fs_args),
+                    n_threads,
+                    force_download,
+                    check_data_integrity,
+                    _get_shard_checkpoint_fpath(job_dir, shard["shard_id"]),
+                    os.path.join(job_dir, _JOB_MANIFEST_FNAME),
+                )
+                for shard in todo_shards
+            ]
+            for shard, future in zip(todo_shards, futures):
+                try:
+                    summary = future.result()
+                except Exception as e:
+                    # The shard is not checkpointed and is downloaded again at the next run
+                    n_failed_shards += 1
+                    if verbose:
+                        print(f" - Shard {shard['shard_id']} failed: {type(e).__name__}: {e}")
+                    continue
+                finally:
+                    if progress_bar:
+                        pbar.update(1)
+                if verbose and summary["failed"] > 0:
+                    print(f" - Shard {shard['shard_id']}: {summary['failed']} files failed.")
+        finally:
+            if progress_bar:
+                pbar.close()
+            if own_executor:
+                executor.shutdown()
+
+    # Merge the shard reports into the job manifest
+    report = _merge_shard_reports(job_dir, shards, base_dir=base_dir, protocol=protocol)
+    report.elapsed_time = time.time() - t_i
+    manifest = report.to_dict()
+    manifest.update(
+        {
+            "created": datetime.datetime.utcnow(),
+            "n_shards": len(shards),
+            "n_completed_shards": sum(
+                _is_shard_completed(_get_shard_checkpoint_fpath(job_dir, shard["shard_id"]), shard["end_time"])
+                for shard in shards
+            ),
+        }
+    )
+    _write_json(manifest, os.path.join(job_dir, "manifest.json"))
+    if verbose:
+        counts = ", ".join(f"{n} {status}" for status, n in report.counts.items())
+        print(f"--> {len(todo_shards) - n_failed_shards} shards downloaded in {round(report.elapsed_time)} seconds ({counts}).")
+        print(f"    Job manifest: {os.path.join(job_dir, 'manifest.json')}")
+        print("-------------------------------------------------------------------- ")
+    return report
+
+
+####--------------------------------------------------------------------------.
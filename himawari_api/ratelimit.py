@@ -0,0 +1,276 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Define the himawari_api bandwidth and request rate limiters.
+
+The process-wide `RateLimiter` (see `set_rate_limits` and `get_rate_limiter`)
+caps the bytes per second downloaded and the requests per second (LIST, HEAD
+and GET) sent to the cloud buckets by all the search and download threads of
+the process. Each limit is a token bucket.
+
+The requests waiting for tokens are served by priority: the near real-time
+polls and downloads (`PRIORITY_NRT`) preempt the backfill traffic
+(`PRIORITY_BACKFILL`) running in the same process. The priority of the
+requests of a thread is set with the `priority` context manager.
+"""
+
+import contextlib
+import heapq
+import itertools
+import threading
+import time
+
+from himawari_api.metrics import get_metrics
+
+PRIORITY_BACKFILL = 0
+PRIORITY_NRT = 10
+
+# Minimum size of the chunks of the rate-limited downloads
+_CHUNK_SIZE = 1024 * 1024
+
+
+####--------------------------------------------------------------------------.
+#### Priority
+
+
+_THREAD_STATE = threading.local()
+
+
+def get_priority():
+    """Return the rate limiting priority of the requests of the current thread."""
+    return getattr(_THREAD_STATE, "priority", PRIORITY_BACKFILL)
+
+
+@contextlib.contextmanager
+def priority(level):
+    """Context manager setting the rate limiting priority of the requests of the current thread.
+
+    The requests with the highest priority are served first.
+    The downloads of `_fs_get_parallel` inherit the priority of the calling thread.
+    """
+    if isinstance(level, bool) or not isinstance(level, int):
+        raise TypeError("The priority `level` must be an integer.")
+    previous_level = get_priority()
+    _THREAD_STATE.priority = level
+    try:
+        yield
+    finally:
+        _THREAD_STATE.priority = previous_level
+
+
+####--------------------------------------------------------------------------.
+#### Token bucket
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket with prioritized waiters.
+
+    Tokens are added at `rate` tokens per second, up to `capacity` tokens.
+    The waiters are served by decreasing priority, and in arrival order
+    for a same priority.
+
+    Parameters
+    ----------
+    rate : float
+        Number of tokens added per second.
+    capacity : float, optional
+        Maximum number of tokens (burst size). The default is `rate`.
+
+    """
+
+    def __init__(self, rate, capacity=None):
+        if isinstance(rate, bool) or not isinstance(rate, (int, float)) or rate <= 0:
+            raise ValueError("`rate` must be a positive number.")
+        capacity = rate if capacity is None else capacity
+        if isinstance(capacity, bool) or not isinstance(capacity, (int, float)) or capacity <= 0:
+            raise ValueError("`capacity` must be a positive number.")
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._last_time = time.monotonic()
+        self._condition = threading.Condition()
+        self._waiters = []  # heap of (-priority, arrival)
+        self._counter = itertools.count()
+
+    def __repr__(self):
+        return f"<TokenBucket rate={self.rate}/s capacity={self.capacity}>"
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._last_time) * self.rate)
+        self._last_time = now
+
+    def acquire(self, n=1, priority=None):
+        """
+        Wait until `n` tokens are available and consume them.
+
+        Requests of more than `capacity` tokens are served in chunks of `capacity` tokens.
+
+        Returns
+        -------
+        waited : float
+            Time (in seconds) spent waiting for the tokens.
+        """
+        priority = get_priority() if priority is None else priority
+        waited = 0.0
+        while n > self.capacity:
+            waited += self.acquire(self.capacity, priority=priority)
+            n -= self.capacity
+        t_i = time.monotonic()
+        with self._condition:
+            waiter = (-priority, next(self._counter))
+            heapq.heappush(self._waiters, waiter)
+            # A new waiter with a higher priority preempts the current first waiter
+            self._condition.notify_all()
+            try:
+                while True:
+                    self._refill()
+                    is_first = self._waiters[0] == waiter
+                    if is_first and self._tokens >= n:
+                        self._tokens -= n
+                        break
+                    # The first waiter sleeps until enough tokens are available,
+                    # the others until a waiter is served
+                    self._condition.wait((n - self._tokens) / self.rate if is_first else None)
+            finally:
+                self._waiters.remove(waiter)
+                heapq.heapify(self._waiters)
+                self._condition.notify_all()
+        return waited + time.monotonic() - t_i
+
+
+####--------------------------------------------------------------------------.
+#### Rate limiter
+
+
+class RateLimiter:
+    """
+    Bandwidth (bytes/s) and request rate (requests/s) limiter.
+
+    Parameters
+    ----------
+    bytes_per_second : float, optional
+        Maximum download bandwidth. The default is None (no limit).
+    requests_per_second : float, optional
+        Maximum rate of requests (LIST, HEAD and GET). The default is None (no limit).
+
+    """
+
+    def __init__(self, bytes_per_second=None, requests_per_second=None):
+        self.bytes_per_second = bytes_per_second
+        self.requests_per_second = requests_per_second
+        self._bytes_bucket = None if bytes_per_second is None else TokenBucket(bytes_per_second)
+        self._requests_bucket = None if requests_per_second is None else TokenBucket(requests_per_second)
+
+    def __repr__(self):
+        return (
+            f"<RateLimiter bytes_per_second={self.bytes_per_second} "
+            f"requests_per_second={self.requests_per_second}>"
+        )
+
+    @property
+    def limits_bytes(self):
+        """True if the download bandwidth is limited."""
+        return self._bytes_bucket is not None
+
+    def _acquire(self, bucket, n, priority):
+        if bucket is None:
+            return
+        waited = bucket.acquire(n, priority=priority)
+        # Record only the actual waits (not the lock acquisition)
+        if waited > 1e-3:
+            get_metrics().add_duration("throttle", waited)
+
+    def request(self, priority=None):
+        """Wait for the permission to send a request."""
+        self._acquire(self._requests_bucket, 1, priority)
+
+    def transfer(self, n_bytes, priority=None):
+        """Wait for the permission to transfer `n_bytes` bytes."""
+        self._acquire(self._bytes_bucket, n_bytes, priority)
+
+    def get_file(self, fs, bucket_fpath, local_fpath, priority=None):
+        """Download a file with `fs`, limiting the bandwidth and the request rate.
+
+        If the bandwidth is limited, the file is read without cache in chunks of
+        one second of bandwidth (at least 1 MiB), each chunk being a single
+        ranged GET. The request and bytes tokens of a chunk are acquired before
+        reading it, so that a higher priority transfer can preempt the transfer
+        between two chunks.
+        """
+        # Request opening the file (i.e. a HEAD request retrieving the file size)
+        self.request(priority=priority)
+        if not self.limits_bytes:
+            fs.get(bucket_fpath, local_fpath)
+            return
+        chunk_size = max(_CHUNK_SIZE, int(self._bytes_bucket.capacity))
+        with fs.open(bucket_fpath, "rb", block_size=chunk_size, cache_type="none") as f_in, open(
+            local_fpath, "wb"
+        ) as f_out:
+            size = f_in.size
+            offset = 0
+            while offset < size:
+                n_bytes = min(chunk_size, size - offset)
+                self.request(priority=priority)
+                self.transfer(n_bytes, priority=priority)
+                chunk = f_in.read(n_bytes)
+                if not chunk:
+                    break
+                f_out.write(chunk)
+                offset += len(chunk)
+
+
+####--------------------------------------------------------------------------.
+#### Process-wide rate limiter
+
+_RATE_LIMITER = RateLimiter()
+
+
+def set_rate_limits(bytes_per_second=None, requests_per_second=None):
+    """
+    Set the bandwidth and request rate limits of the process.
+
+    The limits are shared by all the search and download threads of the process.
+    Use `himawari_api.ratelimit.priority(PRIORITY_NRT)` to let the requests of
+    a thread preempt the other requests. The `ingest` function and the
+    `NRTWatcher` polls use `PRIORITY_NRT`.
+
+    Parameters
+    ----------
+    bytes_per_second : float, optional
+        Maximum download bandwidth. The default is None (no limit).
+    requests_per_second : float, optional
+        Maximum rate of requests (LIST, HEAD and GET) to the cloud buckets.
+        The default is None (no limit).
+
+    Returns
+    -------
+    rate_limiter : RateLimiter
+        The process-wide rate limiter.
+    """
+    global _RATE_LIMITER
+
+    _RATE_LIMITER = RateLimiter(bytes_per_second=bytes_per_second, requests_per_second=requests_per_second)
+    return _RATE_LIMITER
+
+
+def get_rate_limiter():
+    """Return the process-wide `RateLimiter` of the search and download functions."""
+    return _RATE_LIMITER
+
+
+####--------------------------------------------------------------------------.
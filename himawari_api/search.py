@@ -18,10 +18,13 @@
 
 import os
 import datetime
+import functools
+import concurrent.futures
 import numpy as np
-import pandas as pd
-from himawari_api.info import _group_fpaths_by_key
-from himawari_api.filter import _filter_files
+from himawari_api.info import _group_fpaths_by_key, get_key_from_filepaths
+from himawari_api.filter import _filter_files, _prefilter_fnames
+from himawari_api.metrics import get_metrics
+from himawari_api.ratelimit import get_rate_limiter
 from himawari_api.checks import (
      _check_protocol,
      _check_base_dir,
@@ -39,6 +42,9 @@ from himawari_api.checks import (
 from himawari_api.io import (
     _set_connection_type,
     _get_product_dir,
+    _get_product_name,
+    _iter_local_time_dirs,
+    _scandir_files,
     _get_bucket_prefix,
     get_filesystem,
     get_fname_glob_pattern,
@@ -76,6 +82,234 @@ def _dt_to_year_month_day_hhmm(dt):
     return year, month, day, hhmm
 
 
+def _get_list_time_dir_tree(start_time, end_time):
+    """Yield the <YYYY>/<MM>/<DD>/<HHMM> directories covering the time period.
+
+    The directories are generated lazily in chronological order, so that
+    the memory usage does not depend on the length of the time period.
+    """
+    # - start_time =  datetime.datetime(2022, 11, 21, 15, 27, 30)
+    # - end_time =  datetime.datetime(2022, 11, 21, 15, 27, 30)
+    # --> + timedelta is required to ensure correct list
+    dt = datetime.timedelta(minutes=10)
+    timestep = start_time
+    while timestep <= end_time + dt:
+        yield "/".join(_dt_to_year_month_day_hhmm(timestep))
+        timestep = timestep + dt
+
+
+def _check_search_inputs(
+    satellite,
+    product_level,
+    product,
+    start_time,
+    end_time,
+    sector,
+    filter_parameters,
+    group_by_key,
+    connection_type,
+    base_dir,
+    protocol,
+    fs_args,
+):
+    """Check and format the inputs of the file search functions."""
+    if protocol is None and base_dir is None:
+        raise ValueError("Specify 1 between `base_dir` and `protocol`")
+    if base_dir is not None:
+        if protocol is not None:
+            if protocol not in ["file", "local"]:
+                raise ValueError("If base_dir is specified, protocol must be None.")
+        else:
+            protocol = "file"
+            fs_args = {}
+
+    # Format inputs
+    protocol = _check_protocol(protocol)
+    base_dir = _check_base_dir(base_dir)
+    connection_type = _check_connection_type(connection_type, protocol)
+    satellite = _check_satellite(satellite)
+    product_level = _check_product_level(product_level, product=None)
+    product = _check_product(product, product_level=product_level)
+    sector = _check_sector(sector, product=product)
+    start_time, end_time = _check_start_end_time(start_time, end_time)
+    filter_parameters = _check_filter_parameters(filter_parameters, sector=sector)
+    group_by_key = _check_group_by_key(group_by_key)
+
+    # Add start_time and end_time to filter_parameters
+    filter_parameters = filter_parameters.copy()
+    filter_parameters["start_time"] = start_time
+    filter_parameters["end_time"] = end_time
+    return (
+        satellite,
+        product_level,
+        product,
+        start_time,
+        end_time,
+        sector,
+        filter_parameters,
+        group_by_key,
+        connection_type,
+        base_dir,
+        protocol,
+        fs_args,
+    )
+
+
+def _list_local_directory_fpaths(time_dir, product, product_level, filter_parameters, detail=False):
+    """Return the (filtered) filepaths of a local time directory.
+
+    The directory entries are not stat-ed: the sizes are retrieved
+    only if `detail=True`, and only for the selected files.
+    """
+    metrics = get_metrics()
+    with metrics.timer("list"):
+        dir_fpaths = _scandir_files(time_dir, detail=False)
+    metrics.inc("list_requests")
+    metrics.inc("files_listed", len(dir_fpaths))
+    with metrics.timer("filter"):
+        fnames = sorted(os.path.basename(fpath) for fpath in dir_fpaths)
+        fnames = _prefilter_fnames(fnames, product_level, channels=filter_parameters.get("channels"))
+        fpaths = [os.path.join(time_dir, fname) for fname in fnames]
+        if len(fpaths) >= 1 and len(filter_parameters) >= 1:
+            fpaths = _filter_files(fpaths, product, product_level, **filter_parameters)
+    if detail:
+        return {fpath: {"name": fpath, "size": os.path.getsize(fpath), "type": "file"} for fpath in fpaths}
+    return fpaths
+
+
+def _iter_local_directories_fpaths(
+    satellite,
+    product_level,
+    product,
+    start_time,
+    end_time,
+    sector,
+    filter_parameters,
+    base_dir,
+    detail=False,
+    n_threads=None,
+    time_dir_trees=None,
+):
+    """Yield the (filtered) local filepaths of each time directory.
+
+    The <YYYY>/<MM>/<DD>/<HHMM> directory tree is walked once with `os.scandir`,
+    pruning the directories outside the time period, instead of globbing
+    each 10-minute directory. The filenames are preselected by name before being parsed.
+    If `n_threads` > 1, the time directories are listed in parallel threads.
+    If `time_dir_trees` is specified, only the existing directories of the list are listed.
+    """
+    satellite_dir = os.path.join(base_dir, satellite.upper())
+    if not os.path.isdir(satellite_dir):
+        raise OSError(f"The directory {satellite_dir} does not exist.")
+    product_dir = os.path.join(satellite_dir, _get_product_name(product_level, product, sector))
+    if time_dir_trees is None:
+        time_dirs = _iter_local_time_dirs(product_dir, start_time, end_time)
+    else:
+        time_dirs = (os.path.join(product_dir, *time_dir_tree.split("/")) for time_dir_tree in time_dir_trees)
+        time_dirs = (time_dir for time_dir in time_dirs if os.path.isdir(time_dir))
+    list_directory = functools.partial(
+        _list_local_directory_fpaths,
+        product=product,
+        product_level=product_level,
+        filter_parameters=filter_parameters,
+        detail=detail,
+    )
+    if n_threads is None or n_threads <= 1:
+        yield from map(list_directory, time_dirs)
+    else:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=n_threads) as executor:
+            yield from executor.map(list_directory, time_dirs)
+
+
+def _iter_directories_fpaths(
+    satellite,
+    product_level,
+    product,
+    start_time,
+    end_time,
+    sector,
+    filter_parameters,
+    base_dir,
+    protocol,
+    fs_args,
+    detail=False,
+    n_threads=None,
+    time_dir_trees=None,
+):
+    """Yield the (filtered) bucket filepaths of each time directory.
+
+    If `detail=True`, yield dictionaries {<fpath>: <file info>} with the
+    file information (i.e. size, ETag, LastModified) returned by the listing.
+    If `base_dir` is specified, the local directory tree is walked with `os.scandir`.
+    If `time_dir_trees` is specified, only (and in the order of) the listed
+    <YYYY>/<MM>/<DD>/<HHMM> directories are searched, instead of all the
+    directories of the time period.
+    The inputs are expected to be already checked by `_check_search_inputs`.
+    """
+    if base_dir is not None:
+        yield from _iter_local_directories_fpaths(
+            satellite=satellite,
+            product_level=product_level,
+            product=product,
+            start_time=start_time,
+            end_time=end_time,
+            sector=sector,
+            filter_parameters=filter_parameters,
+            base_dir=base_dir,
+            detail=detail,
+            n_threads=n_threads,
+            time_dir_trees=time_dir_trees,
+        )
+        return
+
+    # Get filesystem
+    fs = get_filesystem(protocol=protocol, fs_args=fs_args)
+
+    bucket_prefix = _get_bucket_prefix(protocol)
+
+    # Get product dir
+    product_dir = _get_product_dir(
+        protocol=protocol,
+        base_dir=base_dir,
+        satellite=satellite,
+        product_level=product_level,
+        product=product,
+        sector=sector,
+    )
+
+    # Define glob pattern
+    fname_glob_pattern = get_fname_glob_pattern(product_level=product_level)
+
+    # Loop over each time directory <YYYY>/<MM>/<DD>/<HH00, HH10, HH20,...>
+    metrics = get_metrics()
+    rate_limiter = get_rate_limiter()
+    if time_dir_trees is None:
+        time_dir_trees = _get_list_time_dir_tree(start_time, end_time)
+    for time_dir_tree in time_dir_trees:
+        glob_pattern = os.path.join(product_dir, time_dir_tree, fname_glob_pattern)
+        # Retrieve list of files
+        rate_limiter.request()
+        with metrics.timer("list"):
+            if detail:
+                dict_info = fs.glob(glob_pattern, detail=True)
+                dict_info = {bucket_prefix + fpath: info for fpath, info in dict_info.items()}
+                fpaths = list(dict_info)
+            else:
+                fpaths = fs.glob(glob_pattern)
+                # Add bucket prefix
+                fpaths = [bucket_prefix + fpath for fpath in fpaths]
+        metrics.inc("list_requests")
+        metrics.inc("files_listed", len(fpaths))
+        # Filter files if necessary
+        if len(filter_parameters) >= 1:
+            with metrics.timer("filter"):
+                fpaths = _filter_files(fpaths, product, product_level, **filter_parameters)
+        if detail:
+            yield {fpath: dict_info[fpath] for fpath in fpaths}
+        else:
+            yield fpaths
+
+
 def find_files(
     satellite,
     product_level,
@@ -89,6 +323,7 @@ def find_files(
     base_dir=None,
     protocol=None,
     fs_args={},
+    n_threads=None,
     verbose=False,
 ):
     """
@@ -99,6 +334,9 @@ def find_files(
       key `scene_abbr` with values "R1", "R2" (for Japan), "R3" (for Target") or  
      "R4" and "R5" (for Landmark).
       
+    For long time periods, consider using `himawari_api.iter_files` which
+    returns the files one directory at a time.
+
     Parameters
     ----------
     base_dir : str
@@ -130,7 +368,7 @@ def find_files(
         See `himawari_api.available_sectors()` for a list of available sectors.
     filter_parameters : dict, optional
         Dictionary specifying option filtering parameters.
-        Valid keys includes: `channels`, `scene_abbr`.
+        Valid keys includes: `channels`, `composites`, `scene_abbr`, `resolution`.
         The default is a empty dictionary (no filtering).
     group_by_key : str, optional
         Key by which to group the list of filepaths
@@ -141,82 +379,63 @@ def find_files(
         The type of connection to a cloud bucket.
         This argument applies only if working with cloud buckets (base_dir is None).
         See `himawari_api.available_connection_types` for implemented solutions.
+    n_threads : int, optional
+        Number of threads listing the local directories in parallel.
+        This argument applies only if searching files on local storage (base_dir).
+        By default, the directories are listed sequentially.
     verbose : bool, optional
         If True, it print some information concerning the file search.
         The default is False.
 
     """
-
     # Check inputs
-    if protocol is None and base_dir is None:
-        raise ValueError("Specify 1 between `base_dir` and `protocol`")
-    if base_dir is not None:
-        if protocol is not None:
-            if protocol not in ["file", "local"]:
-                raise ValueError("If base_dir is specified, protocol must be None.")
-        else:
-            protocol = "file"
-            fs_args = {}
-   
-    # Format inputs
-    protocol = _check_protocol(protocol)
-    base_dir = _check_base_dir(base_dir)
-    connection_type = _check_connection_type(connection_type, protocol)
-    satellite = _check_satellite(satellite)
-    product_level = _check_product_level(product_level, product=None)
-    product = _check_product(product, product_level=product_level)
-    sector = _check_sector(sector, product=product)  
-    start_time, end_time = _check_start_end_time(start_time, end_time) 
-    filter_parameters = _check_filter_parameters(filter_parameters, sector=sector)
-    group_by_key = _check_group_by_key(group_by_key)
-
-    # Add start_time and end_time to filter_parameters
-    filter_parameters = filter_parameters.copy()
-    filter_parameters["start_time"] = start_time
-    filter_parameters["end_time"] = end_time
-
-    # Get filesystem
-    fs = get_filesystem(protocol=protocol, fs_args=fs_args)
-
-    bucket_prefix = _get_bucket_prefix(protocol)
-
-    # Get product dir
-    product_dir = _get_product_dir(
-        protocol=protocol,
-        base_dir=base_dir,
+    (
+        satellite,
+        product_level,
+        product,
+        start_time,
+        end_time,
+        sector,
+        filter_parameters,
+        group_by_key,
+        connection_type,
+        base_dir,
+        protocol,
+        fs_args,
+    ) = _check_search_inputs(
         satellite=satellite,
         product_level=product_level,
         product=product,
+        start_time=start_time,
+        end_time=end_time,
         sector=sector,
+        filter_parameters=filter_parameters,
+        group_by_key=group_by_key,
+        connection_type=connection_type,
+        base_dir=base_dir,
+        protocol=protocol,
+        fs_args=fs_args,
     )
 
-    # Define time directories 
-    # <YYYY>/<MM>/<DD>/<HH00, HH10, HH20,...>)
-    # - start_time =  datetime.datetime(2022, 11, 21, 15, 27, 30)
-    # - end_time =  datetime.datetime(2022, 11, 21, 15, 27, 30)
-    # --> + timedelta is required to ensure correct list 
-    list_timesteps = pd.date_range(start_time, end_time + datetime.timedelta(minutes=10), freq="10min")
-    list_time_dir_tree = ["/".join(_dt_to_year_month_day_hhmm(dt)) for dt in list_timesteps]
-
-    # Define glob patterns 
-    fname_glob_pattern = get_fname_glob_pattern(product_level=product_level)
-    list_glob_pattern = [os.path.join(product_dir, time_dir_tree, fname_glob_pattern) for time_dir_tree in list_time_dir_tree]
-    n_directories = len(list_glob_pattern)
     if verbose:
+        n_directories = sum(1 for _ in _get_list_time_dir_tree(start_time, end_time))
         print(f"Searching files across {n_directories} directories.")
 
-    # Loop over each directory:
-    # - TODO in parallel 
+    # Loop over each directory
     list_fpaths = []
-    # glob_pattern = list_glob_pattern[0]
-    for glob_pattern in list_glob_pattern:
-        # Retrieve list of files
-        fpaths = fs.glob(glob_pattern)
-        # Add bucket prefix
-        fpaths = [bucket_prefix + fpath for fpath in fpaths]
-        # Filter files if necessary
-        if len(filter_parameters) >= 1:
-            fpaths = _filter_files(fpaths, product, product_level, **filter_parameters)  
+    for fpaths in _iter_directories_fpaths(
+        satellite=satellite,
+        product_level=product_level,
+        product=product,
+        start_time=start_time,
+        end_time=end_time,
+        sector=sector,
+        filter_parameters=filter_parameters,
+        base_dir=base_dir,
+        protocol=protocol,
+        fs_args=fs_args,
+        n_threads=n_threads,
+    ):
         list_fpaths += fpaths
 
     fpaths = list_fpaths
@@ -233,6 +452,165 @@ def find_files(
     return fpaths
 
 
+def iter_files(
+    satellite,
+    product_level,
+    product,
+    start_time,
+    end_time,
+    sector=None,
+    filter_parameters={},
+    group_by_key=None,
+    connection_type=None,
+    base_dir=None,
+    protocol=None,
+    fs_args={},
+):
+    """
+    Iterate over the files from local or cloud bucket storage.
+
+    Contrary to `find_files`, the files are listed lazily one <HHMM> directory
+    at a time (every 10 minutes of acquisitions) and are yielded in
+    chronological order. The memory usage is therefore constant irrespective
+    of the length of the time period and the processing of the first files
+    can start before the listing of the whole period is completed.
+
+    Parameters
+    ----------
+    base_dir : str
+        Base directory path where the <HIMAWARI-**> satellite is located.
+        This argument must be specified only if searching files on local storage.
+        If it is specified, protocol and fs_args arguments must not be specified.
+    protocol : str
+        String specifying the cloud bucket storage from which to retrieve
+        the data. It must be specified if not searching data on local storage.
+        Use `himawari_api.available_protocols()` to retrieve available protocols.
+    fs_args : dict, optional
+        Dictionary specifying optional settings to initiate the fsspec.filesystem.
+        The default is an empty dictionary. Anonymous connection is set by default.
+    satellite : str
+        The name of the satellite.
+        Use `himawari_api.available_satellites()` to retrieve the available satellites.
+    product_level : str
+        Product level.
+        See `himawari_api.available_product_levels()` for available product levels.
+    product : str
+        The name of the product to retrieve.
+        See `himawari_api.available_products()` for a list of available products.
+    start_time : datetime.datetime
+        The start (inclusive) time of the interval period for retrieving the filepaths.
+    end_time : datetime.datetime
+        The end (exclusive) time of the interval period for retrieving the filepaths.
+    sector : str
+        The acronym of the AHI sector for which to retrieve the files.
+        See `himawari_api.available_sectors()` for a list of available sectors.
+    filter_parameters : dict, optional
+        Dictionary specifying option filtering parameters.
+        Valid keys includes: `channels`, `composites`, `scene_abbr`, `resolution`.
+        The default is a empty dictionary (no filtering).
+    group_by_key : str, optional
+        Key by which to group the filepaths of each directory.
+        See `himawari_api.available_group_keys()` for available grouping keys.
+        If a key is provided, the function yields dictionaries with grouped filepaths.
+        Note that the grouping is performed within each directory.
+        By default, no key is specified and the function yields lists of filepaths.
+    connection_type : str, optional
+        The type of connection to a cloud bucket.
+        This argument applies only if working with cloud buckets (base_dir is None).
+        See `himawari_api.available_connection_types` for implemented solutions.
+
+    Returns
+    -------
+    iterator
+        Iterator over the filepaths (list or dict) of each directory.
+        Directories without (selected) files are skipped.
+        The inputs are checked when calling the function, before the iteration starts.
+
+    """
+    # Check inputs
+    (
+        satellite,
+        product_level,
+        product,
+        start_time,
+        end_time,
+        sector,
+        filter_parameters,
+        group_by_key,
+        connection_type,
+        base_dir,
+        protocol,
+        fs_args,
+    ) = _check_search_inputs(
+        satellite=satellite,
+        product_level=product_level,
+        product=product,
+        start_time=start_time,
+        end_time=end_time,
+        sector=sector,
+        filter_parameters=filter_parameters,
+        group_by_key=group_by_key,
+        connection_type=connection_type,
+        base_dir=base_dir,
+        protocol=protocol,
+        fs_args=fs_args,
+    )
+    # Return the generator of the (checked) directories filepaths
+    return _iter_files(
+        satellite=satellite,
+        product_level=product_level,
+        product=product,
+        start_time=start_time,
+        end_time=end_time,
+        sector=sector,
+        filter_parameters=filter_parameters,
+        group_by_key=group_by_key,
+        connection_type=connection_type,
+        base_dir=base_dir,
+        protocol=protocol,
+        fs_args=fs_args,
+    )
+
+
+def _iter_files(
+    satellite,
+    product_level,
+    product,
+    start_time,
+    end_time,
+    sector,
+    filter_parameters,
+    group_by_key,
+    connection_type,
+    base_dir,
+    protocol,
+    fs_args,
+):
+    """Yield the filepaths of each directory. The inputs must be checked by `iter_files`."""
+    for fpaths in _iter_directories_fpaths(
+        satellite=satellite,
+        product_level=product_level,
+        product=product,
+        start_time=start_time,
+        end_time=end_time,
+        sector=sector,
+        filter_parameters=filter_parameters,
+        base_dir=base_dir,
+        protocol=protocol,
+        fs_args=fs_args,
+    ):
+        if len(fpaths) == 0:
+            continue
+        # Group fpaths by key
+        if group_by_key:
+            fpaths = _group_fpaths_by_key(fpaths, product_level, key=group_by_key)
+        # Parse fpaths for connection type
+        fpaths = _set_connection_type(
+            fpaths, satellite=satellite, protocol=protocol, connection_type=connection_type
+        )
+        yield fpaths
+
+
 def find_closest_start_time(
     time,
     satellite,
@@ -276,7 +654,7 @@ def find_closest_start_time(
         See `himawari_api.available_sectors()` for a list of available sectors.
     filter_parameters: dict, optional
         Dictionary specifying option filtering parameters.
-        Valid keys includes: `channels`, `scene_abbr`.
+        Valid keys includes: `channels`, `composites`, `scene_abbr`, `resolution`.
         The default is a empty dictionary (no filtering).
     """
     # Set time precision to minutes
@@ -329,6 +707,10 @@ def find_latest_start_time(
     """
     Retrieve the latest file start_time available.
 
+    The time directories of the look-ahead window are listed from the most
+    recent one, stopping at the first directory with data.
+    To wait for the next acquisitions, see `himawari_api.NRTWatcher`.
+
     Parameters
     ----------
     look_ahead_minutes: int, optional
@@ -359,36 +741,59 @@ def find_latest_start_time(
         See `himawari_api.available_sectors()` for a list of available sectors.
     filter_parameters: dict, optional
         Dictionary specifying option filtering parameters.
-        Valid keys includes: `channels`, `scene_abbr`.
+        Valid keys includes: `channels`, `composites`, `scene_abbr`, `resolution`.
         The default is a empty dictionary (no filtering).
     """
-    # Search in the past N hour of data
-    start_time = datetime.datetime.utcnow() - datetime.timedelta(
-        minutes=look_ahead_minutes
-    )
+    # Search in the past N minutes of data
     end_time = datetime.datetime.utcnow()
-    fpath_dict = find_files(
+    start_time = end_time - datetime.timedelta(minutes=look_ahead_minutes)
+    (
+        satellite,
+        product_level,
+        product,
+        start_time,
+        end_time,
+        sector,
+        filter_parameters,
+        _,
+        _,
+        base_dir,
+        protocol,
+        fs_args,
+    ) = _check_search_inputs(
+        satellite=satellite,
+        product_level=product_level,
+        product=product,
+        start_time=start_time,
+        end_time=end_time,
+        sector=sector,
+        filter_parameters=filter_parameters,
+        group_by_key=None,
+        connection_type=connection_type,
         base_dir=base_dir,
         protocol=protocol,
         fs_args=fs_args,
+    )
+    # Probe the time directories from the most recent one (the directory of the
+    # current time) and stop at the first directory with data, instead of
+    # listing all the directories of the look-ahead window.
+    time_dir_trees = list(_get_list_time_dir_tree(start_time, end_time - datetime.timedelta(minutes=10)))
+    for fpaths in _iter_directories_fpaths(
         satellite=satellite,
         product_level=product_level,
         product=product,
-        sector=sector,
         start_time=start_time,
         end_time=end_time,
+        sector=sector,
         filter_parameters=filter_parameters,
-        group_by_key="start_time",
-        connection_type=connection_type,
-        verbose=False,
-    )
-    # Find the latest time available
-    if len(fpath_dict) == 0: 
-        raise ValueError("No data found. Maybe try to increase `look_ahead_minutes`.")
-    list_datetime = list(fpath_dict.keys())
-    idx_latest = np.argmax(np.array(list_datetime))
-    datetime_latest = list_datetime[idx_latest]
-    return datetime_latest
+        base_dir=base_dir,
+        protocol=protocol,
+        fs_args=fs_args,
+        time_dir_trees=time_dir_trees[::-1],
+    ):
+        if len(fpaths) > 0:
+            return max(get_key_from_filepaths(fpaths, key="start_time"))
+    raise ValueError("No data found. Maybe try to increase `look_ahead_minutes`.")
 
 
 def find_closest_files(
@@ -439,7 +844,7 @@ def find_closest_files(
         The time for which you desire to retrieve the files with closest start_time.
     filter_parameters : dict, optional
         Dictionary specifying option filtering parameters.
-        Valid keys includes: `channels`, `scene_abbr`.
+        Valid keys includes: `channels`, `composites`, `scene_abbr`, `resolution`.
         The default is a empty dictionary (no filtering).
     connection_type : str, optional
         The type of connection to a cloud bucket.
@@ -543,7 +948,7 @@ def find_latest_files(
         See `himawari_api.available_sectors()` for a list of available sectors.
     filter_parameters : dict, optional
         Dictionary specifying option filtering parameters.
-        Valid keys includes: `channels`, `scene_abbr`.
+        Valid keys includes: `channels`, `composites`, `scene_abbr`, `resolution`.
         The default is a empty dictionary (no filtering).
     connection_type : str, optional
         The type of connection to a cloud bucket.
@@ -645,7 +1050,7 @@ def find_previous_files(
         See `himawari_api.available_sectors()` for a list of available sectors.
     filter_parameters : dict, optional
         Dictionary specifying option filtering parameters.
-        Valid keys includes: `channels`, `scene_abbr`.
+        Valid keys includes: `channels`, `composites`, `scene_abbr`, `resolution`.
         The default is a empty dictionary (no filtering).
     connection_type : str, optional
         The type of connection to a cloud bucket.
@@ -795,7 +1200,7 @@ def find_next_files(
         See `himawari_api.available_sectors()` for a list of available sectors.
     filter_parameters : dict, optional
         Dictionary specifying option filtering parameters.
-        Valid keys includes: `channels`, `scene_abbr`.
+        Valid keys includes: `channels`, `composites`, `scene_abbr`, `resolution`.
         The default is a empty dictionary (no filtering).
     connection_type : str, optional
         The type of connection to a cloud bucket.
@@ -0,0 +1,450 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Define himawari_api functions to synchronize a local mirror with the cloud buckets.
+
+The remote manifest (path, size, ETag) is built from the bucket listing and
+the local manifest (path, size) from a single `os.scandir` walk of the local
+directory tree. Only the differences between the two manifests are transferred.
+The ETags of the synchronized files are recorded in a SQLite manifest in
+`base_dir`, so that the files updated on the bucket are fetched again.
+The local files not synchronized yet (i.e. downloaded with `download_files`)
+are recorded with the remote ETag the first time their size matches the
+remote size.
+"""
+
+import os
+import time
+import contextlib
+import sqlite3
+
+_SYNC_MANIFEST_FNAME = ".himawari_api_sync.sqlite"
+
+_SYNC_MANIFEST_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    size INTEGER,
+    etag TEXT
+);
+"""
+
+# Maximum number of paths per SQLite query (SQLITE_MAX_VARIABLE_NUMBER is 999 before SQLite 3.32)
+_SQLITE_MAX_VARIABLES = 900
+
+_PRODUCT_SPEC_KEYS = ["satellite", "product_level", "product", "sector", "filter_parameters"]
+
+
+####--------------------------------------------------------------------------.
+#### Checks
+
+
+def _check_product_specs(product_specs):
+    """Check the product specifications."""
+    if isinstance(product_specs, dict):
+        product_specs = [product_specs]
+    if not isinstance(product_specs, (list, tuple)) or len(product_specs) == 0:
+        raise TypeError("`product_specs` must be a dictionary or a list of dictionaries.")
+    for spec in product_specs:
+        if not isinstance(spec, dict):
+            raise TypeError("Each product specification must be a dictionary.")
+        invalid_keys = set(spec) - set(_PRODUCT_SPEC_KEYS)
+        if invalid_keys:
+            raise ValueError(f"Invalid product specification keys {invalid_keys}. Valid keys are {_PRODUCT_SPEC_KEYS}.")
+        missing_keys = {"satellite", "product_level", "product", "sector"} - set(spec)
+        if missing_keys:
+            raise ValueError(f"The product specification {spec} misses the keys {missing_keys}.")
+    return list(product_specs)
+
+
+####--------------------------------------------------------------------------.
+#### Manifests
+
+
+def _get_remote_manifest(spec, start_time, end_time, protocol, fs_args):
+    """Return the remote manifest {bucket_fpath: (size, etag)} of a product."""
+    from himawari_api.search import _check_search_inputs, _iter_directories_fpaths
+
+    (
+        satellite,
+        product_level,
+        product,
+        start_time,
+        end_time,
+        sector,
+        filter_parameters,
+        _,
+        _,
+        base_dir,
+        protocol,
+        fs_args,
+    ) = _check_search_inputs(
+        satellite=spec["satellite"],
+        product_level=spec["product_level"],
+        product=spec["product"],
+        start_time=start_time,
+        end_time=end_time,
+        sector=spec["sector"],
+        filter_parameters=spec.get("filter_parameters", {}),
+        group_by_key=None,
+        connection_type="bucket",
+        base_dir=None,
+        protocol=protocol,
+        fs_args=fs_args,
+    )
+    manifest = {}
+    for dict_info in _iter_directories_fpaths(
+        satellite=satellite,
+        product_level=product_level,
+        product=product,
+        start_time=start_time,
+        end_time=end_time,
+        sector=sector,
+        filter_parameters=filter_parameters,
+        base_dir=base_dir,
+        protocol=protocol,
+        fs_args=fs_args,
+        detail=True,
+    ):
+        for fpath, info in dict_info.items():
+            etag = info.get("ETag", info.get("etag"))
+            manifest[fpath] = (info.get("size", info.get("Size")), etag.strip('"') if etag else None)
+    return manifest
+
+
+def _get_local_manifest(spec, start_time, end_time, base_dir):
+    """Return the local manifest {local_fpath: size} of a product.
+
+    The local files are filtered with the same filter parameters of the remote files.
+    """
+    from himawari_api.search import _check_search_inputs, _iter_local_directories_fpaths
+
+    (
+        satellite,
+        product_level,
+        product,
+        start_time,
+        end_time,
+        sector,
+        filter_parameters,
+        _,
+        _,
+        base_dir,
+        _,
+        _,
+    ) = _check_search_inputs(
+        satellite=spec["satellite"],
+        product_level=spec["product_level"],
+        product=spec["product"],
+        start_time=start_time,
+        end_time=end_time,
+        sector=spec["sector"],
+        filter_parameters=spec.get("filter_parameters", {}),
+        group_by_key=None,
+        connection_type=None,
+        base_dir=base_dir,
+        protocol=None,
+        fs_args={},
+    )
+    # The satellite directory might not exist yet
+    if not os.path.isdir(os.path.join(base_dir, satellite.upper())):
+        return {}
+    manifest = {}
+    for dict_info in _iter_local_directories_fpaths(
+        satellite=satellite,
+        product_level=product_level,
+        product=product,
+        start_time=start_time,
+        end_time=end_time,
+        sector=sector,
+        filter_parameters=filter_parameters,
+        base_dir=base_dir,
+        detail=True,
+    ):
+        manifest.update({fpath: info["size"] for fpath, info in dict_info.items()})
+    return manifest
+
+
+def _open_sync_manifest(base_dir):
+    """Open the SQLite manifest of the synchronized files."""
+    conn = sqlite3.connect(os.path.join(base_dir, _SYNC_MANIFEST_FNAME), timeout=60)
+    conn.executescript(_SYNC_MANIFEST_SCHEMA)
+    return conn
+
+
+def _get_synced_etags(conn, fpaths):
+    """Return the ETags {local_fpath: etag} recorded in the sync manifest for `fpaths`.
+
+    Only the rows of `fpaths` are queried, so that the cost does not grow with the mirror size.
+    """
+    fpaths = list(fpaths)
+    synced_etags = {}
+    for i in range(0, len(fpaths), _SQLITE_MAX_VARIABLES):
+        chunk = fpaths[i : i + _SQLITE_MAX_VARIABLES]
+        placeholders = ",".join("?" * len(chunk))
+        rows = conn.execute(f"SELECT path, etag FROM files WHERE path IN ({placeholders})", chunk)
+        synced_etags.update(rows.fetchall())
+    return synced_etags
+
+
+def _diff_manifests(remote_manifest, local_manifest, synced_etags):
+    """Compute the files to download, re-fetch and delete.
+
+    The ETag of a local file is compared only if it has been recorded
+    in the sync manifest. Otherwise only the size is compared.
+
+    Returns
+    -------
+    (to_download, to_refetch, to_delete) : tuple
+        Lists of (local_fpath, bucket_fpath) to download and re-fetch,
+        and list of local_fpath to delete.
+    """
+    remote_local = set(remote_manifest)
+    local_set = set(local_manifest)
+    to_download = sorted(remote_local - local_set)
+    to_delete = sorted(local_set - remote_local)
+    to_refetch = []
+    for local_fpath in remote_local & local_set:
+        size, etag = remote_manifest[local_fpath]
+        synced_etag = synced_etags.get(local_fpath)
+        size_changed = size is not None and size != local_manifest[local_fpath]
+        etag_changed = etag is not None and synced_etag is not None and etag != synced_etag
+        if size_changed or etag_changed:
+            to_refetch.append(local_fpath)
+    return to_download, sorted(to_refetch), to_delete
+
+
+####--------------------------------------------------------------------------.
+#### Sync
+
+
+def _print_sync_report(report):
+    """Print the summary of a synchronization."""
+    print("-------------------------------------------------------------------- ")
+    print(f"Synchronization between {report['start_time']} and {report['end_time']}:")
+    print(f" - Remote files: {report['n_remote']}")
+    print(f" - Local files: {report['n_local']}")
+    print(f" - Downloaded files: {len(report['downloaded'])}")
+    print(f" - Re-fetched files: {len(report['refetched'])}")
+    print(f" - Deleted files: {len(report['deleted'])}")
+    if report["not_deleted"]:
+        print(f" - Files not deleted (empty remote listing): {len(report['not_deleted'])}")
+    print(f" - Failed downloads: {len(report['failed'])}")
+    print(f" - Elapsed time: {round(report['elapsed_time'])} seconds")
+    print("-------------------------------------------------------------------- ")
+
+
+def sync(
+    product_specs,
+    start_time,
+    end_time,
+    base_dir,
+    protocol="s3",
+    fs_args={},
+    delete=False,
+    force_delete=False,
+    n_threads=20,
+    dry_run=False,
+    progress_bar=True,
+    verbose=True,
+):
+    """
+    Synchronize a local mirror of products with a cloud bucket.
+
+    For each product and daily time block, the remote manifest (path, size, ETag)
+    and the local manifest (path, size) are compared and only the differences
+    are transferred:
+
+    - the remote files missing on local storage are downloaded,
+    - the local files whose size differ from the remote size (or whose ETag
+      changed since the last synchronization) are re-fetched,
+    - the local files with the remote size and without a recorded ETag
+      (i.e. downloaded with `download_files`) are recorded with the remote
+      ETag, so that their updates are re-fetched by the next synchronizations,
+    - if `delete=True`, the local files not present on the bucket are removed.
+      The local files of a block are not deleted if the remote listing of the
+      block is empty (i.e. because of a transient listing error or a wrong
+      product specification), unless `force_delete=True`.
+
+    Parameters
+    ----------
+    product_specs : dict or list
+        Product specification(s), i.e. dictionaries with keys `satellite`,
+        `product_level`, `product`, `sector` and optionally `filter_parameters`.
+    start_time : datetime.datetime
+        The start (inclusive) time of the interval period to synchronize.
+    end_time : datetime.datetime
+        The end (exclusive) time of the interval period to synchronize.
+    base_dir : str
+        Base directory path where the <HIMAWARI-**>/<product>/... directory structure
+        is located.
+    protocol : str, optional
+        String specifying the cloud bucket storage. The default is "s3".
+    fs_args : dict, optional
+        Dictionary specifying optional settings to initiate the fsspec.filesystem.
+    delete : bool, optional
+        If True, delete the local files (of the specified products and time period)
+        not present on the cloud bucket. The default is False.
+    force_delete : bool, optional
+        If True, delete the local files of a block also if the remote listing
+        of the block is empty. The default is False.
+    n_threads : int, optional
+        Number of files to be downloaded concurrently. The default is 20.
+    dry_run : bool, optional
+        If True, only compute the differences without transferring or deleting files.
+        The default is False.
+    progress_bar : bool, optional
+        If True, display a progress bar of the downloads. The default is True.
+    verbose : bool, optional
+        If True, print the summary of the synchronization. The default is True.
+
+    Returns
+    -------
+    report : dict
+        Summary of the synchronization with the number of remote and local files,
+        the lists of 'downloaded', 'refetched', 'deleted' and 'failed' local filepaths,
+        the list of 'not_deleted' local filepaths (kept because the remote listing of
+        their block was empty) and the number of 'downloaded_bytes'.
+
+    """
+    from himawari_api.io import get_filesystem
+    from himawari_api.checks import _check_base_dir, _check_start_end_time
+    from himawari_api.download import (
+        _check_download_protocol,
+        _get_local_from_bucket_fpaths,
+        _fs_get_parallel,
+        create_local_directories,
+        get_list_daily_time_blocks,
+    )
+
+    # Checks
+    _check_download_protocol(protocol)
+    base_dir = _check_base_dir(base_dir)
+    product_specs = _check_product_specs(product_specs)
+    start_time, end_time = _check_start_end_time(start_time, end_time)
+
+    t_i = time.time()
+    fs = get_filesystem(protocol=protocol, fs_args=dict(fs_args))
+    conn = _open_sync_manifest(base_dir)
+    report = {
+        "start_time": start_time,
+        "end_time": end_time,
+        "n_remote": 0,
+        "n_local": 0,
+        "downloaded": [],
+        "refetched": [],
+        "deleted": [],
+        "not_deleted": [],
+        "failed": [],
+        "downloaded_bytes": 0,
+    }
+    try:
+        for spec in product_specs:
+            for block_start_time, block_end_time in get_list_daily_time_blocks(start_time, end_time):
+                # Build the manifests
+                remote_manifest = _get_remote_manifest(
+                    spec, block_start_time, block_end_time, protocol=protocol, fs_args=dict(fs_args)
+                )
+                bucket_fpaths = list(remote_manifest)
+                local_fpaths = _get_local_from_bucket_fpaths(
+                    base_dir=base_dir, satellite=spec["satellite"], bucket_fpaths=bucket_fpaths
+                )
+                dict_bucket = dict(zip(local_fpaths, bucket_fpaths))
+                remote_manifest = {
+                    local_fpath: remote_manifest[bucket_fpath]
+                    for local_fpath, bucket_fpath in dict_bucket.items()
+                }
+                local_manifest = _get_local_manifest(spec, block_start_time, block_end_time, base_dir)
+                report["n_remote"] += len(remote_manifest)
+                report["n_local"] += len(local_manifest)
+
+                # Compute the differences
+                synced_etags = _get_synced_etags(conn, local_manifest)
+                to_download, to_refetch, to_delete = _diff_manifests(
+                    remote_manifest, local_manifest, synced_etags
+                )
+                # Do not wipe a local block because of an empty remote listing
+                if delete and to_delete and not remote_manifest and not force_delete:
+                    if verbose:
+                        print(
+                            f"The remote listing between {block_start_time} and {block_end_time} is empty: "
+                            f"{len(to_delete)} local files are not deleted. Use force_delete=True to delete them."
+                        )
+                    report["not_deleted"] += to_delete
+                    to_delete = []
+                if dry_run:
+                    report["downloaded"] += to_download
+                    report["refetched"] += to_refetch
+                    report["deleted"] += to_delete if delete else []
+                    continue
+
+                # Download missing and changed files
+                failed = []
+                for local_fpaths_subset, overwrite in [(to_download, False), (to_refetch, True)]:
+                    if len(local_fpaths_subset) == 0:
+                        continue
+                    create_local_directories(local_fpaths_subset)
+                    l_bucket_errors = _fs_get_parallel(
+                        bucket_fpaths=[dict_bucket[fpath] for fpath in local_fpaths_subset],
+                        local_fpaths=local_fpaths_subset,
+                        fs=fs,
+                        n_threads=n_threads,
+                        progress_bar=progress_bar,
+                        overwrite=overwrite,
+                    )
+                    failed += _get_local_from_bucket_fpaths(
+                        base_dir=base_dir, satellite=spec["satellite"], bucket_fpaths=l_bucket_errors
+                    )
+                failed_set = set(failed)
+                downloaded = [fpath for fpath in to_download if fpath not in failed_set]
+                refetched = [fpath for fpath in to_refetch if fpath not in failed_set]
+
+                # Record the ETags of the synchronized files and of the
+                # up-to-date local files not synchronized yet
+                to_refetch_set = set(to_refetch)
+                unrecorded = [
+                    fpath
+                    for fpath in local_manifest
+                    if fpath in remote_manifest and fpath not in synced_etags and fpath not in to_refetch_set
+                ]
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO files (path, size, etag) VALUES (?, ?, ?)",
+                        [(fpath, *remote_manifest[fpath]) for fpath in downloaded + refetched + unrecorded],
+                    )
+
+                # Delete the local files not present on the bucket
+                if delete and to_delete:
+                    for fpath in to_delete:
+                        with contextlib.suppress(FileNotFoundError):
+                            os.remove(fpath)
+                    with conn:
+                        conn.executemany("DELETE FROM files WHERE path = ?", [(f,) for f in to_delete])
+                    report["deleted"] += to_delete
+
+                report["downloaded"] += downloaded
+                report["refetched"] += refetched
+                report["failed"] += failed
+                report["downloaded_bytes"] += sum(remote_manifest[fpath][0] or 0 for fpath in downloaded + refetched)
+    finally:
+        conn.close()
+
+    report["elapsed_time"] = time.time() - t_i
+    if verbose:
+        _print_sync_report(report)
+    return report
+
+
+####--------------------------------------------------------------------------.
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Generate synthetic Himawari bucket trees for the tests and the benchmarks.
+
+The filepaths follow the AWS bucket layout
+<product_dir>/<YYYY>/<MM>/<DD>/<HHMM>/<fname> and the L1b and L2 (old and new)
+filename patterns of `himawari_api.listing.GLOB_FNAME_PATTERN`.
+The tree can be written on local disk (`make_local_tree`) or uploaded to a
+local S3 stand-in served by moto (`S3Server`).
+Synthetic Himawari Standard Data (HSD) segment files with the 11 header
+blocks of the HSD User's Guide can be written with `write_hsd_file`.
+
+A local tree can also be created from the command line:
+
+    python -m himawari_api.tests._synthetic <base_dir> --n_files 100000
+"""
+
+import datetime
+import os
+import urllib.request
+
+SATELLITE = "himawari-9"
+START_TIME = datetime.datetime(2023, 1, 1, 0, 0)
+
+AHI_CHANNELS = [f"B{i:02d}" for i in range(1, 17)]
+AHI_N_SEGMENTS = 10
+
+# Old (before 2021) names of the L2 products
+_L2_OLD_PRODUCTS = {
+    "CMSK": "CLOUD_MASK",
+    "CHGT": "CLOUD_HEIGHT",
+    "CPHS": "CLOUD_PHASE",
+    "RRQPE": "HYDRO_RAIN_RATE",
+}
+
+
+def _get_channel_resolution(channel):
+    """Return the R<resolution> code of the L1b filenames."""
+    if channel == "B03":
+        return "R05"
+    if channel in ["B01", "B02", "B04"]:
+        return "R10"
+    return "R20"
+
+
+def _get_satellite_codes(satellite):
+    """Return the (short name, full name) of a satellite, i.e. (H09, Himawari9)."""
+    number = satellite[-1]
+    return f"H0{number}", f"Himawari{number}"
+
+
+def get_l1b_fnames(start_time, channels=None, n_segments=AHI_N_SEGMENTS, satellite=SATELLITE):
+    """Return the L1b FLDK filenames of an acquisition."""
+    short_name, _ = _get_satellite_codes(satellite)
+    channels = AHI_CHANNELS if channels is None else channels
+    return [
+        (
+            f"HS_{short_name}_{start_time:%Y%m%d_%H%M}_{channel}_FLDK_"
+            f"{_get_channel_resolution(channel)}_S{segment:02d}{n_segments:02d}.DAT.bz2"
+        )
+        for channel in channels
+        for segment in range(1, n_segments + 1)
+    ]
+
+
+def get_l2_fname(product, start_time, pattern="new", satellite=SATELLITE):
+    """Return the L2 FLDK filename of an acquisition following the old or new pattern."""
+    short_name, full_name = _get_satellite_codes(satellite)
+    if pattern == "old":
+        old_product = _L2_OLD_PRODUCTS[product]
+        sector = "2KM_FLDK" if product == "RRQPE" else "FLDK"
+        return f"{full_name}_AHI_{sector}_{start_time:%Y%j_%H%M_%S}_{old_product}_EN.nc"
+    if pattern != "new":
+        raise ValueError("`pattern` must be 'old' or 'new'.")
+    end_time = start_time + datetime.timedelta(minutes=9, seconds=40)
+    production_time = start_time + datetime.timedelta(minutes=17)
+    times = "_".join(
+        [
+            f"s{start_time:%Y%m%d%H%M%S}0",
+            f"e{end_time:%Y%m%d%H%M%S}0",
+            f"c{production_time:%Y%m%d%H%M%S}0",
+        ]
+    )
+    version_platform = f"v1r1_{short_name.lower()}"
+    if product == "RRQPE":
+        return f"RRQPE-AHI-INST_{version_platform}_{times}.nc"
+    return f"AHI-{product}_{version_platform}_{times}.nc"
+
+
+def get_synthetic_fpaths(
+    n_files,
+    product_level="L1b",
+    product="Rad",
+    pattern="new",
+    start_time=START_TIME,
+    satellite=SATELLITE,
+):
+    """
+    Return `n_files` filepaths (relative to the bucket) of consecutive acquisitions.
+
+    The L1b FLDK acquisitions include 160 files (16 channels x 10 segments),
+    the L2 acquisitions a single file.
+    """
+    from himawari_api.io import _get_product_name
+
+    product_name = _get_product_name(product_level, product, "FLDK")
+    fpaths = []
+    timestep = start_time
+    while len(fpaths) < n_files:
+        if product_level == "L1b":
+            fnames = get_l1b_fnames(timestep, satellite=satellite)
+        else:
+            fnames = [get_l2_fname(product, timestep, pattern=pattern, satellite=satellite)]
+        time_dir = timestep.strftime("%Y/%m/%d/%H%M")
+        fpaths += [f"{product_name}/{time_dir}/{fname}" for fname in fnames]
+        timestep += datetime.timedelta(minutes=10)
+    return fpaths[:n_files]
+
+
+def get_time_period(fpaths):
+    """Return the (start_time, end_time) covered by synthetic filepaths."""
+    from himawari_api.info import _get_info_from_filepath
+
+    start_time = _get_info_from_filepath(fpaths[0])["start_time"]
+    end_time = _get_info_from_filepath(fpaths[-1])["start_time"]
+    return start_time, end_time + datetime.timedelta(minutes=10)
+
+
+def make_local_tree(base_dir, fpaths, file_size=0, satellite=SATELLITE):
+    """Write the synthetic files in <base_dir>/<HIMAWARI-**>/... and return base_dir."""
+    satellite_dir = os.path.join(base_dir, satellite.upper())
+    content = b"\0" * file_size
+    for fpath in fpaths:
+        local_fpath = os.path.join(satellite_dir, fpath)
+        os.makedirs(os.path.dirname(local_fpath), exist_ok=True)
+        with open(local_fpath, "wb") as f:
+            f.write(content)
+    return base_dir
+
+
+class S3Server:
+    """
+    Local S3 stand-in (moto server) serving a synthetic bucket.
+
+    The `fs_args` attribute must be passed to the himawari_api functions
+    together with `protocol="s3"`.
+    """
+
+    def __init__(self, fpaths, file_size=0, satellite=SATELLITE, port=0):
+        from moto.server import ThreadedMotoServer
+
+        self.server = ThreadedMotoServer(ip_address="127.0.0.1", port=port)
+        self.server.start()
+        host, port = self.server.get_host_and_port()
+        self.endpoint_url = f"http://{host}:{port}"
+        # The moto backend is shared by the servers of a process: start from an empty state
+        urllib.request.urlopen(urllib.request.Request(f"{self.endpoint_url}/moto-api/reset", method="POST"))
+        self.fs_args = {
+            "anon": False,
+            "key": "testing",
+            "secret": "testing",
+            "skip_instance_cache": True,
+            "client_kwargs": {"endpoint_url": self.endpoint_url, "region_name": "us-west-2"},
+        }
+        self.bucket = "noaa-{}".format(satellite.replace("-", ""))
+        fs = self.get_filesystem()
+        fs.mkdir(self.bucket)
+        content = b"\0" * file_size
+        fs.pipe({f"{self.bucket}/{fpath}": content for fpath in fpaths})
+
+    def get_filesystem(self):
+        """Return a s3fs filesystem connected to the server."""
+        import fsspec
+
+        return fsspec.filesystem("s3", **self.fs_args)
+
+    def stop(self):
+        """Stop the server."""
+        self.server.stop()
+
+
+####--------------------------------------------------------------------------.
+#### Synthetic HSD files
+
+_HSD_VIS_BANDS = [1, 2, 3, 4, 5, 6]
+
+# Central wavelength (um) of the AHI bands
+_HSD_CENTRAL_WAVELENGTHS = [
+    0.4703, 0.5105, 0.6399, 0.8563, 1.6098, 2.257, 3.8848, 6.2383,
+    6.9395, 7.3471, 8.5905, 9.6347, 10.4029, 11.2432, 12.3828, 13.2844,
+]
+
+# Nominal calibration coefficients of the synthetic files
+HSD_VIS_CALIBRATION = {
+    "gain_count2rad_conversion": 0.3,
+    "offset_count2rad_conversion": -6.0,
+    "coeff_rad2albedo_conversion": 0.0019,
+}
+HSD_IR_CALIBRATION = {
+    "gain_count2rad_conversion": -0.0019,
+    "offset_count2rad_conversion": 15.5,
+    "c0_rad2tb_conversion": -0.1096,
+    "c1_rad2tb_conversion": 1.0003,
+    "c2_rad2tb_conversion": -1.1e-6,
+    "speed_of_light": 2.99792458e8,
+    "planck_constant": 6.62606957e-34,
+    "boltzmann_constant": 1.3806488e-23,
+}
+HSD_COUNT_ERROR_PIXELS = 65535
+HSD_COUNT_OUTSIDE_SCAN_PIXELS = 65534
+
+
+def _to_mjd(time):
+    """Convert a datetime into a Modified Julian Date."""
+    return (time - datetime.datetime(1858, 11, 17)).total_seconds() / 86400
+
+
+def _get_hsd_record(fields, values, byte_order):
+    """Return the bytes of a HSD header block."""
+    import numpy as np
+
+    endian = ">" if byte_order == 1 else "<"
+    dtype = np.dtype(
+        [(name, fmt if fmt[0] == "S" else endian + fmt, *shape) for name, fmt, *shape in fields]
+    )
+    record = np.zeros(1, dtype=dtype)
+    for name, value in values.items():
+        record[name] = value
+    record["block_length"] = dtype.itemsize
+    return record.tobytes()
+
+
+def _get_hsd_header(shape, band, segment, n_segments, start_time, byte_order, count_outside_scan):
+    """Return the bytes of the 11 header blocks of a HSD segment file (without block #1)."""
+    n_lines, n_cols = shape
+    vis = band in _HSD_VIS_BANDS
+    blocks = []
+    # 2 Data information block
+    fields = [
+        ("hblock_number", "u1"), ("block_length", "u2"), ("number_of_bits_per_pixel", "u2"),
+        ("number_of_columns", "u2"), ("number_of_lines", "u2"), ("compression_flag", "u1"),
+        ("spare", "S40"),
+    ]
+    values = {"hblock_number": 2, "number_of_bits_per_pixel": 16, "number_of_columns": n_cols,
+              "number_of_lines": n_lines}
+    blocks.append(_get_hsd_record(fields, values, byte_order))
+    # 3 Projection information block
+    # - Scaled from the 2 km full disk grid
+    req, rpol = 6378.137, 6356.7523
+    fields = [
+        ("hblock_number", "u1"), ("block_length", "u2"), ("sub_lon", "f8"), ("CFAC", "u4"),
+        ("LFAC", "u4"), ("COFF", "f4"), ("LOFF", "f4"), ("distance_from_earth_center", "f8"),
+        ("earth_equatorial_radius", "f8"), ("earth_polar_radius", "f8"), ("req2_rpol2_req2", "f8"),
+        ("rpol2_req2", "f8"), ("req2_rpol2", "f8"), ("coeff_for_sd", "f8"), ("resampling_types", "i2"),
+        ("resampling_size", "i2"), ("spare", "S40"),
+    ]
+    values = {
+        "hblock_number": 3, "sub_lon": 140.7, "CFAC": round(20466275 * n_cols / 5500),
+        "LFAC": round(20466275 * n_cols / 5500), "COFF": n_cols / 2 + 0.5,
+        "LOFF": n_lines * n_segments / 2 + 0.5, "distance_from_earth_center": 42164.0,
+        "earth_equatorial_radius": req, "earth_polar_radius": rpol,
+        "req2_rpol2_req2": (req**2 - rpol**2) / req**2, "rpol2_req2": rpol**2 / req**2,
+        "req2_rpol2": req**2 / rpol**2, "coeff_for_sd": 42164.0**2 - req**2,
+    }
+    blocks.append(_get_hsd_record(fields, values, byte_order))
+    # 4 Navigation information block
+    fields = [
+        ("hblock_number", "u1"), ("block_length", "u2"), ("navigation_info_time", "f8"),
+        ("SSP_longitude", "f8"), ("SSP_latitude", "f8"), ("distance_earth_center_to_satellite", "f8"),
+        ("nadir_longitude", "f8"), ("nadir_latitude", "f8"), ("sun_position", "f8", (3,)),
+        ("moon_position", "f8", (3,)), ("spare", "S40"),
+    ]
+    values = {"hblock_number": 4, "navigation_info_time": _to_mjd(start_time), "SSP_longitude": 140.7,
+              "distance_earth_center_to_satellite": 42164.0, "nadir_longitude": 140.7}
+    blocks.append(_get_hsd_record(fields, values, byte_order))
+    # 5 Calibration information block
+    fields = [
+        ("hblock_number", "u1"), ("block_length", "u2"), ("band_number", "u2"),
+        ("central_wave_length", "f8"), ("valid_number_of_bits_per_pixel", "u2"),
+        ("count_value_error_pixels", "u2"), ("count_value_outside_scan_pixels", "u2"),
+        ("gain_count2rad_conversion", "f8"), ("offset_count2rad_conversion", "f8"),
+    ]
+    if vis:
+        fields += [
+            ("coeff_rad2albedo_conversion", "f8"), ("coeff_update_time", "f8"),
+            ("cali_gain_count2rad_conversion", "f8"), ("cali_offset_count2rad_conversion", "f8"),
+            ("spare", "S80"),
+        ]
+    else:
+        fields += [
+            ("c0_rad2tb_conversion", "f8"), ("c1_rad2tb_conversion", "f8"), ("c2_rad2tb_conversion", "f8"),
+            ("c0_tb2rad_conversion", "f8"), ("c1_tb2rad_conversion", "f8"), ("c2_tb2rad_conversion", "f8"),
+            ("speed_of_light", "f8"), ("planck_constant", "f8"), ("boltzmann_constant", "f8"),
+            ("spare", "S40"),
+        ]
+    values = {
+        "hblock_number": 5, "band_number": band, "central_wave_length": _HSD_CENTRAL_WAVELENGTHS[band - 1],
+        "valid_number_of_bits_per_pixel": 11 if vis else 14,
+        "count_value_error_pixels": HSD_COUNT_ERROR_PIXELS,
+        "count_value_outside_scan_pixels": count_outside_scan,
+    }
+    values.update(HSD_VIS_CALIBRATION if vis else HSD_IR_CALIBRATION)
+    blocks.append(_get_hsd_record(fields, values, byte_order))
+    # 6 Inter-calibration information block
+    fields = [
+        ("hblock_number", "u1"), ("block_length", "u2"), ("gsics_coefficients", "f8", (8,)),
+        ("gsics_radiance_validity_limits", "f4", (2,)), ("gsics_filename", "S128"), ("spare", "S56"),
+    ]
+    blocks.append(_get_hsd_record(fields, {"hblock_number": 6}, byte_order))
+    # 7 Segment information block
+    fields = [
+        ("hblock_number", "u1"), ("block_length", "u2"), ("total_number_of_segments", "u1"),
+        ("segment_sequence_number", "u1"), ("first_line_number_of_image_segment", "u2"), ("spare", "S40"),
+    ]
+    values = {"hblock_number": 7, "total_number_of_segments": n_segments, "segment_sequence_number": segment,
+              "first_line_number_of_image_segment": (segment - 1) * n_lines + 1}
+    blocks.append(_get_hsd_record(fields, values, byte_order))
+    # 8 Navigation correction information block (without corrections)
+    fields = [
+        ("hblock_number", "u1"), ("block_length", "u2"), ("center_column_of_rotation", "f4"),
+        ("center_line_of_rotation", "f4"), ("amount_of_rotational_correction", "f8"),
+        ("numof_correction_info_data", "u2"), ("spare", "S40"),
+    ]
+    blocks.append(_get_hsd_record(fields, {"hblock_number": 8}, byte_order))
+    # 9 Observation time information block (first and last lines)
+    fields = [
+        ("hblock_number", "u1"), ("block_length", "u2"), ("number_of_observation_times", "u2"),
+        ("line_number_1", "u2"), ("observation_time_1", "f8"), ("line_number_2", "u2"),
+        ("observation_time_2", "f8"), ("spare", "S40"),
+    ]
+    values = {
+        "hblock_number": 9, "number_of_observation_times": 2, "line_number_1": 1,
+        "observation_time_1": _to_mjd(start_time), "line_number_2": n_lines,
+        "observation_time_2": _to_mjd(start_time + datetime.timedelta(minutes=1)),
+    }
+    blocks.append(_get_hsd_record(fields, values, byte_order))
+    # 10 Error information block (without errors)
+    fields = [
+        ("hblock_number", "u1"), ("block_length", "u4"), ("number_of_error_info_data", "u2"), ("spare", "S40"),
+    ]
+    blocks.append(_get_hsd_record(fields, {"hblock_number": 10}, byte_order))
+    # 11 Spare block
+    fields = [("hblock_number", "u1"), ("block_length", "u2"), ("spare", "S256")]
+    blocks.append(_get_hsd_record(fields, {"hblock_number": 11}, byte_order))
+    return blocks
+
+
+def write_hsd_file(
+    dir_path,
+    counts,
+    band,
+    segment=1,
+    n_segments=1,
+    start_time=START_TIME,
+    byte_order=0,
+    compress=False,
+    count_outside_scan=HSD_COUNT_OUTSIDE_SCAN_PIXELS,
+    satellite=SATELLITE,
+):
+    """
+    Write a synthetic FLDK HSD segment file and return its filepath.
+
+    The projection parameters are scaled from the 2 km full disk grid,
+    so that segments of 550 lines and 5500 columns follow the 2 km AHI grid.
+
+    Parameters
+    ----------
+    dir_path : str
+        Directory where the file is written.
+    counts : numpy.ndarray
+        2D uint16 array of the segment counts.
+    band : int
+        AHI band number (1 to 16).
+    segment : int, optional
+        Segment number (1-based). The default is 1.
+    n_segments : int, optional
+        Total number of segments. The default is 1.
+    start_time : datetime.datetime, optional
+        Observation start time.
+    byte_order : int, optional
+        0 for little endian (the default), 1 for big endian.
+    compress : bool, optional
+        If True, write a bz2 compressed .DAT.bz2 file. The default is False.
+    count_outside_scan : int, optional
+        Count value of the pixels outside the scan area. The default is 65534.
+    """
+    import bz2
+
+    import numpy as np
+
+    short_name, full_name = _get_satellite_codes(satellite)
+    n_lines, n_cols = counts.shape
+    resolution_code = {22000: "R05", 11000: "R10"}.get(n_cols, "R20")
+    fname = (
+        f"HS_{short_name}_{start_time:%Y%m%d_%H%M}_B{band:02d}_FLDK_"
+        f"{resolution_code}_S{segment:02d}{n_segments:02d}.DAT"
+    )
+    blocks = _get_hsd_header(
+        counts.shape, band, segment, n_segments, start_time, byte_order, count_outside_scan
+    )
+    endian = ">" if byte_order == 1 else "<"
+    data = np.ascontiguousarray(counts, dtype=endian + "u2").tobytes()
+    # 1 Basic information block
+    fields = [
+        ("hblock_number", "u1"), ("block_length", "u2"), ("total_number_of_header_blocks", "u2"),
+        ("byte_order", "u1"), ("satellite", "S16"), ("processing_center_name", "S16"),
+        ("observation_area", "S4"), ("other_observation_information", "S2"), ("observation_timeline", "u2"),
+        ("observation_start_time", "f8"), ("observation_end_time", "f8"), ("file_creation_time", "f8"),
+        ("total_header_length", "u4"), ("total_data_length", "u4"), ("quality_flags", "u1", (4,)),
+        ("file_format_version", "S32"), ("file_name", "S128"), ("spare", "S40"),
+    ]
+    values = {
+        "hblock_number": 1, "total_number_of_header_blocks": 11, "byte_order": byte_order,
+        "satellite": full_name.replace("Himawari", "Himawari-").encode(), "processing_center_name": b"MSC",
+        "observation_area": b"FLDK", "observation_timeline": int(f"{start_time:%H%M}"),
+        "observation_start_time": _to_mjd(start_time),
+        "observation_end_time": _to_mjd(start_time + datetime.timedelta(minutes=10)),
+        "file_creation_time": _to_mjd(start_time + datetime.timedelta(minutes=15)),
+        "total_header_length": 282 + sum(len(block) for block in blocks), "total_data_length": len(data),
+        "file_format_version": b"1.3", "file_name": fname.encode(),
+    }
+    content = _get_hsd_record(fields, values, byte_order) + b"".join(blocks) + data
+    fpath = os.path.join(dir_path, fname)
+    if compress:
+        fpath += ".bz2"
+        content = bz2.compress(content)
+    with open(fpath, "wb") as f:
+        f.write(content)
+    return fpath
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Create a synthetic Himawari tree on local disk.")
+    parser.add_argument("base_dir")
+    parser.add_argument("--n_files", type=int, default=10_000)
+    parser.add_argument("--product_level", default="L1b")
+    parser.add_argument("--product", default="Rad")
+    parser.add_argument("--pattern", default="new", choices=["old", "new"])
+    parser.add_argument("--file_size", type=int, default=0)
+    args = parser.parse_args()
+    fpaths = get_synthetic_fpaths(
+        args.n_files, product_level=args.product_level, product=args.product, pattern=args.pattern
+    )
+    make_local_tree(args.base_dir, fpaths, file_size=args.file_size)
+    print(f"{len(fpaths)} files created between {get_time_period(fpaths)}.")
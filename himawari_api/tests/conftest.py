@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Fixtures of the himawari_api tests."""
+
+import pytest
+
+
+@pytest.fixture
+def s3_server():
+    """Return a factory of local S3 servers (moto) serving synthetic bucket files."""
+    pytest.importorskip("moto")
+    from himawari_api.tests._synthetic import S3Server
+
+    servers = []
+
+    def _create(fpaths, file_size=10):
+        server = S3Server(fpaths, file_size=file_size)
+        servers.append(server)
+        return server
+
+    yield _create
+    for server in servers:
+        server.stop()
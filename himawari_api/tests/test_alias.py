@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Test the himawari_api alias lookup tables."""
+
+import pytest
+
+from himawari_api.alias import _build_lookup_table, _channels, _channels_lookup, _products_lookup
+from himawari_api.checks import _check_channel, _check_product, _check_satellite, _check_sector
+
+
+def test_build_lookup_table():
+    """The keys and the normalized aliases map to their key."""
+    lookup_table = _build_lookup_table({"B01": ["c01", " 1 "], "B02": ["C02"]})
+    assert lookup_table == {"B01": "B01", "C01": "B01", "1": "B01", "B02": "B02", "C02": "B02"}
+
+
+def test_build_lookup_table_duplicate_alias():
+    """An alias shared by multiple keys raises at build time."""
+    with pytest.raises(ValueError, match="'B16' is assigned to both"):
+        _build_lookup_table({"B15": ["B16", "C15"], "B16": ["C16"]})
+    # An alias repeated within the same key is allowed
+    assert _build_lookup_table({"B10": ["10", "10"]}) == {"B10": "B10", "10": "B10"}
+
+
+@pytest.mark.parametrize("satellite", ["H09", "h9", "Himawari-9", " HIMAWARI9 "])
+def test_check_satellite_alias(satellite):
+    """The satellite aliases resolve to the satellite name."""
+    assert _check_satellite(satellite) == "himawari-9"
+
+
+def test_check_sector_alias():
+    """The sector aliases resolve to the sector name."""
+    assert _check_sector("full disk") == "FLDK"
+    assert _check_sector("J") == "Japan"
+
+
+def test_channels_lookup():
+    """Each channel resolves to itself and the aliases resolve to the right channel."""
+    assert all(_channels_lookup[channel] == channel for channel in _channels)
+    assert _channels_lookup["B16"] == "B16"
+    assert _channels_lookup["C15"] == "B15"
+    assert _channels_lookup["10"] == "B10"
+    assert _channels_lookup["10.4"] == "B13"
+
+
+@pytest.mark.parametrize(
+    "alias, channel",
+    [("GREEN", "B02"), ("g", "B02"), ("0.51", "B02"), ("RED", "B03"), ("r", "B03"), ("0.64", "B03")],
+)
+def test_check_channel_visible_bands(alias, channel):
+    """GREEN is the 0.51 um band B02 and RED the 0.64 um band B03."""
+    assert _check_channel(alias) == channel
+
+
+def test_check_channel_invalid():
+    """Invalid channels raise."""
+    with pytest.raises(ValueError):
+        _check_channel("B17")
+    with pytest.raises(TypeError):
+        _check_channel(13)
+
+
+def test_products_lookup():
+    """The products resolve to (product, product_level) irrespective of the case."""
+    assert _products_lookup["CMSK"] == ("CMSK", "L2")
+    assert _products_lookup["RAD"] == ("Rad", "L1b")
+    assert _check_product("cmsk") == "CMSK"
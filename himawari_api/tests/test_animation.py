@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Test the himawari_api animation functions."""
+
+import datetime
+
+import numpy as np
+import pytest
+
+import himawari_api.lut
+from himawari_api.animation import render_timesteps
+from himawari_api.lut import get_lut
+from himawari_api.tests._synthetic import write_hsd_file
+
+START_TIME = datetime.datetime(2023, 1, 1, 2, 10)
+LL_BBOX = [130, 30, 145, 45]
+
+
+@pytest.fixture
+def fldk_fpaths(tmp_path):
+    """Write the 10 segments of a 2 km B13 full disk."""
+    counts = np.full((550, 5500), 3000, dtype=np.uint16) + np.arange(5500, dtype=np.uint16)
+    return [
+        write_hsd_file(str(tmp_path), counts, 13, segment=segment, n_segments=10, start_time=START_TIME)
+        for segment in range(1, 11)
+    ]
+
+
+def test_render_timesteps_reuses_crop_lut(fldk_fpaths, tmp_path, monkeypatch):
+    """The crop window is retrieved once from the crop lookup tables and reused for all frames."""
+    satpy = pytest.importorskip("satpy")
+
+    n_calls = {"get_lut": 0}
+    crop_kwargs = []
+
+    def _get_lut(*args, **kwargs):
+        n_calls["get_lut"] += 1
+        return get_lut(*args, **kwargs)
+
+    def _crop(self, **kwargs):
+        crop_kwargs.append(kwargs)
+        return crop(self, **kwargs)
+
+    crop = satpy.Scene.crop
+    monkeypatch.setattr(himawari_api.lut, "get_lut", _get_lut)
+    monkeypatch.setattr(satpy.Scene, "crop", _crop)
+    cache_dir = str(tmp_path / "cache")
+    fpaths_dict = {START_TIME: fldk_fpaths, START_TIME + datetime.timedelta(minutes=10): fldk_fpaths}
+    frames = list(render_timesteps(fpaths_dict, "B13", ll_bbox=LL_BBOX, n_workers=0, cache_dir=cache_dir))
+
+    # The lookup tables of the 3 AHI resolutions are retrieved once
+    assert n_calls["get_lut"] == 3
+    assert len(crop_kwargs) == 2
+    assert all("ll_bbox" not in kwargs for kwargs in crop_kwargs)
+    # The frames cover the crop window of the lookup table
+    line_start, line_stop, col_start, col_stop = get_lut(2, ll_bbox=LL_BBOX, cache_dir=cache_dir)["slices"]
+    for _, frame in frames:
+        assert frame.shape == (line_stop - line_start, col_stop - col_start, 1)
+        assert frame.dtype == np.uint8
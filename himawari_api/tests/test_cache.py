@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Test the himawari_api cache functions."""
+
+import os
+import time
+
+import pytest
+
+from himawari_api.cache import CachedFileSystem, LocalCache
+from himawari_api.tests._synthetic import get_synthetic_fpaths, make_local_tree
+
+FILE_SIZE = 1000
+
+
+@pytest.fixture
+def bucket(s3_server):
+    """Return the S3 server and the bucket filepaths of 3 files with distinct contents."""
+    fpaths = get_synthetic_fpaths(3, product_level="L2", product="CMSK")
+    server = s3_server([])
+    bucket_fpaths = [f"s3://{server.bucket}/{fpath}" for fpath in fpaths]
+    server.get_filesystem().pipe(
+        {fpath: bytes([i + 1]) * FILE_SIZE for i, fpath in enumerate(bucket_fpaths)}
+    )
+    return server, bucket_fpaths
+
+
+def _read(fs, fpath):
+    with fs.open(fpath) as f:
+        return f.read()
+
+
+def _list_cached_files(cache_dir):
+    """Return the cached files (without the fsspec metadata and the cache index)."""
+    return [fname for fname in os.listdir(cache_dir) if fname != "cache" and not fname.startswith(".")]
+
+
+@pytest.mark.parametrize("cache", ["blocks", "whole"])
+def test_cached_filesystem_read_after_eviction(bucket, tmp_path, cache):
+    """The files evicted to enforce the size limit are downloaded again when read."""
+    server, bucket_fpaths = bucket
+    fs = CachedFileSystem(cache=cache, cache_dir=str(tmp_path), max_bytes=2 * FILE_SIZE, fs_args=server.fs_args)
+    for i, fpath in enumerate(bucket_fpaths):
+        assert _read(fs, fpath) == bytes([i + 1]) * FILE_SIZE
+    stats = fs.stats()
+    assert stats["cached_files"] == 2
+    assert stats["cached_bytes"] == 2 * FILE_SIZE
+    assert stats["misses"] == 3
+    assert len(_list_cached_files(str(tmp_path))) == 2
+
+    # The first file has been evicted
+    assert _read(fs, bucket_fpaths[0]) == b"\1" * FILE_SIZE
+    assert fs.stats()["misses"] == 4
+    # The last file is still cached
+    assert _read(fs, bucket_fpaths[2]) == b"\3" * FILE_SIZE
+    assert fs.stats()["hits"] == 1
+
+    # A new session sharing the cache directory sees the same cached files
+    fs.close()
+    fs = CachedFileSystem(cache=cache, cache_dir=str(tmp_path), max_bytes=2 * FILE_SIZE, fs_args=server.fs_args)
+    assert _read(fs, bucket_fpaths[0]) == b"\1" * FILE_SIZE
+    assert _read(fs, bucket_fpaths[1]) == b"\2" * FILE_SIZE
+    assert fs.stats()["hits"] == 1
+    assert fs.stats()["misses"] == 1
+    fs.close()
+
+
+def test_cached_filesystem_open_files_not_evicted(bucket, tmp_path):
+    """The open files of the block cache are not evicted."""
+    server, bucket_fpaths = bucket
+    fs = CachedFileSystem(cache="blocks", cache_dir=str(tmp_path), max_bytes=FILE_SIZE, fs_args=server.fs_args)
+    f = fs.open(bucket_fpaths[0])
+    assert _read(fs, bucket_fpaths[1]) == b"\2" * FILE_SIZE
+    assert f.read() == b"\1" * FILE_SIZE
+    f.close()
+    assert fs.stats()["cached_files"] == 2
+    assert _read(fs, bucket_fpaths[2]) == b"\3" * FILE_SIZE
+    assert fs.stats()["cached_files"] == 1
+    fs.close()
+
+
+def test_cached_filesystem_local_fpaths(bucket, tmp_path):
+    """The local paths of the whole cache are not evicted by the call returning them."""
+    server, bucket_fpaths = bucket
+    fs = CachedFileSystem(cache="whole", cache_dir=str(tmp_path), max_bytes=FILE_SIZE, fs_args=server.fs_args)
+    local_fpaths = fs.get_local_fpaths(bucket_fpaths[:2])
+    assert all(os.path.exists(fpath) for fpath in local_fpaths)
+    fs.clear()
+    assert fs.stats()["cached_files"] == 0
+    assert _read(fs, bucket_fpaths[0]) == b"\1" * FILE_SIZE
+    fs.close()
+
+
+def test_local_cache_scan_skips_manifests(tmp_path):
+    """The manifests, checkpoints and partial files of base_dir are neither indexed nor evicted."""
+    base_dir = str(tmp_path)
+    fpaths = get_synthetic_fpaths(2, product_level="L2", product="CMSK")
+    make_local_tree(base_dir, fpaths, file_size=10)
+    not_cached_fpaths = [
+        os.path.join(base_dir, ".himawari_api_download.sqlite"),
+        os.path.join(base_dir, ".himawari_api_sync.sqlite"),
+        os.path.join(base_dir, ".himawari_api_jobs", "job", "shard.json"),
+        os.path.join(base_dir, "HIMAWARI-9", fpaths[0].rsplit("/", 1)[0], ".download", "file.lock"),
+    ]
+    for fpath in not_cached_fpaths:
+        os.makedirs(os.path.dirname(fpath), exist_ok=True)
+        with open(fpath, "wb") as f:
+            f.write(b"\0" * 10)
+
+    with LocalCache(base_dir) as cache:
+        assert cache.scan() == 2
+        evicted = cache.evict(max_bytes=0)
+    assert len(evicted) == 2
+    assert all(os.path.exists(fpath) for fpath in not_cached_fpaths)
+
+
+def _make_cached_files(base_dir, n_files, file_size=10):
+    """Write L2 files in base_dir and return their local filepaths."""
+    fpaths = get_synthetic_fpaths(n_files, product_level="L2", product="CMSK")
+    make_local_tree(base_dir, fpaths, file_size=file_size)
+    return [os.path.join(base_dir, "HIMAWARI-9", fpath) for fpath in fpaths]
+
+
+@pytest.mark.parametrize("policy", ["lru", "age"])
+def test_local_cache_eviction_order(tmp_path, policy):
+    """LRU evicts the least recently accessed files, age the files cached first."""
+    local_fpaths = _make_cached_files(str(tmp_path), 3)
+    with LocalCache(str(tmp_path), policy=policy) as cache:
+        for i, fpath in enumerate(local_fpaths):
+            cache._register([fpath], access_time=i)
+        # Access the first file again
+        cache._register([local_fpaths[0]], access_time=10)
+        evicted = cache.evict(max_bytes=20)
+        expected_fpath = local_fpaths[1] if policy == "lru" else local_fpaths[0]
+        assert evicted == [expected_fpath]
+        assert not os.path.exists(expected_fpath)
+        assert len(cache) == 2
+        assert cache.usage() == 20
+
+
+def test_local_cache_quota_and_age_limit(tmp_path):
+    """The files older than max_age are evicted, then the oldest files until the quota is satisfied."""
+    local_fpaths = _make_cached_files(str(tmp_path), 4)
+    now = time.time()
+    with LocalCache(str(tmp_path), max_bytes=10, max_age=100) as cache:
+        cache._register(local_fpaths[:1], access_time=now - 1000)
+        cache._register(local_fpaths[1:], access_time=now)
+        assert cache.usage() == 40
+        evicted = cache.evict()
+        assert evicted == local_fpaths[:3]
+        assert cache.usage() == 10
+        assert [os.path.exists(fpath) for fpath in local_fpaths] == [False, False, False, True]
+
+
+def test_local_cache_pinned_files_not_evicted(tmp_path):
+    """The pinned files survive the eviction until each pin is released."""
+    local_fpaths = _make_cached_files(str(tmp_path), 2)
+    with LocalCache(str(tmp_path)) as cache:
+        cache._register(local_fpaths)
+        # The first file is pinned twice (i.e. by two threads)
+        cache.pin(local_fpaths[:1])
+        with cache.pinned(local_fpaths[:1]):
+            assert cache.evict(max_bytes=0) == local_fpaths[1:]
+        assert cache.evict(max_bytes=0) == []
+        cache.unpin(local_fpaths[:1])
+        assert cache.evict(max_bytes=0) == local_fpaths[:1]
+
+
+def test_local_cache_ensure_local(s3_server, tmp_path, monkeypatch):
+    """Only the files missing on local storage are downloaded."""
+    import himawari_api.download
+
+    fpaths = get_synthetic_fpaths(3, product_level="L2", product="CMSK")
+    server = s3_server(fpaths, file_size=10)
+    bucket_fpaths = [f"s3://{server.bucket}/{fpath}" for fpath in fpaths]
+    make_local_tree(str(tmp_path), fpaths[:1], file_size=10)
+
+    downloaded = []
+    fs_get_parallel = himawari_api.download._fs_get_parallel
+
+    def _fs_get_parallel(bucket_fpaths, **kwargs):
+        downloaded.extend(bucket_fpaths)
+        return fs_get_parallel(bucket_fpaths=bucket_fpaths, **kwargs)
+
+    monkeypatch.setattr(himawari_api.download, "_fs_get_parallel", _fs_get_parallel)
+    with LocalCache(str(tmp_path), max_bytes=20, fs_args=server.fs_args) as cache:
+        local_fpaths = cache.ensure_local(bucket_fpaths[1:])
+        assert [os.path.getsize(fpath) for fpath in local_fpaths] == [10, 10]
+        assert downloaded == bucket_fpaths[1:]
+        downloaded.clear()
+        local_fpaths = cache.ensure_local(bucket_fpaths)
+        assert downloaded == []
+        assert local_fpaths == cache.get_local_fpaths(bucket_fpaths)
+        # The returned files are pinned while the quota is enforced
+        assert all(os.path.exists(fpath) for fpath in local_fpaths)
+        assert cache.usage() == 30
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Test the himawari-api command-line interface."""
+
+import datetime
+import json
+import os
+
+import pytest
+
+from himawari_api.cli import _get_filter_parameters, _get_search_protocol, _get_watch_kwargs, get_parser, main
+from himawari_api.download import DownloadReport
+from himawari_api.tests._synthetic import get_synthetic_fpaths, get_time_period
+
+PRODUCT_ARGS = ["--satellite", "himawari-9", "--product-level", "L2", "--product", "CMSK", "--sector", "FLDK"]
+TIME_ARGS = ["--start-time", "2023-01-01 00:00:00", "--end-time", "2023-01-01 01:00:00"]
+
+
+def _get_time_args(fpaths):
+    start_time, end_time = get_time_period(fpaths)
+    return ["--start-time", str(start_time), "--end-time", str(end_time)]
+
+
+def test_parse_catalog(capsys):
+    """The catalog command prints the available items."""
+    args = get_parser().parse_args(["catalog", "satellites"])
+    assert args.item == "satellites"
+    assert main(["catalog", "satellites"]) == 0
+    assert "himawari-9" in json.loads(capsys.readouterr().out)
+    with pytest.raises(SystemExit):
+        get_parser().parse_args(["catalog", "unknown"])
+
+
+def test_parse_find():
+    """The find arguments are parsed into the search arguments."""
+    args = get_parser().parse_args(
+        ["find", *PRODUCT_ARGS, *TIME_ARGS, "--channels", "B01", "B13", "--resolution", '{"B03": 1}',
+         "--fs-args", '{"anon": true}', "--group-by-key", "start_time"]
+    )
+    assert args.start_time == datetime.datetime(2023, 1, 1)
+    assert args.end_time == datetime.datetime(2023, 1, 1, 1)
+    assert args.fs_args == {"anon": True}
+    assert args.group_by_key == "start_time"
+    assert _get_filter_parameters(args) == {"channels": ["B01", "B13"], "resolution": {"B03": 1}}
+    assert _get_search_protocol(args) == "s3"
+    assert get_parser().parse_args(["find", *PRODUCT_ARGS, *TIME_ARGS, "--resolution", "1"]).resolution == 1.0
+
+    args = get_parser().parse_args(["find", *PRODUCT_ARGS, *TIME_ARGS, "--base-dir", "/data"])
+    assert _get_search_protocol(args) is None
+    assert _get_filter_parameters(args) == {}
+
+
+def test_parse_find_invalid_time():
+    """Invalid times and missing product arguments exit the parser."""
+    with pytest.raises(SystemExit):
+        get_parser().parse_args(["find", *PRODUCT_ARGS, "--start-time", "yesterday", "--end-time", "today"])
+    with pytest.raises(SystemExit):
+        get_parser().parse_args(["find", *TIME_ARGS])
+
+
+def test_parse_download():
+    """The download options are parsed."""
+    args = get_parser().parse_args(
+        ["download", "--base-dir", "/data", *PRODUCT_ARGS, *TIME_ARGS, "--n-workers", "4", "--n-threads", "8",
+         "--job-dir", "/jobs", "--manifest", "/data/job.sqlite", "--report", "report.json", "--force", "--quiet"]
+    )
+    assert args.n_workers == 4
+    assert args.n_threads == 8
+    assert args.job_dir == "/jobs"
+    assert args.manifest == "/data/job.sqlite"
+    assert args.report == "report.json"
+    assert args.force and args.quiet and not args.no_integrity_check
+    assert args.retry is None
+
+    # The product and time arguments are not required with --retry
+    args = get_parser().parse_args(["download", "--retry", "report.json"])
+    assert args.retry == "report.json"
+    assert args.satellite is None and args.start_time is None
+    assert args.n_workers is None
+
+
+def test_download_missing_arguments(capsys):
+    """The download command requires the product arguments without --retry."""
+    with pytest.raises(SystemExit) as excinfo:
+        main(["download", "--base-dir", "/data", *TIME_ARGS])
+    assert excinfo.value.code == 2
+    assert "--satellite" in capsys.readouterr().err
+
+
+def test_parse_sync():
+    """The sync options are parsed."""
+    args = get_parser().parse_args(
+        ["sync", "--base-dir", "/data", *PRODUCT_ARGS, *TIME_ARGS, "--delete", "--force-delete", "--dry-run"]
+    )
+    assert args.base_dir == "/data"
+    assert args.delete and args.force_delete and args.dry_run
+    assert args.n_threads == 20
+    with pytest.raises(SystemExit):
+        get_parser().parse_args(["sync", *PRODUCT_ARGS, *TIME_ARGS])
+
+
+def test_parse_watch():
+    """The watch polling options are parsed."""
+    args = get_parser().parse_args(
+        ["watch", *PRODUCT_ARGS, "--lookback", "60", "--poll-interval", "30", "--max-polls", "2"]
+    )
+    assert args.max_polls == 2
+    assert not args.adaptive
+    assert _get_watch_kwargs(args) == {
+        "lookback": datetime.timedelta(minutes=60),
+        "poll_interval": datetime.timedelta(seconds=30),
+    }
+    args = get_parser().parse_args(["watch", *PRODUCT_ARGS])
+    assert _get_watch_kwargs(args) == {"lookback": datetime.timedelta(minutes=30)}
+
+
+def test_parse_ingest():
+    """The ingest options are parsed."""
+    args = get_parser().parse_args(
+        ["ingest", "--base-dir", "/data", *PRODUCT_ARGS, "--channels", "B13", "--adaptive", "--n-threads", "4"]
+    )
+    assert args.adaptive
+    assert args.n_threads == 4
+    assert _get_filter_parameters(args) == {"channels": ["B13"]}
+    assert args.func.__name__ == "_run_ingest"
+    with pytest.raises(SystemExit):
+        get_parser().parse_args(["ingest", *PRODUCT_ARGS])
+
+
+def test_find_and_download(s3_server, tmp_path, capsys):
+    """The find and download commands search and download the bucket files."""
+    fpaths = get_synthetic_fpaths(3, product_level="L2", product="CMSK")
+    server = s3_server(fpaths, file_size=10)
+    storage_args = ["--protocol", "s3", "--fs-args", json.dumps(server.fs_args)]
+    capsys.readouterr()
+
+    assert main(["find", *PRODUCT_ARGS, *_get_time_args(fpaths), *storage_args]) == 0
+    found = capsys.readouterr().out.split()
+    assert found == [f"s3://{server.bucket}/{fpath}" for fpath in fpaths]
+
+    base_dir = str(tmp_path / "data")
+    os.makedirs(base_dir)
+    report_fpath = str(tmp_path / "report.json")
+    argv = ["download", "--base-dir", base_dir, *PRODUCT_ARGS, *_get_time_args(fpaths), *storage_args,
+            "--report", report_fpath, "--quiet"]
+    assert main(argv) == 0
+    summary = json.loads(capsys.readouterr().out)
+    assert summary["downloaded"] == summary["n_files"] == 3
+    report = DownloadReport.from_json(report_fpath)
+    assert report.counts["downloaded"] == 3
+    assert all(os.path.getsize(fpath) == 10 for fpath in report.get_fpaths(status="downloaded"))
+
+    # Nothing to retry
+    assert main(["download", "--retry", report_fpath, "--fs-args", json.dumps(server.fs_args), "--quiet"]) == 0
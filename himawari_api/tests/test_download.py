@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Test the himawari_api download functions."""
+
+import datetime
+import multiprocessing
+import os
+import time
+
+import pytest
+from fsspec.implementations.local import LocalFileSystem
+
+import himawari_api.download
+from himawari_api.download import _fs_get_file, download_files
+from himawari_api.tests._synthetic import get_synthetic_fpaths, get_time_period
+
+
+class _SlowFileSystem(LocalFileSystem):
+    """Local filesystem whose transfers signal their start and last `delay` seconds."""
+
+    delay = 1.0
+
+    def get(self, rpath, lpath, **kwargs):
+        self.started.set()
+        time.sleep(self.delay)
+        return super().get(rpath, lpath, **kwargs)
+
+
+def _download(src_fpath, dst_fpath, started, queue):
+    """Download `src_fpath` with `_fs_get_file` and put the outcome in `queue`."""
+    fs = _SlowFileSystem(skip_instance_cache=True)
+    fs.started = started
+    t_i = time.monotonic()
+    downloaded = _fs_get_file(fs, src_fpath, dst_fpath)
+    queue.put((downloaded, time.monotonic() - t_i))
+
+
+def test_fs_get_file_concurrent_processes(tmp_path):
+    """A process waits on the lock of a file downloaded by another process."""
+    src_fpath = str(tmp_path / "bucket" / "file.bz2")
+    dst_fpath = str(tmp_path / "local" / "2023" / "file.bz2")
+    os.makedirs(os.path.dirname(src_fpath))
+    os.makedirs(os.path.dirname(dst_fpath))
+    with open(src_fpath, "wb") as f:
+        f.write(b"\1" * 1000)
+
+    ctx = multiprocessing.get_context("spawn")
+    queue = ctx.Queue()
+    started_1 = ctx.Event()
+    started_2 = ctx.Event()
+    process_1 = ctx.Process(target=_download, args=(src_fpath, dst_fpath, started_1, queue))
+    process_2 = ctx.Process(target=_download, args=(src_fpath, dst_fpath, started_2, queue))
+    process_1.start()
+    assert started_1.wait(timeout=60)
+    # The second process waits for the download of the first process
+    process_2.start()
+    process_1.join(timeout=60)
+    process_2.join(timeout=60)
+    results = sorted(queue.get(timeout=10) for _ in range(2))
+    assert [downloaded for downloaded, _ in results] == [False, True]
+    assert not started_2.is_set()
+
+    with open(dst_fpath, "rb") as f:
+        assert f.read() == b"\1" * 1000
+    # No lock or partial files are left
+    assert os.listdir(os.path.dirname(dst_fpath)) == ["file.bz2"]
+
+
+def test_fs_get_file_removes_lock_files(tmp_path):
+    """The lock file and the partial files directory are removed after the download."""
+    src_fpath = str(tmp_path / "file.bz2")
+    dst_fpath = str(tmp_path / "local" / "file.bz2")
+    os.makedirs(os.path.dirname(dst_fpath))
+    with open(src_fpath, "wb") as f:
+        f.write(b"\1" * 10)
+    fs = LocalFileSystem()
+    assert _fs_get_file(fs, src_fpath, dst_fpath)
+    assert not _fs_get_file(fs, src_fpath, dst_fpath)
+    assert os.listdir(os.path.dirname(dst_fpath)) == ["file.bz2"]
+
+
+def _download_files(server, base_dir, start_time, end_time, **kwargs):
+    os.makedirs(base_dir, exist_ok=True)
+    kwargs = {"satellite": "himawari-9", "product_level": "L2", "product": "CMSK", "sector": "FLDK", **kwargs}
+    return download_files(
+        base_dir=str(base_dir),
+        protocol="s3",
+        start_time=start_time,
+        end_time=end_time,
+        fs_args=server.fs_args,
+        progress_bar=False,
+        verbose=False,
+        **kwargs,
+    )
+
+
+def test_download_files_across_midnight(s3_server, tmp_path):
+    """The midnight file shared by consecutive daily blocks is downloaded and reported once."""
+    start_time = datetime.datetime(2023, 1, 1, 23, 30)
+    fpaths = get_synthetic_fpaths(6, product_level="L2", product="CMSK", start_time=start_time)
+    server = s3_server(fpaths)
+    # The daily blocks [..., 2023-01-02 00:00] and [2023-01-02 00:00, ...] share the midnight file
+    start_time, end_time = get_time_period(fpaths)
+    start_time = start_time - datetime.timedelta(days=1)
+
+    report = _download_files(server, tmp_path / "report", start_time, end_time, return_report=True)
+    assert len(report) == 6
+    assert report.counts["downloaded"] == 6
+    assert report.counts["skipped_existing"] == 0
+
+    local_fpaths = _download_files(server, tmp_path / "list", start_time, end_time)
+    assert len(local_fpaths) == len(set(local_fpaths)) == 6
+
+
+def test_download_files_resume_with_product_aliases(s3_server, tmp_path, monkeypatch):
+    """A download interrupted and resumed with product aliases does not list the completed blocks again."""
+    # 3 daily blocks of 2 files
+    start_time = datetime.datetime(2023, 1, 1)
+    fpaths = []
+    for day in range(3):
+        fpaths += get_synthetic_fpaths(
+            2, product_level="L2", product="CMSK", start_time=start_time + datetime.timedelta(days=day)
+        )
+    server = s3_server(fpaths)
+    end_time = start_time + datetime.timedelta(days=3, minutes=-1)
+
+    # Interrupt the download of the second block
+    fs_get_parallel = himawari_api.download._fs_get_parallel
+    n_calls = {"fs_get_parallel": 0}
+
+    def _interrupted_fs_get_parallel(*args, **kwargs):
+        n_calls["fs_get_parallel"] += 1
+        if n_calls["fs_get_parallel"] == 2:
+            raise KeyboardInterrupt
+        return fs_get_parallel(*args, **kwargs)
+
+    monkeypatch.setattr(himawari_api.download, "_fs_get_parallel", _interrupted_fs_get_parallel)
+    with pytest.raises(KeyboardInterrupt):
+        _download_files(server, tmp_path, start_time, end_time, manifest=True)
+    monkeypatch.setattr(himawari_api.download, "_fs_get_parallel", fs_get_parallel)
+
+    # Resume the download with aliases of the product
+    listed_blocks = []
+    find_files = himawari_api.download.find_files
+
+    def _find_files(**kwargs):
+        listed_blocks.append(kwargs["start_time"])
+        return find_files(**kwargs)
+
+    monkeypatch.setattr(himawari_api.download, "find_files", _find_files)
+    report = _download_files(
+        server,
+        tmp_path,
+        start_time,
+        end_time,
+        manifest=True,
+        return_report=True,
+        satellite="HIMAWARI-9",
+        product_level="l2",
+        product="cmsk",
+        sector="Full Disk",
+    )
+    # The completed first block is not listed again
+    assert listed_blocks == [start_time + datetime.timedelta(days=1), start_time + datetime.timedelta(days=2)]
+    # - The first block includes the first file of the second day
+    assert report.counts["skipped_existing"] == 3
+    assert report.counts["downloaded"] == 3
+
+    # A third run does not list any block
+    listed_blocks.clear()
+    _download_files(server, tmp_path, start_time, end_time, manifest=True)
+    assert listed_blocks == []
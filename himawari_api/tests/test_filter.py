@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Test the himawari_api filter functions."""
+
+import datetime
+
+from himawari_api.checks import _check_filter_parameters
+from himawari_api.filter import filter_files
+
+
+def _get_fpath(channel, spatial_res):
+    """Return the filepath of an AHI L1b Rad segment file."""
+    return (
+        "AHI-L1b-FLDK/2023/01/01/0000/"
+        f"HS_H09_20230101_0000_{channel}_FLDK_R{spatial_res:02d}_S0110.DAT.bz2"
+    )
+
+
+# Each channel is available at its native resolution and at a coarser/finer one
+FPATHS = [
+    _get_fpath("B01", 10),
+    _get_fpath("B01", 5),
+    _get_fpath("B03", 5),
+    _get_fpath("B03", 10),
+    _get_fpath("B13", 20),
+    _get_fpath("B13", 10),
+    _get_fpath("B08", 20),
+]
+
+
+def test_composites_channels_selected_at_native_resolution():
+    """Test that the composites channels are selected at their native resolution."""
+    fpaths = filter_files(FPATHS, product="Rad", product_level="L1b", composites="overview")
+    assert fpaths == [_get_fpath("B03", 5), _get_fpath("B13", 20)]
+    fpaths = filter_files(FPATHS, product="Rad", product_level="L1b", composites="true_color")
+    assert fpaths == [_get_fpath("B01", 10), _get_fpath("B03", 5)]
+
+
+def test_composites_resolution_policy_override():
+    """Test that a specified resolution policy overrides the composites native resolution."""
+    fpaths = filter_files(
+        FPATHS, product="Rad", product_level="L1b", composites="overview", resolution="finest"
+    )
+    assert fpaths == [_get_fpath("B03", 5), _get_fpath("B13", 10)]
+    fpaths = filter_files(
+        FPATHS,
+        product="Rad",
+        product_level="L1b",
+        composites="overview",
+        resolution={"B03": "coarsest"},
+    )
+    assert fpaths == [_get_fpath("B03", 10), _get_fpath("B13", 20)]
+
+
+def test_check_filter_parameters_composites_resolution():
+    """Test that the composites native resolution is pushed into the filter parameters."""
+    filter_parameters = {"composites": ["overview"], "channels": ["B08"]}
+    checked = _check_filter_parameters(filter_parameters, sector="FLDK")
+    assert checked["channels"] == ["B03", "B04", "B08", "B13"]
+    assert checked["resolution"] == {"B03": 0.5, "B04": 1.0, "B13": 2.0}
+    assert "resolution" not in filter_parameters
+    fpaths = filter_files(
+        FPATHS, product="Rad", product_level="L1b", start_time=datetime.datetime(2023, 1, 1), **checked
+    )
+    assert fpaths == [_get_fpath("B03", 5), _get_fpath("B13", 20), _get_fpath("B08", 20)]
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Test the himawari_api HSD reader."""
+
+import datetime
+
+import numpy as np
+import pytest
+
+import himawari_api.hsd
+from himawari_api.geometry import get_bbox_segments_index
+from himawari_api.hsd import _mjd_to_datetime, read_hsd, read_hsd_header
+from himawari_api.tests._synthetic import (
+    HSD_COUNT_ERROR_PIXELS,
+    HSD_COUNT_OUTSIDE_SCAN_PIXELS,
+    HSD_IR_CALIBRATION,
+    HSD_VIS_CALIBRATION,
+    write_hsd_file,
+)
+
+START_TIME = datetime.datetime(2023, 1, 1, 2, 10)
+SHAPE = (6, 8)
+
+
+def _get_counts(band, seed=0):
+    """Return random valid counts of a segment."""
+    rng = np.random.default_rng(seed)
+    low, high = (30, 2000) if band <= 6 else (100, 8000)
+    return rng.integers(low, high, SHAPE).astype(np.uint16)
+
+
+def _write_segments(dir_path, band, segments=(1, 2, 3), n_segments=3, **kwargs):
+    """Write the segments of a band and return the filepaths and the counts."""
+    fpaths = []
+    counts = {}
+    for segment in segments:
+        counts[segment] = _get_counts(band, seed=band * 100 + segment)
+        fpaths.append(
+            write_hsd_file(
+                str(dir_path), counts[segment], band, segment=segment, n_segments=n_segments,
+                start_time=START_TIME, **kwargs,
+            )
+        )
+    return fpaths, counts
+
+
+def _get_radiance(counts, cal):
+    return counts * np.float32(cal["gain_count2rad_conversion"]) + np.float32(cal["offset_count2rad_conversion"])
+
+
+def _get_brightness_temperature(counts, wavelength):
+    cal = HSD_IR_CALIBRATION
+    rad = _get_radiance(counts, cal).astype(np.float64)
+    c, h, k = cal["speed_of_light"], cal["planck_constant"], cal["boltzmann_constant"]
+    wavelength = wavelength * 1e-6
+    with np.errstate(invalid="ignore"):
+        te = (h * c) / (k * wavelength) / np.log(2 * h * c**2 / (rad * 1e6 * wavelength**5) + 1)
+    return cal["c0_rad2tb_conversion"] + cal["c1_rad2tb_conversion"] * te + cal["c2_rad2tb_conversion"] * te**2
+
+
+@pytest.mark.parametrize("byte_order", [0, 1])
+def test_read_hsd_header(tmp_path, byte_order):
+    """The header blocks are decoded in both byte orders."""
+    fpaths, counts = _write_segments(tmp_path, 13, segments=[2], byte_order=byte_order)
+    header = read_hsd_header(fpaths[0])
+    assert header["byte_order"] == byte_order
+    assert header["basic_info"]["total_number_of_header_blocks"] == 11
+    assert header["basic_info"]["total_header_length"] == 1483
+    assert header["basic_info"]["observation_area"] == b"FLDK"
+    assert abs(_mjd_to_datetime(header["basic_info"]["observation_start_time"]) - START_TIME).total_seconds() < 1e-3
+    assert header["data_info"]["number_of_lines"] == SHAPE[0]
+    assert header["data_info"]["number_of_columns"] == SHAPE[1]
+    assert header["calibration"]["band_number"] == 13
+    assert header["calibration"]["count_value_outside_scan_pixels"] == HSD_COUNT_OUTSIDE_SCAN_PIXELS
+    assert header["calibration"]["boltzmann_constant"] == HSD_IR_CALIBRATION["boltzmann_constant"]
+    assert header["segment_info"]["segment_sequence_number"] == 2
+    assert header["segment_info"]["first_line_number_of_image_segment"] == SHAPE[0] + 1
+    # The counts are read in the file byte order
+    np.testing.assert_array_equal(read_hsd(fpaths, calibrate="counts")["B13"], counts[2])
+
+
+def test_read_hsd_vis_header(tmp_path):
+    """The visible bands have their own calibration block."""
+    fpaths, _ = _write_segments(tmp_path, 3, segments=[1])
+    calibration = read_hsd_header(fpaths[0])["calibration"]
+    assert calibration["coeff_rad2albedo_conversion"] == HSD_VIS_CALIBRATION["coeff_rad2albedo_conversion"]
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_read_hsd_stitch_segments(tmp_path, compress):
+    """The segments are stitched along the lines and missing segments are filled."""
+    fpaths, counts = _write_segments(tmp_path, 13, segments=[3, 1], compress=compress)
+    data = read_hsd(fpaths, calibrate="counts")
+    assert list(data) == ["B13"]
+    expected = np.concatenate([counts[1], np.full(SHAPE, HSD_COUNT_OUTSIDE_SCAN_PIXELS), counts[3]])
+    np.testing.assert_array_equal(data["B13"], expected)
+    radiance = read_hsd(fpaths, calibrate="radiance")["B13"]
+    assert radiance.dtype == np.float32
+    assert np.isnan(radiance[SHAPE[0] : 2 * SHAPE[0]]).all()
+    assert not np.isnan(radiance[: SHAPE[0]]).any()
+
+
+def test_read_hsd_different_timesteps(tmp_path):
+    """The segments of a band must belong to the same timestep."""
+    fpath_1 = write_hsd_file(str(tmp_path), _get_counts(13), 13, segment=1, n_segments=2, start_time=START_TIME)
+    start_time = START_TIME + datetime.timedelta(minutes=10)
+    fpath_2 = write_hsd_file(str(tmp_path), _get_counts(13), 13, segment=2, n_segments=2, start_time=start_time)
+    with pytest.raises(ValueError):
+        read_hsd([fpath_1, fpath_2])
+
+
+def test_read_hsd_calibration(tmp_path):
+    """The visible and infrared bands are calibrated to reflectance and brightness temperature."""
+    fpaths_vis, counts_vis = _write_segments(tmp_path, 3, segments=[1], n_segments=1)
+    counts_ir = _get_counts(13)
+    counts_ir[0, 0] = HSD_COUNT_ERROR_PIXELS
+    counts_ir[0, 1] = HSD_COUNT_OUTSIDE_SCAN_PIXELS
+    fpath_ir = write_hsd_file(str(tmp_path), counts_ir, 13, start_time=START_TIME)
+    data = read_hsd(fpaths_vis + [fpath_ir])
+    assert sorted(data) == ["B03", "B13"]
+
+    # Visible band: reflectance (%)
+    reflectance = _get_radiance(counts_vis[1], HSD_VIS_CALIBRATION) * np.float32(
+        HSD_VIS_CALIBRATION["coeff_rad2albedo_conversion"] * 100
+    )
+    np.testing.assert_allclose(data["B03"], reflectance, rtol=1e-6)
+    np.testing.assert_allclose(
+        read_hsd(fpaths_vis, calibrate="radiance")["B03"], _get_radiance(counts_vis[1], HSD_VIS_CALIBRATION)
+    )
+
+    # Infrared band: brightness temperature (K)
+    tb = data["B13"]
+    assert tb.dtype == np.float32
+    assert np.isnan(tb[0, :2]).all()
+    expected = _get_brightness_temperature(counts_ir, 10.4029)
+    np.testing.assert_allclose(tb[0, 2:], expected[0, 2:], rtol=1e-6)
+    np.testing.assert_allclose(tb[1:], expected[1:], rtol=1e-6)
+    assert 150 < np.nanmin(tb) and np.nanmax(tb) < 350
+
+    # Invalid calibrations
+    with pytest.raises(ValueError):
+        read_hsd([fpath_ir], calibrate="reflectance")
+    with pytest.raises(ValueError):
+        read_hsd(fpaths_vis, calibrate="brightness_temperature")
+
+
+def test_read_hsd_as_xarray(tmp_path):
+    """The xarray outputs carry the HSD metadata."""
+    pytest.importorskip("xarray")
+    fpaths, _ = _write_segments(tmp_path, 13, segments=[2, 3])
+    da = read_hsd(fpaths, as_xarray=True)["B13"]
+    assert da.dims == ("y", "x")
+    assert da.shape == (2 * SHAPE[0], SHAPE[1])
+    assert da.attrs["band"] == "B13"
+    assert da.attrs["units"] == "K"
+    assert da.attrs["first_line"] == SHAPE[0]
+    assert da.attrs["satellite"] == "Himawari-9"
+
+
+def test_read_hsd_against_satpy(tmp_path):
+    """The calibrated arrays match the satpy `ahi_hsd` reader in nominal calibration mode."""
+    satpy = pytest.importorskip("satpy")
+    fpaths_vis, _ = _write_segments(tmp_path, 1, segments=[1, 2], n_segments=2)
+    fpaths_ir, _ = _write_segments(tmp_path, 13, segments=[1, 2], n_segments=2)
+    fpaths = fpaths_vis + fpaths_ir
+    scn = satpy.Scene(
+        reader="ahi_hsd", filenames=fpaths, reader_kwargs={"calib_mode": "nominal", "mask_space": False}
+    )
+    scn.load(["B01"], calibration="reflectance")
+    scn.load(["B13"], calibration="brightness_temperature")
+    data = read_hsd(fpaths)
+    np.testing.assert_allclose(data["B01"], scn["B01"].values, rtol=1e-5)
+    np.testing.assert_allclose(data["B13"], scn["B13"].values, rtol=1e-5)
+    scn = satpy.Scene(reader="ahi_hsd", filenames=fpaths, reader_kwargs={"mask_space": False})
+    scn.load(["B13"], calibration="counts")
+    np.testing.assert_array_equal(read_hsd(fpaths_ir, calibrate="counts")["B13"], scn["B13"].values)
+
+
+@pytest.mark.parametrize("calibrate", ["counts", "radiance", "auto"])
+@pytest.mark.parametrize("compress", [False, True])
+def test_read_hsd_lazy_equals_eager(tmp_path, calibrate, compress):
+    """The lazy (memory-mapped) and eager reads return the same arrays, including the missing segments."""
+    pytest.importorskip("dask")
+    fpaths, _ = _write_segments(
+        tmp_path, 13, segments=[1, 3, 4], n_segments=4, compress=compress, count_outside_scan=4095
+    )
+    eager = read_hsd(fpaths, calibrate=calibrate)["B13"]
+    if calibrate == "counts":
+        assert (eager[SHAPE[0] : 2 * SHAPE[0]] == 4095).all()
+    lazy = read_hsd(fpaths, calibrate=calibrate, lazy=True)["B13"]
+    assert lazy.dtype == eager.dtype
+    np.testing.assert_array_equal(lazy.compute(), eager)
+    lazy = read_hsd(fpaths, calibrate=calibrate, lazy=True, chunks=(4, 4))["B13"]
+    np.testing.assert_array_equal(lazy.compute(), eager)
+
+
+def test_read_hsd_memmap_equals_read(tmp_path):
+    """The memory-mapped .DAT files and the decompressed .DAT.bz2 files return the same arrays."""
+    dat_dir = tmp_path / "dat"
+    bz2_dir = tmp_path / "bz2"
+    dat_dir.mkdir()
+    bz2_dir.mkdir()
+    fpaths_dat, _ = _write_segments(dat_dir, 13, segments=[1, 3], byte_order=1)
+    fpaths_bz2, _ = _write_segments(bz2_dir, 13, segments=[1, 3], byte_order=1, compress=True)
+    for calibrate in ["counts", "brightness_temperature"]:
+        memmapped = read_hsd(fpaths_dat, calibrate=calibrate)["B13"]
+        decompressed = read_hsd(fpaths_bz2, calibrate=calibrate)["B13"]
+        np.testing.assert_array_equal(memmapped, decompressed)
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_read_hsd_bbox_parses_headers_once(tmp_path, monkeypatch, compress):
+    """The bounding box reads decode the header of each segment file only once."""
+    ll_bbox = [130, 30, 140, 40]
+    index = get_bbox_segments_index(ll_bbox, 2)
+    # 2 km FLDK segments of 550 lines and 5500 columns
+    rng = np.random.default_rng(0)
+    full_counts = {}
+    fpaths = []
+    for segment in [1] + [item[0] for item in index]:
+        full_counts[segment] = rng.integers(100, 8000, (550, 5500)).astype(np.uint16)
+        fpaths.append(
+            write_hsd_file(
+                str(tmp_path), full_counts[segment], 13, segment=segment, n_segments=10,
+                start_time=START_TIME, compress=compress,
+            )
+        )
+
+    parse_header = himawari_api.hsd._parse_header
+    calls = []
+
+    def _parse_header(buffer):
+        calls.append(buffer)
+        return parse_header(buffer)
+
+    monkeypatch.setattr(himawari_api.hsd, "_parse_header", _parse_header)
+    data = read_hsd(fpaths, calibrate="counts", ll_bbox=ll_bbox, as_xarray=True)["B13"]
+    assert len(calls) == len(fpaths)
+
+    # The crop matches the segment lines and columns of the index
+    expected = np.concatenate(
+        [full_counts[segment][first_line : last_line + 1, first_col : last_col + 1]
+         for segment, first_line, last_line, first_col, last_col in index]
+    )
+    np.testing.assert_array_equal(data.values, expected)
+    assert data.attrs["first_line"] == 550 + index[0][1]
+    assert data.attrs["first_col"] == index[0][3]
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Test the himawari_api file information records."""
+
+import os
+import tracemalloc
+
+import pytest
+
+from himawari_api.info import HimawariFile, _get_info_from_filename, get_file_records
+from himawari_api.query import channel
+from himawari_api.tests._synthetic import get_synthetic_fpaths
+
+FPATHS = {
+    "L1b": get_synthetic_fpaths(1)[0],
+    "L2_new": get_synthetic_fpaths(1, product_level="L2", product="CMSK")[0],
+    "L2_old": get_synthetic_fpaths(1, product_level="L2", product="CMSK", pattern="old")[0],
+}
+
+
+@pytest.mark.parametrize("fname_pattern", list(FPATHS))
+def test_file_record_equals_info_dict(fname_pattern):
+    """The record holds the information of the filename info dictionary."""
+    fpath = FPATHS[fname_pattern]
+    info = _get_info_from_filename(os.path.basename(fpath))
+    record = get_file_records(fpath)[0]
+    assert isinstance(record, HimawariFile)
+    assert os.fspath(record) == fpath
+    assert record.to_dict() == info
+    assert sorted(record.keys()) == sorted(info)
+    for key, value in info.items():
+        assert record[key] == value
+        assert record.get(key) == value
+        assert key in record
+
+
+def test_file_record_missing_key():
+    """As the info dictionary, the record raises a KeyError for the information not available."""
+    record = get_file_records(FPATHS["L2_new"])[0]
+    assert "channel" not in record
+    assert record.get("channel") is None
+    assert record.get("channel", "default") == "default"
+    with pytest.raises(KeyError):
+        record["channel"]
+    with pytest.raises(KeyError):
+        record["unknown_key"]
+    with pytest.raises(KeyError):
+        channel([record])
+    assert channel(get_file_records(FPATHS["L1b"])) == ["B01"]
+
+
+def test_file_record_interning():
+    """The categorical strings are shared across the records."""
+    fpath = FPATHS["L1b"]
+    # Distinct string objects with the same content
+    records = get_file_records([fpath, "".join(list(fpath))])
+    for key in ["satellite", "product", "sector", "channel", "platform_shortname"]:
+        assert records[0][key] is records[1][key]
+
+
+def _get_allocated_memory(func, fpaths):
+    """Return the memory (in bytes) allocated by the objects returned by func."""
+    tracemalloc.start()
+    objects = func(fpaths)
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del objects
+    return memory
+
+
+def test_file_record_memory():
+    """The records require less than half of the memory of the info dictionaries."""
+    fpaths = get_synthetic_fpaths(2000)
+    fnames = [os.path.basename(fpath) for fpath in fpaths]
+    memory_records = _get_allocated_memory(get_file_records, fpaths)
+    memory_dicts = _get_allocated_memory(lambda fnames: [_get_info_from_filename(f) for f in fnames], fnames)
+    assert memory_records < memory_dicts / 2
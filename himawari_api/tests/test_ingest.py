@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Test the himawari_api near real-time ingestion functions."""
+
+import datetime
+
+import numpy as np
+import pytest
+
+import himawari_api.ingest
+from himawari_api.ingest import NRTWatcher, PublicationDelayEstimator
+from himawari_api.tests._synthetic import get_synthetic_fpaths
+
+CADENCE = datetime.timedelta(minutes=10)
+
+
+def _get_current_slot():
+    now = datetime.datetime.utcnow()
+    return now.replace(minute=now.minute - now.minute % 10, second=0, microsecond=0)
+
+
+def _update_delays(estimator, start_time, delays_minutes):
+    """Record acquisitions every cadence published after the given delays."""
+    for i, delay in enumerate(delays_minutes):
+        acquisition_start_time = start_time + i * CADENCE
+        estimator.update(acquisition_start_time, acquisition_start_time + datetime.timedelta(minutes=delay))
+
+
+def test_publication_delay_estimator_quantile():
+    """The delay is the quantile of the first publication delay of each acquisition."""
+    start_time = datetime.datetime(2023, 1, 1)
+    estimator = PublicationDelayEstimator(cadence=CADENCE, default_delay=datetime.timedelta(minutes=7))
+    assert estimator.get_delay() == datetime.timedelta(minutes=7)
+    assert PublicationDelayEstimator(cadence=CADENCE).get_delay() == CADENCE
+
+    delays = [4, 1, 5, 2, 3]
+    _update_delays(estimator, start_time, delays)
+    assert estimator.n_samples == 5
+    assert estimator.get_delay() == datetime.timedelta(minutes=3)
+    assert estimator.get_delay(quantile=0.9) == datetime.timedelta(minutes=float(np.quantile(delays, 0.9)))
+    assert estimator.get_expected_publication_time(start_time) == start_time + datetime.timedelta(minutes=3)
+    assert estimator.get_next_start_time(start_time) == start_time + CADENCE
+
+    # The later files of an acquisition and the files modified before the acquisition are ignored
+    estimator.update(start_time, start_time + datetime.timedelta(minutes=9))
+    estimator.update(start_time + 5 * CADENCE, start_time)
+    assert estimator.n_samples == 5
+    assert estimator.get_delay() == datetime.timedelta(minutes=3)
+    # The first file published defines the delay
+    estimator.update(start_time, start_time + datetime.timedelta(seconds=30))
+    assert estimator.get_delay(quantile=0) == datetime.timedelta(seconds=30)
+
+    with pytest.raises(ValueError):
+        PublicationDelayEstimator(cadence=CADENCE, quantile=2)
+    with pytest.raises(TypeError):
+        PublicationDelayEstimator(cadence=600)
+
+
+def test_publication_delay_estimator_max_samples():
+    """Only the most recent acquisitions are used by the estimate."""
+    start_time = datetime.datetime(2023, 1, 1)
+    estimator = PublicationDelayEstimator(cadence=CADENCE, max_samples=3)
+    _update_delays(estimator, start_time, [9, 9, 1, 2, 3])
+    assert estimator.n_samples == 3
+    assert estimator.get_delay() == datetime.timedelta(minutes=2)
+    assert estimator.get_delay(quantile=1) == datetime.timedelta(minutes=3)
+
+
+def test_publication_delay_estimator_update_from_info():
+    """The LastModified times of a detailed listing are recorded (timezone-aware or not)."""
+    fpaths = get_synthetic_fpaths(3, product_level="L2", product="CMSK")
+    dict_info = {
+        fpaths[0]: {"LastModified": datetime.datetime(2023, 1, 1, 0, 2)},
+        fpaths[1]: {"LastModified": datetime.datetime(2023, 1, 1, 10, 14, tzinfo=datetime.timezone(
+            datetime.timedelta(hours=10)))},
+        fpaths[2]: {"size": 10},
+    }
+    estimator = PublicationDelayEstimator(cadence=CADENCE)
+    estimator.update_from_info(dict_info)
+    assert estimator.n_samples == 2
+    assert estimator.get_delay(quantile=0) == datetime.timedelta(minutes=2)
+    assert estimator.get_delay(quantile=1) == datetime.timedelta(minutes=4)
+
+
+def test_nrt_watcher_poll_next_sleeps_until_expected_publication(monkeypatch):
+    """`poll_next` sleeps until the estimated publication time of the next acquisition."""
+    slot = _get_current_slot()
+    watcher = NRTWatcher(
+        satellite="himawari-9",
+        product_level="L2",
+        product="CMSK",
+        sector="FLDK",
+        lookback=datetime.timedelta(minutes=30),
+    )
+    _update_delays(watcher.estimator, slot - 5 * CADENCE, [3, 2, 4, 3, 3])
+    watcher._latest_start_time = slot
+    sleeps = []
+    monkeypatch.setattr(himawari_api.ingest.time, "sleep", sleeps.append)
+    listings = []
+
+    def _list_new_files(start_time, end_time, time_dir_trees):
+        listings.append(start_time)
+        return ["fpath"] if len(listings) == 2 else []
+
+    monkeypatch.setattr(watcher, "_list_new_files", _list_new_files)
+    t_i = datetime.datetime.utcnow()
+    assert watcher.poll_next() == ["fpath"]
+    expected_time = slot + CADENCE + datetime.timedelta(minutes=3)
+    assert sleeps[0] == pytest.approx((expected_time - t_i).total_seconds(), abs=1)
+    # The next acquisition directory is listed again after `min_backoff`
+    assert listings == [slot + CADENCE] * 2
+    assert sleeps[1:] == [watcher.min_backoff.total_seconds()]
+
+
+def test_nrt_watcher_poll_next_prunes_and_retries(s3_server):
+    """`poll_next` forgets the old files and returns the files to retry."""
+    slot = _get_current_slot()
+    fpaths = get_synthetic_fpaths(2, product_level="L2", product="CMSK", start_time=slot - CADENCE)
+    server = s3_server(fpaths)
+    bucket_fpaths = [f"s3://{server.bucket}/{fpath}" for fpath in fpaths]
+    watcher = NRTWatcher(
+        satellite="himawari-9",
+        product_level="L2",
+        product="CMSK",
+        sector="FLDK",
+        fs_args=server.fs_args,
+        lookback=datetime.timedelta(minutes=30),
+    )
+    # The next acquisition is published without delay
+    watcher.estimator = PublicationDelayEstimator(cadence=CADENCE, default_delay=datetime.timedelta(0))
+    # Previous acquisition: one file to retry and a file out of the lookback window
+    watcher._seen = {bucket_fpaths[0]: slot - CADENCE, "old_fpath": slot - datetime.timedelta(hours=5)}
+    watcher._latest_start_time = slot - CADENCE
+    watcher.retry([bucket_fpaths[0]])
+
+    assert watcher.poll_next() == bucket_fpaths
+    assert watcher.latest_start_time == slot
+    assert set(watcher._seen) == set(bucket_fpaths)
+    assert watcher._retry == {}
+    # The files to retry are returned once
+    assert watcher.poll(now=slot + CADENCE) == []
+
+
+def test_nrt_watcher_retry_pruned(s3_server):
+    """The files to retry older than the lookback window are forgotten."""
+    slot = _get_current_slot()
+    fpaths = get_synthetic_fpaths(1, product_level="L2", product="CMSK", start_time=slot)
+    server = s3_server(fpaths)
+    watcher = NRTWatcher(
+        satellite="himawari-9",
+        product_level="L2",
+        product="CMSK",
+        sector="FLDK",
+        fs_args=server.fs_args,
+        lookback=datetime.timedelta(minutes=30),
+    )
+    assert watcher.poll(now=slot + CADENCE) == [f"s3://{server.bucket}/{fpaths[0]}"]
+    watcher.retry([f"s3://{server.bucket}/{fpaths[0]}"])
+    assert watcher.poll(now=slot + datetime.timedelta(hours=1)) == []
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Test the himawari_api bucket and https address functions."""
+
+import numpy as np
+import pytest
+
+from himawari_api.io import _set_connection_type, _switch_to_https_fpath, get_bucket
+from himawari_api.tests._synthetic import get_synthetic_fpaths
+
+
+def _get_bucket_fpaths(satellite, n_timesteps=2):
+    bucket = get_bucket("s3", satellite)
+    fpaths = get_synthetic_fpaths(n_timesteps, product_level="L2", product="CMSK")
+    return [f"{bucket}/{fpath}" for fpath in fpaths]
+
+
+def _get_expected_fpaths(fpaths, connection_type):
+    """Convert each filepath separately to its https address."""
+    fpaths = [_switch_to_https_fpath(fpath, "s3") for fpath in fpaths]
+    if connection_type == "nc_bytes":
+        fpaths = [fpath + "#mode=bytes" for fpath in fpaths]
+    return fpaths
+
+
+@pytest.mark.parametrize("connection_type", ["https", "nc_bytes"])
+def test_set_connection_type_list(connection_type):
+    """The https addresses equal the conversion of each filepath."""
+    fpaths = _get_bucket_fpaths("himawari-9")
+    https_fpaths = _set_connection_type(
+        fpaths, "himawari-9", protocol="s3", connection_type=connection_type
+    )
+    assert https_fpaths == _get_expected_fpaths(fpaths, connection_type)
+    assert https_fpaths[0].startswith("https://noaa-himawari9.s3.amazonaws.com/AHI-L2")
+
+
+@pytest.mark.parametrize("connection_type", ["https", "nc_bytes"])
+def test_set_connection_type_other_bucket(connection_type):
+    """Filepaths outside the satellite bucket are converted one by one."""
+    fpaths = _get_bucket_fpaths("himawari-9", 1) + _get_bucket_fpaths("himawari-8", 1)
+    https_fpaths = _set_connection_type(
+        fpaths, "himawari-9", protocol="s3", connection_type=connection_type
+    )
+    assert https_fpaths == _get_expected_fpaths(fpaths, connection_type)
+    assert https_fpaths[1].startswith("https://noaa-himawari8.s3.amazonaws.com/")
+
+
+@pytest.mark.parametrize("connection_type", ["https", "nc_bytes"])
+def test_set_connection_type_grouped(connection_type):
+    """Grouped lists and arrays of filepaths are converted in place."""
+    fpaths = _get_bucket_fpaths("himawari-9", 4)
+    dict_fpaths = {"a": fpaths[:2], "b": np.array(fpaths[2:]).reshape(1, 2)}
+    https_dict = _set_connection_type(
+        dict_fpaths, "himawari-9", protocol="s3", connection_type=connection_type
+    )
+    expected = _get_expected_fpaths(fpaths, connection_type)
+    assert https_dict["a"] == expected[:2]
+    assert https_dict["b"].shape == (1, 2)
+    assert https_dict["b"].ravel().tolist() == expected[2:]
+
+
+def test_set_connection_type_bucket():
+    """Bucket connections and local filepaths are left unchanged."""
+    fpaths = _get_bucket_fpaths("himawari-9")
+    assert _set_connection_type(fpaths, "himawari-9", "s3", "bucket") == fpaths
+    assert _set_connection_type(fpaths, "himawari-9", "file", "https") == fpaths
+    with pytest.raises(NotImplementedError):
+        _set_connection_type(fpaths, "himawari-9", "s3", "ftp")
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Test the himawari_api lookup tables functions."""
+
+import os
+
+import numpy as np
+import pytest
+
+import himawari_api.lut
+from himawari_api.geometry import get_bbox_linecol_slices, get_projection_info, lonlat_to_linecol
+from himawari_api.lut import apply_lut, compute_lut, crop_with_lut, get_lonlat_grid, get_lut
+
+RESOLUTION = 2
+LL_BBOX = [130, 30, 132, 32]
+
+
+def _get_linecol_data(line_slice, col_slice, margin=5):
+    """Return an array of value 1e4 * line + col around a window and its first line/column."""
+    first_line = line_slice.start - margin
+    first_col = col_slice.start - margin
+    lines = np.arange(first_line, line_slice.stop + margin)
+    cols = np.arange(first_col, col_slice.stop + margin)
+    data = 1e4 * lines[:, None] + cols[None, :]
+    return data, first_line, first_col
+
+
+@pytest.mark.parametrize("method", ["nearest", "bilinear"])
+def test_apply_lut_equals_lonlat_to_linecol(method):
+    """The resampled values are the values at the lines/columns of the target locations."""
+    target_lons, target_lats = get_lonlat_grid(LL_BBOX, 0.1)
+    lut = compute_lut(RESOLUTION, target_lons=target_lons, target_lats=target_lats, method=method)
+    line_start, line_stop, col_start, col_stop = lut["slices"]
+    data, first_line, first_col = _get_linecol_data(slice(line_start, line_stop), slice(col_start, col_stop))
+    # Resample separately the line and column of each pixel (float32 weights)
+    line_values = apply_lut(data // 1e4, lut, first_line=first_line, first_col=first_col)
+    col_values = apply_lut(data % 1e4, lut, first_line=first_line, first_col=first_col)
+
+    lines, cols = lonlat_to_linecol(target_lons, target_lats, get_projection_info(RESOLUTION))
+    if method == "nearest":
+        np.testing.assert_array_equal(line_values, np.rint(lines))
+        np.testing.assert_array_equal(col_values, np.rint(cols))
+    else:
+        np.testing.assert_allclose(line_values, lines, rtol=0, atol=1e-3)
+        np.testing.assert_allclose(col_values, cols, rtol=0, atol=1e-3)
+
+
+def test_apply_lut_invisible_target():
+    """The target locations not visible from the satellite are filled."""
+    target_lons = np.array([[130.0, -60.0]])
+    target_lats = np.array([[30.0, 0.0]])
+    lut = compute_lut(RESOLUTION, target_lons=target_lons, target_lats=target_lats)
+    line_start, line_stop, col_start, col_stop = lut["slices"]
+    data, first_line, first_col = _get_linecol_data(slice(line_start, line_stop), slice(col_start, col_stop))
+    values = apply_lut(data, lut, first_line=first_line, first_col=first_col, fill_value=-1)
+    assert lut["valid"].tolist() == [[True, False]]
+    assert values[0, 1] == -1
+
+
+def test_crop_with_lut_offsets():
+    """The crop window accounts for the first line/column of the data."""
+    lut = compute_lut(RESOLUTION, ll_bbox=LL_BBOX)
+    line_slice, col_slice = get_bbox_linecol_slices(LL_BBOX, get_projection_info(RESOLUTION))
+    assert lut["slices"].tolist() == [line_slice.start, line_slice.stop, col_slice.start, col_slice.stop]
+
+    data, first_line, first_col = _get_linecol_data(line_slice, col_slice)
+    cropped = crop_with_lut(data, lut, first_line=first_line, first_col=first_col)
+    assert np.shares_memory(cropped, data)
+    assert cropped.shape == (line_slice.stop - line_slice.start, col_slice.stop - col_slice.start)
+    assert cropped[0, 0] == 1e4 * line_slice.start + col_slice.start
+    assert cropped[-1, -1] == 1e4 * (line_slice.stop - 1) + col_slice.stop - 1
+    # Without a target area, apply_lut only crops
+    np.testing.assert_array_equal(apply_lut(data, lut, first_line=first_line, first_col=first_col), cropped)
+
+
+@pytest.mark.parametrize(
+    "offsets, match",
+    [
+        ({"first_line": 10, "first_col": 5}, "lines"),
+        ({"first_line": 0, "first_col": 5}, "lines"),
+        ({"first_line": 5, "first_col": 10}, "columns"),
+        ({"first_line": 5, "first_col": 0}, "columns"),
+    ],
+)
+def test_crop_with_lut_outside_data(offsets, match):
+    """Data not covering the crop window raise a ValueError."""
+    lut = compute_lut(RESOLUTION, ll_bbox=LL_BBOX)
+    line_slice, col_slice = get_bbox_linecol_slices(LL_BBOX, get_projection_info(RESOLUTION))
+    data, first_line, first_col = _get_linecol_data(line_slice, col_slice, margin=5)
+    first_line += offsets["first_line"]
+    first_col += offsets["first_col"]
+    if offsets["first_line"] == 0:
+        data = data[:-6]
+    if offsets["first_col"] == 0:
+        data = data[:, :-6]
+    with pytest.raises(ValueError, match=match):
+        crop_with_lut(data, lut, first_line=first_line, first_col=first_col)
+
+
+def test_get_lut_cache(tmp_path, monkeypatch):
+    """The cached lookup table is memory-mapped and not computed again."""
+    target_lons, target_lats = get_lonlat_grid(LL_BBOX, 0.1)
+    kwargs = {"target_lons": target_lons, "target_lats": target_lats, "method": "bilinear"}
+    lut = get_lut(RESOLUTION, cache_dir=str(tmp_path), **kwargs)
+    assert len(os.listdir(tmp_path)) == 1
+
+    def _compute_lut(*args, **kwargs):
+        raise AssertionError("The lookup table is computed again.")
+
+    monkeypatch.setattr(himawari_api.lut, "compute_lut", _compute_lut)
+    cached_lut = get_lut(RESOLUTION, cache_dir=str(tmp_path), **kwargs)
+    assert cached_lut["method"] == "bilinear"
+    for key in ["lines", "cols", "line_weights", "col_weights", "valid"]:
+        assert isinstance(cached_lut[key], np.memmap)
+        np.testing.assert_array_equal(cached_lut[key], lut[key])
+    np.testing.assert_array_equal(cached_lut["slices"], lut["slices"])
+
+    # Another target area is computed
+    with pytest.raises(AssertionError):
+        get_lut(RESOLUTION, cache_dir=str(tmp_path), **dict(kwargs, method="nearest"))
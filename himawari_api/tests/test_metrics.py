@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Test the himawari_api metrics registry."""
+
+import os
+
+import pytest
+
+import himawari_api.download
+from himawari_api.download import download_files
+from himawari_api.metrics import Metrics, get_metrics
+from himawari_api.tests._synthetic import get_synthetic_fpaths, get_time_period
+
+
+@pytest.fixture
+def metrics():
+    """Return the process-wide registry, reset before and after the test."""
+    metrics = get_metrics()
+    metrics.reset()
+    yield metrics
+    metrics.reset()
+
+
+def _download_files(server, base_dir, fpaths):
+    os.makedirs(base_dir, exist_ok=True)
+    start_time, end_time = get_time_period(fpaths)
+    return download_files(
+        base_dir=str(base_dir),
+        protocol="s3",
+        satellite="himawari-9",
+        product_level="L2",
+        product="CMSK",
+        sector="FLDK",
+        start_time=start_time,
+        end_time=end_time,
+        fs_args=server.fs_args,
+        progress_bar=False,
+        verbose=False,
+        return_report=True,
+    )
+
+
+def test_metrics_snapshot():
+    """The records are aggregated in the snapshot and forwarded to the callbacks."""
+    metrics = Metrics()
+    records = []
+    metrics.add_callback(lambda kind, name, value: records.append((kind, name, value)))
+    metrics.inc("get_requests")
+    metrics.inc("get_requests", 2)
+    metrics.inc("bytes_transferred", 100)
+    metrics.add_duration("transfer", 2.0)
+    metrics.add_duration("transfer", 3.0)
+    metrics.observe("download_duration_seconds", 0.3)
+    metrics.observe("download_duration_seconds", 200)
+
+    stats = metrics.snapshot()
+    assert stats["counters"] == {"get_requests": 3, "bytes_transferred": 100}
+    assert stats["phases"] == {"transfer": {"seconds": 5.0, "count": 2}}
+    histogram = stats["histograms"]["download_duration_seconds"]
+    assert histogram["counts"][histogram["buckets"].index(0.5)] == 1
+    assert histogram["counts"][-1] == 1
+    assert histogram["sum"] == 200.3
+    assert histogram["count"] == 2
+    assert stats["throughput_bytes_per_second"] == 20
+    assert len(records) == 7
+    assert records[0] == ("counter", "get_requests", 1)
+
+    metrics.reset()
+    assert metrics.snapshot() == {"counters": {}, "phases": {}, "histograms": {}}
+    with pytest.raises(TypeError):
+        metrics.add_callback("callback")
+
+
+def test_metrics_to_prometheus():
+    """The metrics are exported in the Prometheus text format."""
+    metrics = Metrics(namespace="test")
+    metrics.inc("get_requests", 3)
+    metrics.add_duration("list", 1.5)
+    metrics.observe("download_duration_seconds", 0.3)
+    metrics.observe("download_duration_seconds", 0.7)
+    lines = metrics.to_prometheus().splitlines()
+    assert "# TYPE test_get_requests_total counter" in lines
+    assert "test_get_requests_total 3" in lines
+    assert "# TYPE test_phase_seconds summary" in lines
+    assert 'test_phase_seconds_sum{phase="list"} 1.5' in lines
+    assert 'test_phase_seconds_count{phase="list"} 1' in lines
+    assert "# TYPE test_download_duration_seconds histogram" in lines
+    assert 'test_download_duration_seconds_bucket{le="0.25"} 0' in lines
+    assert 'test_download_duration_seconds_bucket{le="0.5"} 1' in lines
+    assert 'test_download_duration_seconds_bucket{le="1"} 2' in lines
+    assert 'test_download_duration_seconds_bucket{le="+Inf"} 2' in lines
+    assert "test_download_duration_seconds_count 2" in lines
+
+
+def test_metrics_download_files(s3_server, tmp_path, metrics):
+    """The search and transfer of download_files are recorded."""
+    fpaths = get_synthetic_fpaths(3, product_level="L2", product="CMSK")
+    server = s3_server(fpaths, file_size=10)
+    report = _download_files(server, tmp_path, fpaths)
+    assert report.counts["downloaded"] == 3
+
+    stats = metrics.snapshot()
+    assert stats["counters"]["list_requests"] >= 1
+    assert stats["counters"]["files_listed"] == 3
+    assert stats["counters"]["get_requests"] == 3
+    assert stats["counters"]["bytes_transferred"] == 30
+    assert "retries" not in stats["counters"]
+    assert stats["histograms"]["download_duration_seconds"]["count"] == 3
+    assert {"list", "filter", "transfer"} <= set(stats["phases"])
+    prometheus = metrics.to_prometheus()
+    assert "himawari_api_get_requests_total 3\n" in prometheus
+    assert "himawari_api_bytes_transferred_total 30\n" in prometheus
+    assert 'himawari_api_phase_seconds_count{phase="transfer"}' in prometheus
+
+    # Existing files are skipped
+    _download_files(server, tmp_path, fpaths)
+    assert metrics.snapshot()["counters"]["files_skipped"] == 3
+
+
+def test_metrics_download_files_retries(s3_server, tmp_path, metrics, monkeypatch):
+    """The failed transfers retried by _fs_get_parallel are counted."""
+    fpaths = get_synthetic_fpaths(3, product_level="L2", product="CMSK")
+    server = s3_server(fpaths, file_size=10)
+    fs_get_file = himawari_api.download._fs_get_file
+    failed = set()
+
+    def _fs_get_file_failing_once(fs, bucket_fpath, local_fpath, **kwargs):
+        if bucket_fpath not in failed:
+            failed.add(bucket_fpath)
+            raise OSError("Transient error")
+        return fs_get_file(fs, bucket_fpath, local_fpath, **kwargs)
+
+    monkeypatch.setattr(himawari_api.download, "_fs_get_file", _fs_get_file_failing_once)
+    report = _download_files(server, tmp_path, fpaths)
+    assert report.counts["downloaded"] == 3
+    assert report.counts["failed"] == 0
+    counters = metrics.snapshot()["counters"]
+    assert counters["retries"] == 3
+    assert counters["get_requests"] == 3
+    assert "download_errors" not in counters
+    assert "himawari_api_retries_total 3\n" in metrics.to_prometheus()
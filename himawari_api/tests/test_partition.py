@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Test the himawari_api partitioned download functions."""
+
+import concurrent.futures
+import datetime
+import json
+
+from himawari_api.download import DownloadReport
+from himawari_api.partition import _is_shard_completed, download_partitioned
+from himawari_api.tests._synthetic import get_synthetic_fpaths
+
+PRODUCT_SPEC = {"satellite": "himawari-9", "product_level": "L2", "product": "CMSK", "sector": "FLDK"}
+
+
+def _write_checkpoint(fpath, download_time, failed=False):
+    report = DownloadReport(base_dir="", protocol="s3", satellite="himawari-9")
+    report._add("local_fpath", "bucket_fpath", status="failed" if failed else "downloaded")
+    report_dict = report.to_dict()
+    report_dict["download_time"] = download_time.isoformat()
+    with open(fpath, "w") as f:
+        json.dump(report_dict, f)
+
+
+def test_is_shard_completed(tmp_path):
+    """Only the shards downloaded when their block was old enough are completed."""
+    fpath = str(tmp_path / "shard.json")
+    assert not _is_shard_completed(fpath, datetime.datetime(2023, 1, 2))
+    download_time = datetime.datetime(2023, 1, 2, 12)
+    _write_checkpoint(fpath, download_time)
+    assert _is_shard_completed(fpath, datetime.datetime(2023, 1, 2))
+    assert not _is_shard_completed(fpath, datetime.datetime(2023, 1, 2, 11, 30))
+    _write_checkpoint(fpath, download_time, failed=True)
+    assert not _is_shard_completed(fpath, datetime.datetime(2023, 1, 2))
+    # Checkpoints without download time are downloaded again
+    with open(fpath, "w") as f:
+        json.dump({"base_dir": "", "protocol": "s3", "satellite": "himawari-9", "files": {}}, f)
+    assert not _is_shard_completed(fpath, datetime.datetime(2023, 1, 2))
+
+
+def test_download_partitioned_restart(s3_server, tmp_path, capsys):
+    """A restarted job downloads again the shards of the recent time blocks."""
+    now = datetime.datetime.utcnow()
+    today = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    old_day = today - datetime.timedelta(days=2)
+    fpaths = get_synthetic_fpaths(2, product_level="L2", product="CMSK", start_time=old_day)
+    fpaths += get_synthetic_fpaths(2, product_level="L2", product="CMSK", start_time=today)
+    server = s3_server(fpaths)
+
+    def _download():
+        with concurrent.futures.ThreadPoolExecutor(2) as executor:
+            return download_partitioned(
+                base_dir=str(tmp_path),
+                product_specs=PRODUCT_SPEC,
+                start_time=old_day,
+                end_time=now,
+                fs_args=server.fs_args,
+                executor=executor,
+                progress_bar=False,
+            )
+
+    report = _download()
+    assert report.counts.get("downloaded") == 4
+    capsys.readouterr()
+    # The shards of the old days are skipped, the shard of the current day is downloaded again
+    report = _download()
+    assert "Starting downloading 1 shards" in capsys.readouterr().out
+    assert report.counts.get("skipped_existing") == 2
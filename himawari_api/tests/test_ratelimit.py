@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Test the himawari_api rate limiters."""
+
+import threading
+import time
+
+import pytest
+from fsspec.implementations.local import LocalFileSystem
+
+from himawari_api.ratelimit import (
+    PRIORITY_BACKFILL,
+    PRIORITY_NRT,
+    RateLimiter,
+    TokenBucket,
+    get_priority,
+    priority,
+)
+
+
+def test_token_bucket_rate():
+    """The tokens beyond the capacity are served at `rate` tokens per second."""
+    bucket = TokenBucket(20)
+    t_i = time.monotonic()
+    assert bucket.acquire(20) < 0.05
+    for _ in range(10):
+        bucket.acquire(1)
+    assert 0.4 < time.monotonic() - t_i < 0.8
+    # Requests larger than the capacity are served in multiple steps
+    t_i = time.monotonic()
+    waited = bucket.acquire(30)
+    assert 1.3 < time.monotonic() - t_i < 1.9
+    assert waited > 1.3
+
+
+def test_token_bucket_invalid_arguments():
+    with pytest.raises(ValueError):
+        TokenBucket(0)
+    with pytest.raises(ValueError):
+        TokenBucket(1, capacity=-1)
+
+
+def test_token_bucket_priority_preemption():
+    """A waiter with a higher priority is served before the earlier waiters."""
+    bucket = TokenBucket(20)
+    bucket.acquire(20)
+    served = []
+
+    def _acquire(name, level):
+        bucket.acquire(10, priority=level)
+        served.append(name)
+
+    threads = []
+    for i in range(3):
+        threads.append(threading.Thread(target=_acquire, args=(f"backfill_{i}", PRIORITY_BACKFILL)))
+        threads[-1].start()
+        time.sleep(0.02)
+    # The NRT waiter arrives while the backfill waiters are waiting
+    threads.append(threading.Thread(target=_acquire, args=("nrt", PRIORITY_NRT)))
+    threads[-1].start()
+    for thread in threads:
+        thread.join(timeout=10)
+    assert served == ["nrt", "backfill_0", "backfill_1", "backfill_2"]
+
+
+def test_priority_context_manager():
+    assert get_priority() == PRIORITY_BACKFILL
+    with priority(PRIORITY_NRT):
+        assert get_priority() == PRIORITY_NRT
+    assert get_priority() == PRIORITY_BACKFILL
+    with pytest.raises(TypeError):
+        with priority("high"):
+            pass
+
+
+class _RecordedFile:
+    """Proxy of an open file recording its reads."""
+
+    def __init__(self, f, events):
+        self._f = f
+        self._events = events
+        self.size = f.size
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self._f.close()
+
+    def read(self, n_bytes):
+        self._events.append(("read", n_bytes))
+        return self._f.read(n_bytes)
+
+
+def test_rate_limiter_get_file_charges_each_chunk(tmp_path, monkeypatch):
+    """The tokens of each chunk (one ranged GET) are acquired before reading it."""
+    src_fpath = str(tmp_path / "file.bin")
+    content = bytes(range(256)) * 10_000
+    with open(src_fpath, "wb") as f:
+        f.write(content)
+    events = []
+    fs = LocalFileSystem()
+    open_file = fs.open
+    monkeypatch.setattr(fs, "open", lambda *args, **kwargs: _RecordedFile(open_file(*args, **kwargs), events))
+    rate_limiter = RateLimiter(bytes_per_second=1_000_000, requests_per_second=1000)
+    request = rate_limiter.request
+    transfer = rate_limiter.transfer
+
+    def _request(priority=None):
+        events.append(("request",))
+        return request(priority=priority)
+
+    def _transfer(n_bytes, priority=None):
+        events.append(("transfer", n_bytes))
+        return transfer(n_bytes, priority=priority)
+
+    monkeypatch.setattr(rate_limiter, "request", _request)
+    monkeypatch.setattr(rate_limiter, "transfer", _transfer)
+    dst_fpath = str(tmp_path / "copy.bin")
+    rate_limiter.get_file(fs, src_fpath, dst_fpath)
+
+    with open(dst_fpath, "rb") as f:
+        assert f.read() == content
+    chunk_size = 1024 * 1024
+    chunks = [chunk_size, chunk_size, len(content) - 2 * chunk_size]
+    expected = [("request",)]
+    for n_bytes in chunks:
+        expected += [("request",), ("transfer", n_bytes), ("read", n_bytes)]
+    assert events == expected
+
+
+def test_rate_limiter_without_bandwidth_limit(tmp_path):
+    """Without bandwidth limit, the file is downloaded with a single request."""
+    src_fpath = str(tmp_path / "file.bin")
+    with open(src_fpath, "wb") as f:
+        f.write(b"1" * 100)
+    rate_limiter = RateLimiter(requests_per_second=10)
+    assert not rate_limiter.limits_bytes
+    rate_limiter.get_file(LocalFileSystem(), src_fpath, str(tmp_path / "copy.bin"))
+    with open(str(tmp_path / "copy.bin"), "rb") as f:
+        assert f.read() == b"1" * 100
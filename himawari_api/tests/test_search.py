@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Test the himawari_api search functions."""
+
+import os
+
+import pytest
+
+import himawari_api.search
+from himawari_api.search import _iter_local_directories_fpaths, _check_search_inputs, find_files, iter_files
+from himawari_api.tests._synthetic import get_synthetic_fpaths, get_time_period, make_local_tree
+
+
+@pytest.fixture
+def local_tree(tmp_path):
+    """Return the base directory and the filepaths of a local L1b tree with 2 timesteps."""
+    fpaths = get_synthetic_fpaths(320)
+    make_local_tree(str(tmp_path), fpaths, file_size=3)
+    return str(tmp_path), fpaths
+
+
+@pytest.fixture
+def count_getsize(monkeypatch):
+    """Count the calls to os.path.getsize."""
+    calls = []
+    getsize = os.path.getsize
+
+    def _getsize(fpath):
+        calls.append(fpath)
+        return getsize(fpath)
+
+    monkeypatch.setattr(himawari_api.search.os.path, "getsize", _getsize)
+    return calls
+
+
+def test_find_files_local_does_not_stat(local_tree, count_getsize):
+    """The local search does not retrieve the size of the files."""
+    base_dir, fpaths = local_tree
+    start_time, end_time = get_time_period(fpaths)
+    found = find_files(
+        base_dir=base_dir,
+        satellite="himawari-9",
+        product_level="L1b",
+        product="Rad",
+        sector="FLDK",
+        start_time=start_time,
+        end_time=end_time,
+        filter_parameters={"channels": ["B01", "B13"]},
+    )
+    assert len(found) == 2 * 2 * 10
+    assert count_getsize == []
+
+
+def test_iter_local_directories_fpaths_detail(local_tree, count_getsize):
+    """With `detail=True`, only the size of the selected files is retrieved."""
+    base_dir, fpaths = local_tree
+    start_time, end_time = get_time_period(fpaths)
+    inputs = _check_search_inputs(
+        satellite="himawari-9",
+        product_level="L1b",
+        product="Rad",
+        start_time=start_time,
+        end_time=end_time,
+        sector="FLDK",
+        filter_parameters={"channels": ["B01"]},
+        group_by_key=None,
+        connection_type=None,
+        base_dir=base_dir,
+        protocol=None,
+        fs_args={},
+    )
+    satellite, product_level, product, start_time, end_time, sector, filter_parameters = inputs[:7]
+    dict_info = {}
+    for info in _iter_local_directories_fpaths(
+        satellite=satellite,
+        product_level=product_level,
+        product=product,
+        start_time=start_time,
+        end_time=end_time,
+        sector=sector,
+        filter_parameters=filter_parameters,
+        base_dir=base_dir,
+        detail=True,
+    ):
+        dict_info.update(info)
+    assert len(dict_info) == 2 * 10
+    assert all(info["size"] == 3 for info in dict_info.values())
+    assert sorted(count_getsize) == sorted(dict_info)
+
+
+def _get_search_kwargs(base_dir, fpaths, **kwargs):
+    start_time, end_time = get_time_period(fpaths)
+    search_kwargs = {
+        "base_dir": base_dir,
+        "satellite": "himawari-9",
+        "product_level": "L1b",
+        "product": "Rad",
+        "sector": "FLDK",
+        "start_time": start_time,
+        "end_time": end_time,
+        "filter_parameters": {"channels": ["B01", "B13"]},
+    }
+    search_kwargs.update(kwargs)
+    return search_kwargs
+
+
+def test_iter_files_equals_find_files(local_tree):
+    """The concatenated directories filepaths are the filepaths of find_files."""
+    base_dir, fpaths = local_tree
+    search_kwargs = _get_search_kwargs(base_dir, fpaths)
+    l_fpaths = list(iter_files(**search_kwargs))
+    assert len(l_fpaths) == 2
+    assert sorted(fpath for fpaths in l_fpaths for fpath in fpaths) == sorted(find_files(**search_kwargs))
+
+
+@pytest.mark.parametrize("group_by_key", ["start_time", "channel"])
+def test_iter_files_equals_find_files_group_by_key(local_tree, group_by_key):
+    """The concatenated groups of each directory are the groups of find_files."""
+    base_dir, fpaths = local_tree
+    search_kwargs = _get_search_kwargs(base_dir, fpaths, group_by_key=group_by_key)
+    dict_fpaths = {}
+    for dict_group in iter_files(**search_kwargs):
+        for key, l_fpaths in dict_group.items():
+            dict_fpaths.setdefault(key, []).extend(l_fpaths)
+    expected = find_files(**search_kwargs)
+    assert sorted(dict_fpaths) == sorted(expected)
+    assert all(sorted(dict_fpaths[key]) == sorted(expected[key]) for key in expected)
+
+
+def test_iter_files_checks_inputs_eagerly(local_tree):
+    """Invalid inputs raise when calling iter_files, not at the first iteration."""
+    base_dir, fpaths = local_tree
+    with pytest.raises(ValueError):
+        iter_files(**_get_search_kwargs(base_dir, fpaths, satellite="himawari-0"))
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# Copyright (c) 2022 Ghiggi Gionata
+
+# himawari_api is free software: you can redistribute it and/or modify it under the
+# terms of the GNU General Public License as published by the Free Software
+# Foundation, either version 3 of the License, or (at your option) any later
+# version.
+#
+# himawari_api is distributed in the hope that it will be useful, but WITHOUT ANY
+# WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR
+# A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along with
+# himawari_api. If not, see <http://www.gnu.org/licenses/>.
+"""Test the himawari_api sync functions."""
+
+import os
+import sqlite3
+
+from himawari_api.sync import _SYNC_MANIFEST_SCHEMA, _SQLITE_MAX_VARIABLES, _get_synced_etags, sync
+from himawari_api.tests._synthetic import get_synthetic_fpaths, get_time_period, make_local_tree
+
+PRODUCT_SPEC = {"satellite": "himawari-9", "product_level": "L2", "product": "CMSK", "sector": "FLDK"}
+
+
+def _sync(server, base_dir, fpaths, **kwargs):
+    start_time, end_time = get_time_period(fpaths)
+    return sync(
+        PRODUCT_SPEC,
+        start_time,
+        end_time,
+        base_dir=str(base_dir),
+        fs_args=server.fs_args,
+        progress_bar=False,
+        verbose=False,
+        **kwargs,
+    )
+
+
+def test_get_synced_etags():
+    """Only the rows of the requested paths are returned."""
+    conn = sqlite3.connect(":memory:")
+    conn.executescript(_SYNC_MANIFEST_SCHEMA)
+    n_files = 2 * _SQLITE_MAX_VARIABLES + 10
+    conn.executemany(
+        "INSERT INTO files (path, size, etag) VALUES (?, ?, ?)",
+        [(f"file_{i}", i, f"etag_{i}") for i in range(n_files)],
+    )
+    fpaths = [f"file_{i}" for i in range(0, n_files, 2)] + ["missing"]
+    assert _get_synced_etags(conn, fpaths) == {f"file_{i}": f"etag_{i}" for i in range(0, n_files, 2)}
+    assert _get_synced_etags(conn, []) == {}
+
+
+def test_sync(s3_server, tmp_path):
+    """Missing files are downloaded and files not on the bucket are deleted."""
+    fpaths = get_synthetic_fpaths(6, product_level="L2", product="CMSK")
+    server = s3_server(fpaths[:4])
+    report = _sync(server, tmp_path, fpaths)
+    assert len(report["downloaded"]) == 4
+
+    server.get_filesystem().rm(f"{server.bucket}/{fpaths[0]}")
+    report = _sync(server, tmp_path, fpaths, delete=True)
+    assert len(report["deleted"]) == 1
+    assert not os.path.exists(report["deleted"][0])
+    assert report["not_deleted"] == []
+
+
+def test_sync_does_not_delete_with_empty_remote_listing(s3_server, tmp_path):
+    """The local files are not deleted if the remote listing is empty, unless forced."""
+    fpaths = get_synthetic_fpaths(4, product_level="L2", product="CMSK")
+    server = s3_server(fpaths)
+    report = _sync(server, tmp_path, fpaths)
+    assert len(report["downloaded"]) == 4
+
+    server.get_filesystem().rm([f"{server.bucket}/{fpath}" for fpath in fpaths])
+    report = _sync(server, tmp_path, fpaths, delete=True)
+    assert report["deleted"] == []
+    assert len(report["not_deleted"]) == 4
+    assert all(os.path.exists(fpath) for fpath in report["not_deleted"])
+
+    report = _sync(server, tmp_path, fpaths, delete=True, force_delete=True)
+    assert len(report["deleted"]) == 4
+    assert not any(os.path.exists(fpath) for fpath in report["deleted"])
+
+
+def test_sync_records_etags_of_downloaded_files(s3_server, tmp_path):
+    """The files not downloaded by sync are re-fetched when their ETag changes."""
+    fpaths = get_synthetic_fpaths(4, product_level="L2", product="CMSK")
+    server = s3_server(fpaths, file_size=10)
+    make_local_tree(str(tmp_path), fpaths, file_size=10)
+    report = _sync(server, tmp_path, fpaths)
+    assert report["downloaded"] == []
+    assert report["refetched"] == []
+
+    # Update a remote file without changing its size
+    server.get_filesystem().pipe(f"{server.bucket}/{fpaths[0]}", b"\1" * 10)
+    report = _sync(server, tmp_path, fpaths)
+    assert len(report["refetched"]) == 1
+    with open(report["refetched"][0], "rb") as f:
+        assert f.read() == b"\1" * 10
+    report = _sync(server, tmp_path, fpaths)
+    assert report["refetched"] == []